@@ -1,71 +1,409 @@
-import os
+import json
 import time
 import random
-import smtplib
-import ssl
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, current_app, jsonify, request, g, Response, stream_with_context
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
 import jwt
 from datetime import datetime, timedelta
 import uuid
-try:
-    import oracledb  # optional: may not be installed in dev
-    ORACLE_AVAILABLE = True
-except Exception:
-    oracledb = None
-    ORACLE_AVAILABLE = False
+import csv
+from mailer import MailDispatcher
+from hashing import PasswordHasher, HashingBusy, code_digest, check_code
+from cache import TTLCache, RateLimiter, SingleFlight
+from revocation import RevocationIndex, MemoryRevocationBackend, OracleRevocationBackend
+from tokens import TokenSigner, RefreshTokenStore, RefreshTokenError
+from channel import SessionHub, event_key
+from versions import QuizVersionStore
+from events import ExamScheduler, exam_access, find_reservation, parse_utc
+from retention import RetentionJob
+from audit import AuditLog, decode_cursor
+from attempts import query_attempts
+from db import DatabaseRouter, optional_module, pooled
+from lifecycle import Lifecycle
+import logs
+import queries
+from config import Config, DEFAULT_JWT_SECRET
+from invalidation import InvalidationBus, LocalTransport, OraclePollingTransport, UnixSocketTransport
+from questionbank import FORMATS as BANK_FORMATS, BankImporter, BankFormatError, read_jsonl, read_csv, iter_questions, export_jsonl, export_csv
+from admission import AdmissionController, RequestClass, Overloaded, arrival_datetime, check_arrival, now_ms, sign_arrival
+from grading import answer_list
+from selection import selected_question_ids, session_payload, new_seed
+# optional: may not be installed in dev. Loaded on first use, so startup does not pay for it.
+oracledb = optional_module('oracledb')
+ORACLE_AVAILABLE = oracledb is not None
+if not ORACLE_AVAILABLE:
     import logging
     logging.getLogger().warning('oracledb not available; running in dev mode (DB operations disabled)')
+try:
+    from flask_sock import Sock  # optional: WebSocket exam channel; clients fall back to REST without it
+    WEBSOCKET_AVAILABLE = True
+except Exception:
+    Sock = None
+    WEBSOCKET_AVAILABLE = False
 
 
-load_dotenv()
-app = Flask(__name__)
-CORS(app)  # allow cross-origin requests in dev
+bp = Blueprint('quiz', __name__)
+# The channel route is attached to the blueprint, so the extension needs no app
+sock = Sock() if WEBSOCKET_AVAILABLE else None
+# Key of this app's subsystems in app.extensions
+EXTENSION = 'securinets_quiz'
 
-# Database configuration via environment variables
-DB_USER = os.environ.get('ORACLE_DB_USER')
-DB_PASS = os.environ.get('ORACLE_DB_PASS')
-DB_DSN = os.environ.get('ORACLE_DB_DSN')
 
-# Mail configuration (use Gmail app password)
-MAIL_USER = os.environ.get('MAIL_USER')
-MAIL_APP_PASSWORD = os.environ.get('MAIL_APP_PASSWORD')
+def service(name: str):
+    """Subsystem ``name`` of the app handling the current request (see ``create_app``)."""
+    return current_app.extensions[EXTENSION][name]
 
-# Ops flags and rate-limit config
-MAX_VERIFY_ATTEMPTS = int(os.environ.get('MAX_VERIFY_ATTEMPTS', '5'))
-LOCKOUT_SECONDS = int(os.environ.get('LOCKOUT_SECONDS', str(15 * 60)))
 
-# JWT configuration
-JWT_SECRET = os.environ.get('JWT_SECRET', 'please-change-this-secret')
-JWT_ALGO = os.environ.get('JWT_ALGO', 'HS256')
-JWT_EXP_SECONDS = int(os.environ.get('JWT_EXP_SECONDS', '14000'))
-if JWT_SECRET == 'please-change-this-secret':
-    app.logger.warning('Using default JWT_SECRET; set JWT_SECRET in environment for production')
+def _service_proxy(name: str) -> LocalProxy:
+    return LocalProxy(lambda: service(name))
 
-# Session grace window (seconds) to tolerate small client/server clock skew or network latency
-SESSION_GRACE_SECONDS = int(os.environ.get('SESSION_GRACE_SECONDS', '5'))
 
+# The routes below use these names; each resolves to the current app's object.
+config = _service_proxy('config')
+log_pipeline = _service_proxy('log_pipeline')
 # In-memory store for pending signups:
 # { email: { full_name, password_hash, code_hash, expires_at, attempts, blocked_until } }
-pending_signups = {}
+pending_signups = _service_proxy('pending_signups')
+# { lowercase email: (userID, name, email, password_hash, role) or None for unknown emails }
+user_auth_cache = _service_proxy('user_auth_cache')
+login_ip_limiter = _service_proxy('login_ip_limiter')
+login_email_limiter = _service_proxy('login_email_limiter')
+token_signer = _service_proxy('token_signer')
+revocation_index = _service_proxy('revocation_index')
+refresh_store = _service_proxy('refresh_store')
+# { userID: {'name': ..., 'email': ...} } so /api/me and audit entries need no per-request lookup
+user_profile_cache = _service_proxy('user_profile_cache')
+# { userID: {(cursor, limit, details): page} } of /api/me/attempts
+attempt_cache = _service_proxy('attempt_cache')
+quiz_versions = _service_proxy('quiz_versions')
+# Open exam session channels in this worker
+session_hub = _service_proxy('session_hub')
+# None without the database driver; test with service('exam_scheduler') is not None
+exam_scheduler = _service_proxy('exam_scheduler')
+retention_job = _service_proxy('retention_job')
+db_router = _service_proxy('db_router')
+cache_bus = _service_proxy('cache_bus')
+audit_log = _service_proxy('audit_log')
+# {(userID, quizID): (idempotency key, response body)} of recent submits, and the submits in progress
+submit_results = _service_proxy('submit_results')
+submits_in_flight = _service_proxy('submits_in_flight')
+admission = _service_proxy('admission')
+password_hasher = _service_proxy('password_hasher')
+mail_dispatcher = _service_proxy('mail_dispatcher')
+lifecycle = _service_proxy('lifecycle')
+# Last readiness DB ping: {'result': ..., 'at': monotonic time}
+_ready_ping = _service_proxy('ready_ping')
+
+# Carries the time of an admin's last write so read-your-writes also holds across workers
+LAST_WRITE_COOKIE = 'last_write_ms'
+ADMISSION_ROUTES = {
+    'api_submit_quiz': 'submit',
+    'api_start_quiz': 'start',
+    'api_save_answer': 'autosave',
+    'api_session_answers': 'autosave',
+    # long-running bulk transfers yield to everything else
+    'api_admin_import_questions': 'admin',
+    'api_admin_import_quiz': 'admin',
+    'api_admin_export_questions': 'admin',
+}
+# Not counted as in-flight work and never queued by admission control
+UNTRACKED_ENDPOINTS = {'session_channel', 'healthz', 'readyz'}
+# New work refused with 503 while the worker drains; running sessions keep saving and submitting
+DRAIN_REFUSED_ENDPOINTS = {'api_start_quiz'}
+
+
+def push_channel(target: str, ident, message: dict) -> None:
+    """Send a frame to the matching session channels on every worker (see channel.event_key)."""
+    cache_bus.publish('channel', event_key(target, ident, message))
+
+
+def route_name():
+    """Endpoint of the current request without the blueprint prefix, i.e. the view function's name."""
+    endpoint = request.endpoint
+    return endpoint.rpartition('.')[2] if endpoint else None
+
 
 from flask import abort
+
+
+def admission_class(endpoint: str, method: str):
+    """Admission class of a request, or None for requests that bypass admission control."""
+    if endpoint is None or endpoint in UNTRACKED_ENDPOINTS:
+        # unknown routes 404 without work; the channel is long-lived and admits each save itself;
+        # health probes must answer even when every slot is taken
+        return None
+    if endpoint in ADMISSION_ROUTES:
+        return ADMISSION_ROUTES[endpoint]
+    if endpoint.startswith('api_admin_') and method == 'GET':
+        return 'admin'
+    return 'default'
+
+
+@bp.before_app_request
+def bind_log_context():
+    """Correlation fields for every log line of this request; the id is echoed as X-Request-ID."""
+    logs.clear()
+    g.request_id = (request.headers.get('X-Request-ID') or '')[:64] or uuid.uuid4().hex
+    session_id = (request.view_args or {}).get('session_id') or request.args.get('session_id')
+    if session_id is None and request.is_json:
+        session_id = (request.get_json(silent=True) or {}).get('session_id')
+    logs.bind(request_id=g.request_id, route=route_name(), method=request.method, session_id=session_id)
+
+
+@bp.after_app_request
+def add_request_id(resp):
+    if 'request_id' in g:
+        resp.headers['X-Request-ID'] = g.request_id
+    return resp
+
+
+@bp.before_app_request
+def track_request():
+    """Count requests for the drain, and refuse new exam sessions once draining."""
+    if route_name() in UNTRACKED_ENDPOINTS:
+        return None
+    if lifecycle.draining and route_name() in DRAIN_REFUSED_ENDPOINTS:
+        resp = jsonify({'ok': False, 'message': 'This server is shutting down. Please retry.', 'retry_after': 1})
+        resp.headers['Retry-After'] = '1'
+        return resp, 503
+    lifecycle.enter()
+    g.lifecycle_tracked = True
+    return None
+
+
+@bp.before_app_request
+def admit_request():
+    # Epoch ms from time.time(): naive utcnow().timestamp() would be read as local time
+    g.arrived_ms = now_ms()
+    if not config.ADMISSION_ENABLED or request.method == 'OPTIONS':
+        return None
+    name = admission_class(route_name(), request.method)
+    if name is None:
+        return None
+    try:
+        admission.acquire(name)
+    except Overloaded as e:
+        resp = jsonify({'ok': False, 'message': 'Server is busy. Please retry shortly.', 'retry_after': e.retry_after})
+        resp.headers['Retry-After'] = str(e.retry_after)
+        if name == 'submit':
+            # Let the retry be judged by when this attempt arrived
+            session_id = (request.get_json(silent=True) or {}).get('session_id')
+            if session_id:
+                resp.headers['X-Submit-Arrival'] = sign_arrival(config.JWT_SECRET, str(session_id), g.arrived_ms)
+        current_app.logger.warning('Shed %s request to %s (retry after %ss)', name, request.path, e.retry_after)
+        return resp, 503
+    g.admission_class = name
+    g.admitted_at = time.monotonic()
+    return None
+
+
+@bp.after_app_request
+def remember_admin_write(response):
+    """After a successful admin write, keep that admin's reads on the primary for a while."""
+    admin_id = g.get('admin_id')
+    if (db_router.has_replica and admin_id is not None and request.method in ('POST', 'PUT', 'PATCH', 'DELETE')
+            and response.status_code < 400):
+        db_router.note_write(admin_id)
+        response.set_cookie(LAST_WRITE_COOKIE, str(int(time.time() * 1000)),
+                            max_age=max(1, int(config.READ_YOUR_WRITES_SECONDS)), httponly=True, samesite='Strict')
+    return response
+
+
+@bp.teardown_app_request
+def release_admission(exc=None):
+    name = g.pop('admission_class', None)
+    if name is not None:
+        admission.release(name, time.monotonic() - g.pop('admitted_at', time.monotonic()))
+    if g.pop('lifecycle_tracked', False):
+        lifecycle.leave()
+    logs.clear()
+
+
+def submit_arrival_time(session_id) -> datetime:
+    """Moment a submit counts as received: a retried shed submit keeps its first arrival."""
+    arrived_ms = g.get('arrived_ms') or now_ms()
+    stamp = request.headers.get('X-Submit-Arrival')
+    if stamp:
+        first_ms = check_arrival(config.JWT_SECRET, str(session_id), stamp, config.SUBMIT_SHED_HONOR_SECONDS)
+        if first_ms is not None:
+            arrived_ms = min(arrived_ms, first_ms)
+    return arrival_datetime(arrived_ms)
+
+
+def decode_auth_token(token: str) -> dict:
+    """Decode a bearer JWT, rejecting tokens revoked by a ban or delete."""
+    payload = token_signer.decode(token)
+    if revocation_index.is_revoked(payload.get('sub'), payload.get('iat')):
+        raise jwt.InvalidTokenError('Token has been revoked')
+    logs.bind(user_id=payload.get('sub'))
+    return payload
+
+
+def get_user_profile(user_id):
+    """Return {'name', 'email'} for a user from the profile cache, loading it on a miss."""
+    if user_id is None:
+        return None
+    profile = user_profile_cache.get(int(user_id))
+    if profile is not None or not ORACLE_AVAILABLE:
+        return profile
+    version = cache_bus.version('profile', user_id)
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute(queries.PROFILE_BY_ID, [user_id])
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+    except Exception:
+        current_app.logger.exception('Failed to load profile for user %s', user_id)
+        return None
+    if not row:
+        return None
+    profile = {'name': row[0], 'email': row[1]}
+    if cache_bus.version('profile', user_id) == version:
+        user_profile_cache.set(int(user_id), profile)
+    return profile
+
+
+def actor_name(payload: dict) -> str:
+    """Display name of the token holder for AdminLog entries."""
+    # Older tokens still embed the name
+    if payload.get('name'):
+        return payload.get('name')
+    profile = get_user_profile(payload.get('sub')) or {}
+    return profile.get('name') or f"user {payload.get('sub')}"
+
+
+def audit_admin(action: str, payload: dict, detail: str = None) -> None:
+    """Queue a non-critical AdminLog entry for the token holder (call after the change commits)."""
+    actor = actor_name(payload)
+    reason = f"By {actor} ({detail})" if detail else f"By {actor}"
+    try:
+        audit_log.record(action, reason, actor, payload.get('sub'))
+    except Exception:
+        current_app.logger.exception('Failed to write AdminLog entry %r', action)
+
+
+def quiz_selection_settings(payload: dict):
+    """Parse the per-attempt selection settings of a quiz payload. Returns (values, error)."""
+    pool_size = payload.get('pool_size')
+    if pool_size in (None, '', 0, '0'):
+        pool_size = None
+    else:
+        try:
+            pool_size = int(pool_size)
+        except (TypeError, ValueError):
+            return None, 'pool_size must be a whole number'
+        if pool_size < 1:
+            return None, 'pool_size must be positive'
+    stratify_by = payload.get('stratify_by') or None
+    if stratify_by not in (None, 'category', 'difficulty'):
+        return None, "stratify_by must be 'category' or 'difficulty'"
+    shuffle_questions = 'Y' if payload.get('shuffle_questions') else 'N'
+    shuffle_answers = 'Y' if payload.get('shuffle_answers') else 'N'
+    return [pool_size, stratify_by, shuffle_questions, shuffle_answers], None
+
+
+def quiz_pass_threshold(payload: dict):
+    """Pass mark of a quiz payload as a fraction of the total points. Returns (value or None, error)."""
+    value = payload.get('pass_threshold')
+    if value in (None, ''):
+        return None, None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None, 'pass_threshold must be a number between 0 and 1'
+    if not 0 <= value <= 1:
+        return None, 'pass_threshold must be a number between 0 and 1'
+    return value, None
+
+
+def question_scoring(q: dict) -> list:
+    """[multi_select, partial_credit, penalty] column values of a question payload."""
+    try:
+        penalty = max(0.0, float(q.get('penalty') or 0))
+    except (TypeError, ValueError):
+        penalty = 0.0
+    return ['Y' if q.get('multi_select') else 'N', 'Y' if q.get('partial_credit') else 'N', penalty]
+
+
+def load_saved_answers(conn, session_id, since_seq: int = 0) -> list:
+    """Return SessionAnswers rows of a session saved after ``since_seq``, oldest first."""
+    cur = conn.cursor()
+    cur.execute(queries.SAVED_ANSWERS_SINCE, [session_id, since_seq])
+    # Multi-select answers are stored as a comma-separated answer_set and come back as a list
+    rows = [{'questionID': int(qid), 'answerID': [int(x) for x in answer_set.split(',') if x] if answer_set is not None
+             else (int(aid) if aid is not None else None), 'seq': int(seq or 0)}
+            for qid, aid, answer_set, seq in cur.fetchall()]
+    cur.close()
+    return rows
+
+
+def session_info_payload(session_id, start_at, expires_at, answer_seq: int = 0, saved_answers=()) -> dict:
+    """Session block of the /start response, with both ISO strings and epoch-ms fields for robustness."""
+    session_info = {'session_id': session_id}
+    try:
+        session_info['start_at'] = start_at.isoformat() if start_at else None
+        session_info['expires_at'] = expires_at.isoformat() if expires_at else None
+        session_info['start_at_ms'] = int(start_at.timestamp() * 1000) if start_at else None
+        session_info['expires_at_ms'] = int(expires_at.timestamp() * 1000) if expires_at else None
+        # include server's current time in ms to allow clients to compensate for clock skew
+        session_info['server_now_ms'] = int(datetime.utcnow().timestamp() * 1000)
+    except Exception:
+        session_info['start_at'] = str(start_at) if start_at else None
+        session_info['expires_at'] = str(expires_at) if expires_at else None
+        try:
+            session_info['start_at_ms'] = int(start_at.timestamp() * 1000) if start_at else None
+        except Exception:
+            session_info['start_at_ms'] = None
+        try:
+            session_info['expires_at_ms'] = int(expires_at.timestamp() * 1000) if expires_at else None
+        except Exception:
+            session_info['expires_at_ms'] = None
+        try:
+            session_info['server_now_ms'] = int(datetime.utcnow().timestamp() * 1000)
+        except Exception:
+            session_info['server_now_ms'] = None
+    session_info['remaining_ms'] = remaining_ms(expires_at)
+    session_info['answer_seq'] = answer_seq
+    session_info['saved_answers'] = {str(a['questionID']): a['answerID'] for a in saved_answers}
+    return session_info
+
+
+def remaining_ms(expires_at):
+    """Milliseconds left in a session according to the server clock (None when untimed)."""
+    if expires_at is None:
+        return None
+    try:
+        return max(0, int((expires_at - datetime.utcnow()).total_seconds() * 1000))
+    except Exception:
+        return None
+
+
 def admin_required():
     auth = request.headers.get('Authorization', '')
     if not auth.startswith('Bearer '):
         abort(401, description='Missing authorization token')
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error: %s', e)
+        current_app.logger.debug('JWT decode error: %s', e)
         abort(401, description='Invalid or expired token')
     if payload.get('role') != 'admin':
         abort(403, description='Forbidden')
+    g.admin_id = payload.get('sub')
     return payload
-@app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
+
+
+def read_connection(payload: dict = None):
+    """Connection for a read-only route: the replica when the route's consistency setting allows."""
+    user_id = (payload or {}).get('sub', g.get('admin_id'))
+    return db_router.read_connection(route_name(), user_id, request.cookies.get(LAST_WRITE_COOKIE))
+@bp.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
 def api_admin_delete_user(user_id):
     payload = admin_required()
     data = request.get_json() or {}
@@ -75,16 +413,16 @@ def api_admin_delete_user(user_id):
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
         # Get user info
-        cur.execute("SELECT name, role FROM Users WHERE userID = :1", [user_id])
+        cur.execute("SELECT name, role, email FROM Users WHERE userID = :1", [user_id])
         row = cur.fetchone()
         if not row:
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'User not found'}), 404
-        username, userrole = row
+        username, userrole, useremail = row
         if userrole == 'admin':
             cur.close()
             conn.close()
@@ -93,17 +431,20 @@ def api_admin_delete_user(user_id):
         cur.execute("DELETE FROM Users WHERE userID = :1", [user_id])
         # Log action
         action = f"delete {username}"
-        log_reason = f"By {payload.get('name')} because of {reason}"
-        cur.execute("INSERT INTO AdminLog (action, reason) VALUES (:1, :2)", [action, log_reason])
+        log_reason = f"By {actor_name(payload)} because of {reason}"
+        AuditLog.write(cur, action, log_reason, actor_name(payload), payload.get('sub'))
         conn.commit()
         cur.close()
         conn.close()
+        cache_bus.publish_many([('login', (useremail or '').lower()), ('profile', user_id)])
+        revocation_index.revoke_user(user_id)
+        push_channel('user', user_id, {'t': 'revoked'})
         return jsonify({'ok': True, 'message': 'User deleted'}), 200
     except Exception as e:
-        app.logger.exception('Error deleting user: %s', e)
+        current_app.logger.exception('Error deleting user: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
 
-@app.route('/api/admin/users/<int:user_id>/ban', methods=['PATCH'])
+@bp.route('/api/admin/users/<int:user_id>/ban', methods=['PATCH'])
 def api_admin_ban_user(user_id):
     payload = admin_required()
     data = request.get_json() or {}
@@ -113,16 +454,16 @@ def api_admin_ban_user(user_id):
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
         # Get user info
-        cur.execute("SELECT name, role FROM Users WHERE userID = :1", [user_id])
+        cur.execute("SELECT name, role, email FROM Users WHERE userID = :1", [user_id])
         row = cur.fetchone()
         if not row:
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'User not found'}), 404
-        username, userrole = row
+        username, userrole, useremail = row
         if userrole == 'admin':
             cur.close()
             conn.close()
@@ -133,19 +474,131 @@ def api_admin_ban_user(user_id):
             return jsonify({'ok': False, 'message': 'User already banned'}), 400
         # Ban user
         cur.execute("UPDATE Users SET role = 'banned' WHERE userID = :1", [user_id])
+        # Refresh tokens would otherwise mint new member tokens
+        RefreshTokenStore.revoke_user(cur, user_id)
         # Log action
         action = f"ban {username}"
-        log_reason = f"By {payload.get('name')} because of {reason}"
-        cur.execute("INSERT INTO AdminLog (action, reason) VALUES (:1, :2)", [action, log_reason])
+        log_reason = f"By {actor_name(payload)} because of {reason}"
+        AuditLog.write(cur, action, log_reason, actor_name(payload), payload.get('sub'))
         conn.commit()
         cur.close()
         conn.close()
+        cache_bus.publish('login', (useremail or '').lower())
+        revocation_index.revoke_user(user_id)
+        push_channel('user', user_id, {'t': 'revoked'})
         return jsonify({'ok': True, 'message': 'User banned'}), 200
     except Exception as e:
-        app.logger.exception('Error banning user: %s', e)
+        current_app.logger.exception('Error banning user: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
 
-@app.route('/api/admin/quizzes', methods=['GET'])
+@bp.route('/api/admin/users/bulk', methods=['POST'])
+def api_admin_bulk_moderate():
+    """Ban or delete many users at once.
+
+    Body: {action: 'ban'|'delete', reason, user_ids: [...], client_ip: '...', dry_run: bool}.
+    Targets are the listed users plus everyone with a session from ``client_ip``. The change,
+    the refresh-token cleanup and the AdminLog entries are one transaction of array DML.
+    Returns the outcome per user: banned/deleted, or skipped with the reason.
+    """
+    payload = admin_required()
+    data = request.get_json() or {}
+    action = data.get('action')
+    if action not in ('ban', 'delete'):
+        return jsonify({'ok': False, 'message': "action must be 'ban' or 'delete'"}), 400
+    reason = (data.get('reason') or '').strip()
+    if not reason:
+        return jsonify({'ok': False, 'message': 'Reason is required'}), 400
+    try:
+        requested = {int(uid) for uid in data.get('user_ids') or []}
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'message': 'user_ids must be a list of user IDs'}), 400
+    client_ip = (data.get('client_ip') or '').strip() or None
+    if not requested and not client_ip:
+        return jsonify({'ok': False, 'message': 'Provide user_ids or client_ip'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        targets = set(requested)
+        if client_ip:
+            cur.execute(queries.USERS_BY_CLIENT_IP, [client_ip])
+            targets.update(int(r[0]) for r in cur.fetchall())
+        if len(targets) > config.MODERATION_BULK_LIMIT:
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': f'At most {config.MODERATION_BULK_LIMIT} users per request ({len(targets)} matched)'}), 400
+        ids = sorted(targets)
+        users = {}
+        if ids:
+            binds = ', '.join(':%d' % (i + 1) for i in range(len(ids)))
+            cur.execute("SELECT userID, name, role, email FROM Users WHERE userID IN (%s)" % binds, ids)
+            users = {int(r[0]): r[1:] for r in cur.fetchall()}
+
+        results = {}
+        eligible = []
+        for uid in ids:
+            if uid not in users:
+                results[uid] = {'userID': uid, 'outcome': 'skipped', 'message': 'User not found'}
+            elif users[uid][1] == 'admin':
+                results[uid] = {'userID': uid, 'outcome': 'skipped', 'message': f'Cannot {action} admin user'}
+            elif action == 'ban' and users[uid][1] == 'banned':
+                results[uid] = {'userID': uid, 'outcome': 'skipped', 'message': 'User already banned'}
+            else:
+                eligible.append(uid)
+        done = 'banned' if action == 'ban' else 'deleted'
+        if data.get('dry_run'):
+            for uid in eligible:
+                results[uid] = {'userID': uid, 'outcome': 'would_be_' + done}
+            cur.close()
+            conn.close()
+            return jsonify({'ok': True, 'dry_run': True, 'matched': len(ids), 'results': [results[uid] for uid in ids]}), 200
+
+        changed = []
+        if eligible:
+            rows = [[uid] for uid in eligible]
+            # The role guard re-checks under the row lock, in case a user changed since the SELECT
+            if action == 'ban':
+                cur.executemany("UPDATE Users SET role = 'banned' WHERE userID = :1 AND role NOT IN ('admin', 'banned')",
+                                rows, batcherrors=True, arraydmlrowcounts=True)
+            else:
+                cur.executemany("DELETE FROM Users WHERE userID = :1 AND role <> 'admin'",
+                                rows, batcherrors=True, arraydmlrowcounts=True)
+            failed = {error.offset: error.message for error in cur.getbatcherrors()}
+            counts = cur.getarraydmlrowcounts()
+            for i, uid in enumerate(eligible):
+                if i in failed:
+                    results[uid] = {'userID': uid, 'outcome': 'failed', 'message': failed[i]}
+                elif counts[i] == 0:
+                    results[uid] = {'userID': uid, 'outcome': 'skipped', 'message': 'User changed concurrently'}
+                else:
+                    results[uid] = {'userID': uid, 'outcome': done}
+                    changed.append(uid)
+            if changed and action == 'ban':
+                # Refresh tokens would otherwise mint new member tokens (deletes cascade)
+                cur.executemany("DELETE FROM RefreshTokens WHERE userID = :1", [[uid] for uid in changed])
+            if changed:
+                log_reason = f"By {actor_name(payload)} because of {reason}"
+                if client_ip:
+                    log_reason += f" (sessions from {client_ip})"
+                actor = actor_name(payload)
+                AuditLog.write_many(cur, [(f"{action} {users[uid][0]}", log_reason, actor, payload.get('sub'))
+                                          for uid in changed])
+            conn.commit()
+        cur.close()
+        conn.close()
+        cache_bus.publish_many([('login', (users[uid][2] or '').lower()) for uid in changed]
+                               + ([('profile', uid) for uid in changed] if action == 'delete' else []))
+        for uid in changed:
+            revocation_index.revoke_user(uid)
+        cache_bus.publish_many([('channel', event_key('user', uid, {'t': 'revoked'})) for uid in changed])
+        return jsonify({'ok': True, 'matched': len(ids), 'changed': len(changed),
+                        'results': [results[uid] for uid in ids]}), 200
+    except Exception as e:
+        current_app.logger.exception('Error in bulk moderation: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+
+@bp.route('/api/admin/quizzes', methods=['GET'])
 def api_admin_get_quizzes():
     """Return quizzes for admin panel. Returns quizID, title, description, timelimit, question_count"""
     # auth
@@ -154,9 +607,9 @@ def api_admin_get_quizzes():
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error: %s', e)
+        current_app.logger.debug('JWT decode error: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
     if payload.get('role') != 'admin':
         return jsonify({'ok': False, 'message': 'Forbidden'}), 403
@@ -165,7 +618,7 @@ def api_admin_get_quizzes():
         return jsonify({'ok': True, 'quizzes': []})
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = read_connection(payload)
         cur = conn.cursor()
         cur.execute("SELECT quizID, title, description, timelimit FROM Quiz ORDER BY created_at DESC")
         quizzes = []
@@ -173,7 +626,7 @@ def api_admin_get_quizzes():
             quizID, title, description, timelimit = row
             # get question count
             qcur = conn.cursor()
-            qcur.execute("SELECT COUNT(*) FROM Questions WHERE quizID = :1", [quizID])
+            qcur.execute(queries.QUESTION_COUNT, [quizID])
             qc = qcur.fetchone()
             question_count = int(qc[0]) if qc else 0
             qcur.close()
@@ -182,11 +635,11 @@ def api_admin_get_quizzes():
         conn.close()
         return jsonify({'ok': True, 'quizzes': quizzes}), 200
     except Exception as e:
-        app.logger.exception('DB error fetching quizzes: %s', e)
+        current_app.logger.exception('DB error fetching quizzes: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
 
 
-@app.route('/api/admin/quizzes/<int:quiz_id>', methods=['GET'])
+@bp.route('/api/admin/quizzes/<int:quiz_id>', methods=['GET'])
 def api_admin_get_quiz(quiz_id):
     """Return a single quiz with nested questions and answers for admin editing."""
     # admin check
@@ -195,9 +648,9 @@ def api_admin_get_quiz(quiz_id):
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error: %s', e)
+        current_app.logger.debug('JWT decode error: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
     if payload.get('role') != 'admin':
         return jsonify({'ok': False, 'message': 'Forbidden'}), 403
@@ -206,39 +659,45 @@ def api_admin_get_quiz(quiz_id):
         return jsonify({'ok': True, 'quiz': None})
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
-        cur.execute("SELECT quizID, title, description, timelimit FROM Quiz WHERE quizID = :1", [quiz_id])
+        cur.execute("SELECT quizID, title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, pass_threshold FROM Quiz WHERE quizID = :1", [quiz_id])
         row = cur.fetchone()
         if not row:
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
-        quizID, title, description, timelimit = row
+        quizID, title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, pass_threshold = row
         # get questions
         qcur = conn.cursor()
-        qcur.execute("SELECT questionID, title, category, difficulty, points, description FROM Questions WHERE quizID = :1 ORDER BY questionID", [quizID])
+        qcur.execute(queries.QUIZ_QUESTIONS, [quizID])
         questions = []
         for qrow in qcur.fetchall():
-            questionID, qtitle, qcategory, qdifficulty, qpoints, qdesc = qrow
+            questionID, qtitle, qcategory, qdifficulty, qpoints, qdesc, qmulti, qpartial, qpenalty = qrow
             acur = conn.cursor()
-            acur.execute("SELECT answerID, answer_text, is_correct FROM Answers WHERE questionID = :1 ORDER BY answerID", [questionID])
+            acur.execute(queries.QUESTION_ANSWERS, [questionID])
             answers = []
             for arow in acur.fetchall():
                 answerID, answer_text, is_correct = arow
                 answers.append({'answerID': answerID, 'text': answer_text, 'is_correct': True if is_correct == 'Y' else False})
             acur.close()
-            questions.append({'questionID': questionID, 'title': qtitle, 'category': qcategory, 'difficulty': qdifficulty, 'points': qpoints, 'description': qdesc, 'answers': answers})
+            questions.append({'questionID': questionID, 'title': qtitle, 'category': qcategory, 'difficulty': qdifficulty, 'points': qpoints, 'description': qdesc,
+                              'multi_select': qmulti == 'Y', 'partial_credit': qpartial == 'Y', 'penalty': float(qpenalty or 0), 'answers': answers})
         qcur.close()
         cur.close()
         conn.close()
-        return jsonify({'ok': True, 'quiz': {'quizID': quizID, 'title': title, 'description': description, 'timelimit': timelimit, 'questions': questions}}), 200
+        return jsonify({'ok': True, 'quiz': {
+            'quizID': quizID, 'title': title, 'description': description, 'timelimit': timelimit,
+            'pool_size': pool_size, 'stratify_by': stratify_by,
+            'shuffle_questions': shuffle_questions == 'Y', 'shuffle_answers': shuffle_answers == 'Y',
+            'pass_threshold': float(pass_threshold) if pass_threshold is not None else 0.5,
+            'questions': questions}}), 200
     except Exception as e:
-        app.logger.exception('DB error fetching quiz: %s', e)
+        current_app.logger.exception('DB error fetching quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
 
 
-@app.route('/api/admin/quizzes/<int:quiz_id>', methods=['PUT'])
+@bp.route('/api/admin/quizzes/<int:quiz_id>', methods=['PUT'])
 def api_admin_update_quiz(quiz_id):
     """Update an existing quiz (replace questions/answers). Expects same JSON shape as create."""
     try:
@@ -254,12 +713,19 @@ def api_admin_update_quiz(quiz_id):
 
     if not title:
         return jsonify({'ok': False, 'message': 'Quiz title is required'}), 400
+    selection, error = quiz_selection_settings(payload)
+    if error:
+        return jsonify({'ok': False, 'message': error}), 400
+    pass_threshold, error = quiz_pass_threshold(payload)
+    if error:
+        return jsonify({'ok': False, 'message': error}), 400
+    selection.append(pass_threshold)
 
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
         # Ensure quiz exists
         cur.execute("SELECT quizID FROM Quiz WHERE quizID = :1", [quiz_id])
@@ -269,19 +735,25 @@ def api_admin_update_quiz(quiz_id):
             return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
 
         # Update quiz metadata
-        cur.execute("UPDATE Quiz SET title = :1, description = :2, timelimit = :3 WHERE quizID = :4", [title, description, timelimit, quiz_id])
+        cur.execute(
+            "UPDATE Quiz SET title = :1, description = :2, timelimit = :3, pool_size = :4, stratify_by = :5, "
+            "shuffle_questions = :6, shuffle_answers = :7, pass_threshold = NVL(:8, pass_threshold) WHERE quizID = :9",
+            [title, description, timelimit] + selection + [quiz_id]
+        )
 
-        # Remove existing answers and questions for this quiz
-        try:
-            # Delete answers linked to questions of this quiz
-            cur.execute("DELETE FROM Answers WHERE questionID IN (SELECT questionID FROM Questions WHERE quizID = :1)", [quiz_id])
-            # Delete questions
-            cur.execute("DELETE FROM Questions WHERE quizID = :1", [quiz_id])
-        except Exception:
-            # If DB doesn't support subqueries for delete or other edge cases, attempt safer fallback
-            app.logger.exception('Error deleting old questions/answers; continuing')
+        # Apply the edit copy-on-write style: edited rows keep their IDs, new rows are inserted
+        # and removed ones are retired, so snapshots pinned by running sessions stay valid.
+        cur.execute("SELECT questionID FROM Questions WHERE quizID = :1 AND retired = 'N'", [quiz_id])
+        existing_questions = {int(r[0]) for r in cur.fetchall()}
+        cur.execute(
+            "SELECT a.answerID, a.questionID FROM Answers a JOIN Questions q ON q.questionID = a.questionID "
+            "WHERE q.quizID = :1 AND a.retired = 'N'",
+            [quiz_id]
+        )
+        existing_answers = {int(r[0]): int(r[1]) for r in cur.fetchall()}
+        kept_questions = set()
+        kept_answers = set()
 
-        # Insert new questions and answers
         for q in questions:
             qtitle = (q.get('title') or '').strip()
             qcategory = q.get('category') or None
@@ -290,41 +762,65 @@ def api_admin_update_quiz(quiz_id):
             qdesc = q.get('description') or None
             if not qtitle:
                 continue
-            qid_var = cur.var(oracledb.NUMBER)
-            cur.execute(
-                "INSERT INTO Questions (quizID, title, category, difficulty, points, description) VALUES (:1, :2, :3, :4, :5, :6) RETURNING questionID INTO :7",
-                [quiz_id, qtitle, qcategory, qdifficulty, qpoints, qdesc, qid_var]
-            )
-            question_id = int(qid_var.getvalue()[0])
+            try:
+                question_id = int(q.get('questionID')) if q.get('questionID') is not None else None
+            except (TypeError, ValueError):
+                question_id = None
+            if question_id in existing_questions:
+                cur.execute(
+                    "UPDATE Questions SET title = :1, category = :2, difficulty = :3, points = :4, description = :5, "
+                    "multi_select = :6, partial_credit = :7, penalty = :8 WHERE questionID = :9",
+                    [qtitle, qcategory, qdifficulty, qpoints, qdesc] + question_scoring(q) + [question_id]
+                )
+            else:
+                qid_var = cur.var(oracledb.NUMBER)
+                cur.execute(
+                    "INSERT INTO Questions (quizID, title, category, difficulty, points, description, multi_select, partial_credit, penalty) "
+                    "VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9) RETURNING questionID INTO :10",
+                    [quiz_id, qtitle, qcategory, qdifficulty, qpoints, qdesc] + question_scoring(q) + [qid_var]
+                )
+                question_id = int(qid_var.getvalue()[0])
+            kept_questions.add(question_id)
             answers = q.get('answers') or []
             for a in answers:
                 atext = (a.get('text') or '').strip()
                 if not atext:
                     continue
                 is_correct = 'Y' if a.get('is_correct') else 'N'
-                cur.execute(
-                    "INSERT INTO Answers (questionID, answer_text, is_correct) VALUES (:1, :2, :3)",
-                    [question_id, atext, is_correct]
-                )
+                try:
+                    answer_id = int(a.get('answerID')) if a.get('answerID') is not None else None
+                except (TypeError, ValueError):
+                    answer_id = None
+                if answer_id is not None and existing_answers.get(answer_id) == question_id:
+                    cur.execute("UPDATE Answers SET answer_text = :1, is_correct = :2 WHERE answerID = :3", [atext, is_correct, answer_id])
+                    kept_answers.add(answer_id)
+                else:
+                    cur.execute(
+                        "INSERT INTO Answers (questionID, answer_text, is_correct) VALUES (:1, :2, :3)",
+                        [question_id, atext, is_correct]
+                    )
 
-        # Log admin action: Quiz Updated
-        try:
-            action = 'Quiz Updated'
-            log_reason = f"By {admin_payload.get('name')}"
-            cur.execute("INSERT INTO AdminLog (action, reason) VALUES (:1, :2)", [action, log_reason])
-        except Exception:
-            app.logger.exception('Failed to write AdminLog for quiz update')
+        retired_questions = existing_questions - kept_questions
+        retired_answers = set(existing_answers) - kept_answers
+        if retired_questions:
+            cur.executemany("UPDATE Questions SET retired = 'Y' WHERE questionID = :1", [[x] for x in retired_questions])
+        if retired_answers:
+            cur.executemany("UPDATE Answers SET retired = 'Y' WHERE answerID = :1", [[x] for x in retired_answers])
+
+        # Publish the edited draft as a new immutable version (no-op if nothing changed)
+        version_id = quiz_versions.publish(cur, quiz_id)
 
         conn.commit()
         cur.close()
         conn.close()
-        return jsonify({'ok': True, 'message': 'Quiz updated', 'quizID': quiz_id}), 200
+        audit_admin('Quiz Updated', admin_payload)
+        return jsonify({'ok': True, 'message': 'Quiz updated', 'quizID': quiz_id, 'versionID': version_id}), 200
 
     except Exception as e:
-        app.logger.exception('Error updating quiz: %s', e)
+        current_app.logger.exception('Error updating quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while updating quiz'}), 500
 
-@app.route('/api/admin/quizzes/<int:quiz_id>', methods=['DELETE'])
+@bp.route('/api/admin/quizzes/<int:quiz_id>', methods=['DELETE'])
 def api_admin_delete_quiz(quiz_id):
     """Delete a quiz and its dependent questions/answers (DB cascade expected)."""
     try:
@@ -336,7 +832,7 @@ def api_admin_delete_quiz(quiz_id):
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
         # Fetch quiz title for logging
         cur.execute("SELECT title FROM Quiz WHERE quizID = :1", [quiz_id])
@@ -350,24 +846,315 @@ def api_admin_delete_quiz(quiz_id):
         # Delete quiz (should cascade to Questions/Answers if foreign keys set)
         cur.execute("DELETE FROM Quiz WHERE quizID = :1", [quiz_id])
 
-        # Log admin action
-        try:
-            action = f"Quiz Deleted: {title}"
-            log_reason = f"By {admin_payload.get('name')}"
-            cur.execute("INSERT INTO AdminLog (action, reason) VALUES (:1, :2)", [action, log_reason])
-        except Exception:
-            app.logger.exception('Failed to write AdminLog for quiz deletion')
+        # Deleting a quiz destroys its results, so the log entry commits with it
+        actor = actor_name(admin_payload)
+        AuditLog.write(cur, f"Quiz Deleted: {title}", f"By {actor}", actor, admin_payload.get('sub'))
 
         conn.commit()
         cur.close()
         conn.close()
         return jsonify({'ok': True, 'message': 'Quiz deleted'}), 200
     except Exception as e:
-        app.logger.exception('Error deleting quiz: %s', e)
+        current_app.logger.exception('Error deleting quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while deleting quiz'}), 500
 
 
-@app.route('/api/admin/quizzes/<int:quiz_id>/results', methods=['GET'])
+@bp.route('/api/admin/quizzes/<int:quiz_id>/events', methods=['POST'])
+def api_admin_create_exam_event(quiz_id):
+    """Schedule an exam event. Expects JSON: { starts_at, ends_at (ISO-8601), user_ids: [<int>, ...] }"""
+    admin_payload = admin_required()
+    payload = request.get_json() or {}
+    try:
+        starts_at = parse_utc(payload.get('starts_at'))
+        ends_at = parse_utc(payload.get('ends_at'))
+    except ValueError:
+        return jsonify({'ok': False, 'message': 'starts_at and ends_at must be ISO-8601 timestamps'}), 400
+    if starts_at is None or ends_at is None or ends_at <= starts_at:
+        return jsonify({'ok': False, 'message': 'A start time before the end time is required'}), 400
+    try:
+        user_ids = sorted({int(u) for u in payload.get('user_ids') or []})
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'message': 'user_ids must be a list of user IDs'}), 400
+    if not user_ids:
+        return jsonify({'ok': False, 'message': 'At least one eligible user is required'}), 400
+
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute("SELECT title FROM Quiz WHERE quizID = :1", [quiz_id])
+        row = cur.fetchone()
+        if not row:
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
+        event_var = cur.var(oracledb.NUMBER)
+        cur.execute(
+            "INSERT INTO ExamEvents (quizID, starts_at, ends_at, created_at) VALUES (:1, :2, :3, :4) RETURNING eventID INTO :5",
+            [quiz_id, starts_at, ends_at, datetime.utcnow(), event_var]
+        )
+        event_id = int(event_var.getvalue()[0])
+        cur.executemany("INSERT INTO ExamEventUsers (eventID, userID) VALUES (:1, :2)", [[event_id, u] for u in user_ids])
+        conn.commit()
+        cur.close()
+        conn.close()
+        audit_admin(f"Exam Scheduled: {row[0]}", admin_payload)
+        return jsonify({'ok': True, 'eventID': event_id, 'eligible': len(user_ids)}), 201
+    except Exception as e:
+        current_app.logger.exception('Error scheduling exam event: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while scheduling exam'}), 500
+
+
+@bp.route('/api/admin/quizzes/<int:quiz_id>/events', methods=['GET'])
+def api_admin_exam_events(quiz_id):
+    """List exam events of a quiz with eligible and reserved session counts."""
+    admin_required()
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': True, 'events': []}), 200
+    try:
+        conn = read_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT e.eventID, e.starts_at, e.ends_at, e.status, e.versionID, "
+            "(SELECT COUNT(*) FROM ExamEventUsers eu WHERE eu.eventID = e.eventID), "
+            "(SELECT COUNT(*) FROM Sessions s WHERE s.eventID = e.eventID AND s.status = 'reserved') "
+            "FROM ExamEvents e WHERE e.quizID = :1 ORDER BY e.starts_at DESC",
+            [quiz_id]
+        )
+        events = [
+            {'eventID': r[0], 'starts_at': r[1].isoformat() if r[1] else None, 'ends_at': r[2].isoformat() if r[2] else None,
+             'status': r[3], 'versionID': r[4], 'eligible': int(r[5]), 'reserved': int(r[6])}
+            for r in cur.fetchall()
+        ]
+        cur.close()
+        conn.close()
+        return jsonify({'ok': True, 'events': events}), 200
+    except Exception as e:
+        current_app.logger.exception('Error listing exam events: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+
+
+@bp.route('/api/admin/events/<int:event_id>', methods=['DELETE'])
+def api_admin_cancel_exam_event(event_id):
+    """Cancel an exam event and drop its unclaimed sessions. Sessions already started are kept."""
+    admin_payload = admin_required()
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute("SELECT status FROM ExamEvents WHERE eventID = :1", [event_id])
+        row = cur.fetchone()
+        if not row:
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Exam event not found'}), 404
+        exam_scheduler.cancel(cur, event_id)
+        conn.commit()
+        cur.close()
+        conn.close()
+        audit_admin(f"Exam Cancelled: event {event_id}", admin_payload)
+        cache_bus.publish('exam_event', event_id)
+        return jsonify({'ok': True, 'message': 'Exam event cancelled'}), 200
+    except Exception as e:
+        current_app.logger.exception('Error cancelling exam event: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+
+
+def _bank_format():
+    fmt = (request.args.get('format') or 'jsonl').lower()
+    return fmt if fmt in BANK_FORMATS else None
+
+
+def import_question_bank(conn, quiz_id, fmt):
+    """Stream the request body into the quiz and publish the result. Returns the import report."""
+    reader = read_csv if fmt == 'csv' else read_jsonl
+    importer = BankImporter(conn, quiz_id, batch_size=config.BANK_IMPORT_BATCH_SIZE)
+    report = importer.run(reader(request.stream))
+    if report['imported']:
+        cur = conn.cursor()
+        report['versionID'] = quiz_versions.publish(cur, quiz_id)
+        conn.commit()
+        cur.close()
+    return report
+
+
+@bp.route('/api/admin/quizzes/<int:quiz_id>/import', methods=['POST'])
+def api_admin_import_questions(quiz_id):
+    """Append questions to a quiz from a JSONL or CSV upload (?format=jsonl|csv, raw request body)."""
+    admin_payload = admin_required()
+    fmt = _bank_format()
+    if fmt is None:
+        return jsonify({'ok': False, 'message': 'format must be jsonl or csv'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute("SELECT title FROM Quiz WHERE quizID = :1", [quiz_id])
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
+        try:
+            report = import_question_bank(conn, quiz_id, fmt)
+        except (BankFormatError, UnicodeDecodeError, csv.Error) as e:
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Unreadable %s upload: %s' % (fmt, e)}), 400
+        conn.close()
+        audit_admin(f"Questions Imported: {row[0]}", admin_payload, f"{report['imported']} questions")
+        return jsonify({'ok': True, 'quizID': quiz_id, **report}), 200
+    except Exception as e:
+        current_app.logger.exception('Error importing questions: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while importing questions'}), 500
+
+
+@bp.route('/api/admin/quizzes/import', methods=['POST'])
+def api_admin_import_quiz():
+    """Create a quiz from a JSONL or CSV upload (?format=...&title=...&description=...&timelimit=...)."""
+    admin_payload = admin_required()
+    fmt = _bank_format()
+    if fmt is None:
+        return jsonify({'ok': False, 'message': 'format must be jsonl or csv'}), 400
+    title = (request.args.get('title') or '').strip()
+    if not title:
+        return jsonify({'ok': False, 'message': 'Quiz title is required'}), 400
+    try:
+        timelimit = int(request.args['timelimit']) if request.args.get('timelimit') else None
+    except ValueError:
+        return jsonify({'ok': False, 'message': 'timelimit must be a whole number of minutes'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        quiz_id_var = cur.var(oracledb.NUMBER)
+        cur.execute(
+            "INSERT INTO Quiz (title, description, timelimit) VALUES (:1, :2, :3) RETURNING quizID INTO :4",
+            [title, request.args.get('description') or '', timelimit, quiz_id_var]
+        )
+        quiz_id = int(quiz_id_var.getvalue()[0])
+        conn.commit()
+        cur.close()
+        try:
+            report = import_question_bank(conn, quiz_id, fmt)
+        except (BankFormatError, UnicodeDecodeError, csv.Error) as e:
+            report = None
+            message = 'Unreadable %s upload: %s' % (fmt, e)
+        if not report or not report['imported']:
+            # nothing usable: do not leave an empty quiz behind
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Quiz WHERE quizID = :1", [quiz_id])
+            conn.commit()
+            cur.close()
+            conn.close()
+            if report is None:
+                return jsonify({'ok': False, 'message': message}), 400
+            return jsonify({'ok': False, 'message': 'No valid questions in upload', **report}), 400
+        conn.close()
+        audit_admin(f"Quiz Imported: {title}", admin_payload, f"{report['imported']} questions")
+        return jsonify({'ok': True, 'quizID': quiz_id, **report}), 201
+    except Exception as e:
+        current_app.logger.exception('Error importing quiz: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while importing quiz'}), 500
+
+
+@bp.route('/api/admin/quizzes/<int:quiz_id>/export', methods=['GET'])
+def api_admin_export_questions(quiz_id):
+    """Stream a quiz's live questions as JSONL or CSV (?format=jsonl|csv)."""
+    admin_required()
+    fmt = _bank_format()
+    if fmt is None:
+        return jsonify({'ok': False, 'message': 'format must be jsonl or csv'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = read_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM Quiz WHERE quizID = :1", [quiz_id])
+        found = cur.fetchone()
+        cur.close()
+    except Exception as e:
+        current_app.logger.exception('Error exporting questions: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+    if not found:
+        conn.close()
+        return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
+
+    def generate():
+        try:
+            formatter = export_csv if fmt == 'csv' else export_jsonl
+            yield from formatter(iter_questions(conn, quiz_id))
+        except Exception:
+            # headers are already sent; the truncated body is all the client will see
+            current_app.logger.exception('Question export of quiz %s failed mid-stream', quiz_id)
+        finally:
+            conn.close()
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="quiz-{quiz_id}.{fmt}"'
+    return response
+
+
+@bp.route('/api/admin/audit', methods=['GET'])
+def api_admin_audit_log():
+    """Browse AdminLog newest first.
+
+    Query params: action (prefix, e.g. "ban"), actor (name), actor_id, since/until (ISO-8601 UTC),
+    limit, and cursor (the previous page's next_cursor).
+    """
+    admin_required()
+    args = request.args
+    try:
+        limit = max(1, min(int(args.get('limit') or 50), config.AUDIT_PAGE_MAX))
+        actor_id = int(args['actor_id']) if args.get('actor_id') else None
+        since = parse_utc(args.get('since'))
+        until = parse_utc(args.get('until'))
+        if args.get('cursor'):
+            decode_cursor(args['cursor'])
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'message': 'Invalid limit, actor_id, since, until or cursor'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = read_connection()
+        page = AuditLog.query(conn, action=args.get('action'), actor=args.get('actor'), actor_id=actor_id,
+                              since=since, until=until, cursor=args.get('cursor'), limit=limit)
+        conn.close()
+        return jsonify({'ok': True, **page}), 200
+    except Exception as e:
+        current_app.logger.exception('Error reading audit log: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+
+
+@bp.route('/api/admin/cache-bus', methods=['GET'])
+def api_admin_cache_bus():
+    """Cache invalidation bus status: transport, counters and propagation lag in ms."""
+    admin_required()
+    return jsonify({'ok': True, 'bus': cache_bus.snapshot()}), 200
+
+
+@bp.route('/api/admin/retention', methods=['GET'])
+def api_admin_retention_report():
+    """Dry-run retention report: sessions, answers and submissions an archive run would remove."""
+    admin_required()
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        report = retention_job.report()
+    except Exception as e:
+        current_app.logger.exception('Error building retention report: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+    report['retention_days'] = config.RETENTION_DAYS
+    report['window'] = config.RETENTION_WINDOW
+    return jsonify({'ok': True, 'report': report}), 200
+
+
+@bp.route('/api/admin/quizzes/<int:quiz_id>/results', methods=['GET'])
 def api_admin_quiz_results(quiz_id):
     """Return per-user results for a quiz (admin only): userID, name, email, score, passed, taken_at and total possible points."""
     try:
@@ -379,23 +1166,18 @@ def api_admin_quiz_results(quiz_id):
         return jsonify({'ok': True, 'quiz_results': [], 'total': 0}), 200
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = read_connection(admin_payload)
         cur = conn.cursor()
 
         # total possible points for this quiz
         tcur = conn.cursor()
-        tcur.execute("SELECT NVL(SUM(points),0) FROM Questions WHERE quizID = :1", [quiz_id])
+        tcur.execute("SELECT NVL(SUM(points),0) FROM Questions WHERE quizID = :1 AND retired = 'N'", [quiz_id])
         trow = tcur.fetchone()
         total_possible = float(trow[0]) if trow and trow[0] is not None else 0.0
         tcur.close()
 
         # fetch per-user latest UserQuiz rows for this quiz
-        cur.execute(
-            "SELECT uq.userID, u.name, u.email, uq.score, uq.passed, uq.taken_at "
-            "FROM UserQuiz uq JOIN Users u ON uq.userID = u.userID "
-            "WHERE uq.quizID = :1 ORDER BY uq.taken_at DESC",
-            [quiz_id]
-        )
+        cur.execute(queries.QUIZ_RESULTS, [quiz_id])
         results = []
         for row in cur.fetchall():
             user_id, name, email, score, passed, taken_at = row
@@ -412,11 +1194,11 @@ def api_admin_quiz_results(quiz_id):
         conn.close()
         return jsonify({'ok': True, 'quiz_results': results, 'total': total_possible}), 200
     except Exception as e:
-        app.logger.exception('Error fetching quiz results: %s', e)
+        current_app.logger.exception('Error fetching quiz results: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while fetching quiz results'}), 500
 
 
-@app.route('/api/quizzes', methods=['GET'])
+@bp.route('/api/quizzes', methods=['GET'])
 def api_get_quizzes():
     """Return available quizzes to users. If an Authorization bearer token is provided,
     include whether the user has already taken/passed each quiz (using UserQuiz table).
@@ -427,7 +1209,7 @@ def api_get_quizzes():
     if auth.startswith('Bearer '):
         token = auth.split(' ', 1)[1].strip()
         try:
-            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+            payload = decode_auth_token(token)
             user_id = payload.get('sub')
         except Exception:
             # ignore token errors; treat as anonymous
@@ -438,18 +1220,18 @@ def api_get_quizzes():
         return jsonify({'ok': True, 'quizzes': []}), 200
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
-        cur.execute("SELECT quizID, title, description, timelimit FROM Quiz ORDER BY created_at DESC")
+        cur.execute(queries.QUIZ_LIST)
         quizzes = []
         for row in cur.fetchall():
-            quizID, title, description, timelimit = row
+            quizID, title, description, timelimit, pool_size = row
             user_taken = False
             user_passed = False
             user_score = None
             if user_id:
                 uqcur = conn.cursor()
-                uqcur.execute("SELECT score, passed FROM UserQuiz WHERE quizID = :1 AND userID = :2 ORDER BY taken_at DESC", [quizID, user_id])
+                uqcur.execute(queries.USER_QUIZ_RESULT, [quizID, user_id])
                 urow = uqcur.fetchone()
                 if urow:
                     user_score = urow[0]
@@ -458,10 +1240,13 @@ def api_get_quizzes():
                 uqcur.close()
             # get question count
             qcur = conn.cursor()
-            qcur.execute("SELECT COUNT(*) FROM Questions WHERE quizID = :1", [quizID])
+            qcur.execute(queries.QUESTION_COUNT, [quizID])
             qc = qcur.fetchone()
             question_count = int(qc[0]) if qc else 0
             qcur.close()
+            # candidates see how many questions an attempt draws, not the size of the bank
+            if pool_size:
+                question_count = min(question_count, int(pool_size))
             quizzes.append({
                 'quizID': quizID,
                 'title': title,
@@ -475,25 +1260,31 @@ def api_get_quizzes():
         conn.close()
         return jsonify({'ok': True, 'quizzes': quizzes}), 200
     except Exception as e:
-        app.logger.exception('DB error fetching quizzes for users: %s', e)
+        current_app.logger.exception('DB error fetching quizzes for users: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
 
 
-@app.route('/api/quizzes/<int:quiz_id>/submit', methods=['POST'])
+@bp.route('/api/quizzes/<int:quiz_id>/submit', methods=['POST'])
 def api_submit_quiz(quiz_id):
     """Accept user's answers, grade the quiz, record Submissions and UserQuiz, and return score+passed.
 
-    Expected JSON: { answers: [ { questionID: <int>, answerID: <int> }, ... ] }
-    Pass criteria: score >= 50% of total points (simple default). Changeable later.
+    Expected JSON: { answers: [ { questionID: <int>, answerID: <int | [int, ...] for multi-select> }, ... ] }
+    Scoring (partial credit, negative marking) and the pass mark come from the quiz version's
+    compiled key; see grading.py.
+
+    Submits are idempotent: a retry carrying the same Idempotency-Key header (the session_id
+    when absent) gets the original response back without regrading. UserQuiz is unique per
+    (userID, quizID), so racing duplicates on other workers fail the insert instead of
+    grading twice.
     """
     auth = request.headers.get('Authorization', '')
     if not auth.startswith('Bearer '):
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error on submit quiz: %s', e)
+        current_app.logger.debug('JWT decode error on submit quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
 
     if payload.get('role') == 'banned':
@@ -512,31 +1303,78 @@ def api_submit_quiz(quiz_id):
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
+    idempotency_key = (request.headers.get('Idempotency-Key') or '').strip()[:128] or str(session_id)
+    result_key = (int(user_id), int(quiz_id))
+    cached = submit_results.get(result_key)
+    if cached is None and not submits_in_flight.enter(result_key, timeout=config.SUBMIT_WAIT_SECONDS):
+        # A duplicate arrived while the original was grading; it has finished (or timed out) now
+        cached = submit_results.get(result_key)
+        if cached is None:
+            return jsonify({'ok': False, 'message': 'Submission already in progress'}), 409
+    if cached is not None:
+        return replay_submit(cached, idempotency_key)
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        return _submit_quiz(user_id, quiz_id, session_id, answers, idempotency_key, submit_arrival_time(session_id))
+    finally:
+        submits_in_flight.leave(result_key)
+
+
+def replay_submit(cached, idempotency_key):
+    """Answer a repeated submit from the stored result of the first one."""
+    stored_key, body = cached
+    if stored_key != idempotency_key:
+        return jsonify({'ok': False, 'message': 'Quiz already taken'}), 403
+    response = jsonify(body)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, 200
+
+
+def _submit_quiz(user_id, quiz_id, session_id, answers, idempotency_key, arrived_at):
+    """Grade and record a submit. Called with the (userID, quizID) submit slot held.
+
+    The deadline is checked against ``arrived_at`` (when the submit reached the server),
+    not against when it got through the admission queue.
+    """
+
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
 
         # Validate session
         scur = conn.cursor()
-        scur.execute("SELECT userID, quizID, status, expires_at FROM Sessions WHERE session_id = :1", [session_id])
+        scur.execute(queries.SUBMIT_SESSION, [session_id])
         srow = scur.fetchone()
         scur.close()
         if not srow:
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Invalid session'}), 400
-        s_userid, s_quizid, s_status, s_expires = srow
+        s_userid, s_quizid, s_status, s_expires, s_version, s_seed, s_score = srow
         if int(s_userid) != int(user_id) or int(s_quizid) != int(quiz_id):
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Session does not belong to this user/quiz'}), 403
-        if s_status != 'active':
+        if s_status == 'submitted' and s_version is not None and idempotency_key == str(session_id):
+            # Retry whose first attempt was handled elsewhere (another worker, or the result
+            # cache expired): rebuild the response from the session instead of regrading
+            grading_key = quiz_versions.grading_key(conn, s_version)
+            selected = selected_question_ids(quiz_versions.snapshot(conn, s_version), s_seed)
+            cur.close()
+            conn.close()
+            response = jsonify({'ok': True, 'score': float(s_score or 0), 'total': grading_key.total(selected), 'details': []})
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response, 200
+        # A session that timed out while this submit sat in (or was shed from) the admission
+        # queue is still accepted if the submit arrived inside the grace window
+        arrived_in_time = s_expires is None or arrived_at <= (s_expires + timedelta(seconds=config.SESSION_GRACE_SECONDS))
+        timed_out = s_status == 'expired' and s_expires is not None and datetime.utcnow() > s_expires
+        if s_status != 'active' and not (timed_out and arrived_in_time):
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Session is not active'}), 403
         # Allow a small grace window to tolerate clock skew and network latency. If now is beyond
         # expires_at + grace, treat as expired. If within the grace window, allow the action.
-        if s_expires is not None and datetime.utcnow() > (s_expires + timedelta(seconds=SESSION_GRACE_SECONDS)):
+        if not arrived_in_time:
             # expire the session
             try:
                 ucur = conn.cursor()
@@ -544,108 +1382,76 @@ def api_submit_quiz(quiz_id):
                 conn.commit()
                 ucur.close()
             except Exception:
-                app.logger.exception('Failed to mark session expired')
+                current_app.logger.exception('Failed to mark session expired')
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Session expired'}), 403
 
         # Prevent multiple submissions (still guard by DB UserQuiz)
-        cur.execute("SELECT 1 FROM UserQuiz WHERE quizID = :1 AND userID = :2", [quiz_id, user_id])
+        cur.execute(queries.QUIZ_TAKEN, [quiz_id, user_id])
         if cur.fetchone():
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Quiz already taken'}), 403
 
-        # Load questions and correct answers and points
-        qcur = conn.cursor()
-        qcur.execute("SELECT questionID, points FROM Questions WHERE quizID = :1", [quiz_id])
-        question_map = { int(r[0]): float(r[1] or 0) for r in qcur.fetchall() }
-        qcur.close()
+        # Grade against the answer key of the version this session started on
+        if s_version is None:
+            # session started before versioning existed
+            s_version = quiz_versions.current_version(cur, quiz_id)
+        grading_key = quiz_versions.grading_key(conn, s_version)
+        # Only the questions drawn for this session (regenerated from its seed) count
+        selected = selected_question_ids(quiz_versions.snapshot(conn, s_version), s_seed)
+        if not selected:
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': 'No answers available to grade'}), 400
 
-        # Load correct answerIDs per question
-        acur = conn.cursor()
-        acur.execute("SELECT questionID, answerID FROM Answers WHERE questionID IN (SELECT questionID FROM Questions WHERE quizID = :1) AND is_correct = 'Y'", [quiz_id])
-        correct_map = {}
-        for r in acur.fetchall():
-            qid = int(r[0]); aid = int(r[1])
-            correct_map.setdefault(qid, set()).add(aid)
-        acur.close()
-
-        # Load any per-question saved answers for this session and merge with provided answers
-        saved_map = {}
+        # Saved per-question answers of this session, overridden by answers sent with the submit
+        responses = {}
         try:
-            sacur = conn.cursor()
-            sacur.execute("SELECT questionID, answerID FROM SessionAnswers WHERE session_id = :1", [session_id])
-            for r in sacur.fetchall():
+            for a in load_saved_answers(conn, session_id):
+                responses[a['questionID']] = a['answerID']
+        except Exception:
+            current_app.logger.exception('Failed to load SessionAnswers; continuing with provided answers')
+        if isinstance(answers, list):
+            for ans in answers:
                 try:
-                    saved_qid = int(r[0])
+                    qid = int(ans.get('questionID'))
                 except Exception:
                     continue
-                saved_aid = r[1]
-                # keep as-is (could be None)
-                saved_map[saved_qid] = saved_aid
-            sacur.close()
-        except Exception:
-            app.logger.exception('Failed to load SessionAnswers; continuing with provided answers')
+                if 'answerID' in ans:
+                    responses[qid] = ans.get('answerID')
 
-        # Merge provided answers into saved_map (provided answers take precedence)
         try:
-            if isinstance(answers, list):
-                for ans in answers:
-                    try:
-                        qid = int(ans.get('questionID'))
-                    except Exception:
-                        continue
-                    aid = ans.get('answerID') if ('answerID' in ans) else None
-                    saved_map[qid] = aid
-        except Exception:
-            app.logger.exception('Error merging provided answers')
-
-        # Build final_answers by iterating known questions (ensures we grade only quiz questions)
-        final_answers = []
-        for qid in question_map.keys():
-            final_answers.append({'questionID': qid, 'answerID': saved_map.get(qid)})
-
-        # If no answers available at all, return error
-        if len(final_answers) == 0:
-            return jsonify({'ok': False, 'message': 'No answers available to grade'}), 400
-
-        # Grade
-        total_possible = sum(question_map.values())
-        earned = 0.0
-        per_question_results = []
-        for ans in final_answers:
-            qid = int(ans.get('questionID'))
-            aid = int(ans.get('answerID')) if ans.get('answerID') is not None else None
-            correct_set = correct_map.get(qid, set())
-            correct = (aid in correct_set)
-            pts = float(question_map.get(qid, 0))
-            if correct:
-                earned += pts
-            per_question_results.append({'questionID': qid, 'selected': aid, 'correct': bool(correct), 'points': pts})
-
-        # Determine pass threshold (50%)
-        passed = False
-        if total_possible <= 0:
-            # defensive: if no points set, pass if all answers correct
-            passed = all(p['correct'] for p in per_question_results)
-        else:
-            passed = (earned / total_possible) >= 0.5
+            grade = grading_key.grade(selected, responses)
+        except (TypeError, ValueError):
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Answers must be answer IDs'}), 400
+        earned = grade.earned
+        total_possible = grade.total
+        passed = grade.passed
+        per_question_results = grade.details
+
+        # Insert UserQuiz row first: its unique (userID, quizID) constraint is what stops a
+        # duplicate submit racing on another worker
+        passed_flag = 'Y' if passed else 'N'
+        try:
+            cur.execute("INSERT INTO UserQuiz (userID, quizID, score, passed) VALUES (:1, :2, :3, :4)", [user_id, quiz_id, earned, passed_flag])
+        except oracledb.IntegrityError:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Quiz already taken'}), 403
 
         # Insert Submissions rows
-        for p in per_question_results:
-            iscorr = 'Y' if p['correct'] else 'N'
-            try:
-                cur.execute("INSERT INTO Submissions (userID, questionID, iscorrect) VALUES (:1, :2, :3)", [user_id, p['questionID'], iscorr])
-            except Exception:
-                app.logger.exception('Failed to insert submission for question %s', p['questionID'])
-
-        # Insert UserQuiz row
         try:
-            passed_flag = 'Y' if passed else 'N'
-            cur.execute("INSERT INTO UserQuiz (userID, quizID, score, passed) VALUES (:1, :2, :3, :4)", [user_id, quiz_id, earned, passed_flag])
+            cur.executemany(
+                "INSERT INTO Submissions (userID, questionID, iscorrect, points_earned, session_id) VALUES (:1, :2, :3, :4, :5)",
+                [[user_id, p['questionID'], 'Y' if p['correct'] else 'N', p['earned'], session_id] for p in per_question_results]
+            )
         except Exception:
-            app.logger.exception('Failed to insert UserQuiz row')
+            current_app.logger.exception('Failed to insert submissions for session %s', session_id)
 
         # Update session record as submitted
         try:
@@ -654,21 +1460,24 @@ def api_submit_quiz(quiz_id):
                          [earned, datetime.utcnow(), datetime.utcnow(), session_id])
             ucur.close()
         except Exception:
-            app.logger.exception('Failed to update session after submit')
+            current_app.logger.exception('Failed to update session after submit')
 
         conn.commit()
         cur.close()
         conn.close()
+        cache_bus.publish('attempts', user_id)
 
         # Return score and details but do NOT expose the pass/fail boolean to members here
-        return jsonify({'ok': True, 'score': earned, 'total': total_possible, 'details': per_question_results}), 200
+        body = {'ok': True, 'score': earned, 'total': total_possible, 'details': per_question_results}
+        submit_results.set((int(user_id), int(quiz_id)), (idempotency_key, body))
+        return jsonify(body), 200
 
     except Exception as e:
-        app.logger.exception('Error submitting quiz: %s', e)
+        current_app.logger.exception('Error submitting quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while submitting quiz'}), 500
 
 
-@app.route('/api/quizzes/<int:quiz_id>/answer', methods=['POST'])
+@bp.route('/api/quizzes/<int:quiz_id>/answer', methods=['POST'])
 def api_save_answer(quiz_id):
     """Save a single question answer for the current session.
     Expected JSON: { questionID: <int>, answerID: <int|null>, session_id: <uuid string> }
@@ -679,9 +1488,9 @@ def api_save_answer(quiz_id):
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error on save answer: %s', e)
+        current_app.logger.debug('JWT decode error on save answer: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
 
     if payload.get('role') == 'banned':
@@ -699,66 +1508,297 @@ def api_save_answer(quiz_id):
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
+    status, body = save_session_answer(user_id, quiz_id, session_id, question_id, answer_id)
+    return jsonify(body), status
+
+
+def save_session_answer(user_id, quiz_id, session_id, question_id, answer_id):
+    """Validate the session and upsert one SessionAnswers row. Returns (http_status, body).
+
+    Shared by the REST autosave endpoint and the session channel.
+    """
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
+        now = datetime.utcnow()
 
-        # validate session
-        scur = conn.cursor()
-        scur.execute("SELECT userID, quizID, status, expires_at FROM Sessions WHERE session_id = :1", [session_id])
-        srow = scur.fetchone()
-        scur.close()
-        if not srow:
-            cur.close()
-            conn.close()
-            return jsonify({'ok': False, 'message': 'Invalid session'}), 400
-        s_userid, s_quizid, s_status, s_expires = srow
-        if int(s_userid) != int(user_id) or int(s_quizid) != int(quiz_id):
-            cur.close()
-            conn.close()
-            return jsonify({'ok': False, 'message': 'Session does not belong to this user/quiz'}), 403
-        if s_status != 'active':
+        # Fast path: one statement validates ownership/status/expiry and takes the next
+        # per-session sequence number (the row lock also orders concurrent saves).
+        seq_var = cur.var(oracledb.NUMBER)
+        version_var = cur.var(oracledb.NUMBER)
+        seed_var = cur.var(oracledb.NUMBER)
+        cur.execute(
+            queries.CLAIM_ANSWER_SEQ + " RETURNING answer_seq, versionID, seed INTO :6, :7, :8",
+            [now, session_id, user_id, quiz_id, now - timedelta(seconds=config.SESSION_GRACE_SECONDS), seq_var, version_var, seed_var]
+        )
+        if cur.rowcount == 0:
+            # Slow path only to produce the precise error
+            conn.rollback()
+            status, body = _session_rejection(conn, user_id, quiz_id, session_id)
             cur.close()
             conn.close()
-            return jsonify({'ok': False, 'message': 'Session is not active'}), 403
-        # Allow a small grace window to tolerate clock skew and network latency. If now is beyond
-        # expires_at + grace, treat as expired. If within the grace window, allow the action.
-        if s_expires is not None and datetime.utcnow() > (s_expires + timedelta(seconds=SESSION_GRACE_SECONDS)):
+            return status, body
+        seq = int(seq_var.getvalue()[0])
+        version_id = version_var.getvalue()[0]
+        if version_id is not None:
+            # The question must be one drawn for this session and the answer one of its options
+            seed = seed_var.getvalue()[0]
+            question_id = int(question_id)
+            grading_key = quiz_versions.grading_key(conn, version_id)
+            selected = selected_question_ids(quiz_versions.snapshot(conn, version_id), seed)
             try:
-                ucur = conn.cursor()
-                ucur.execute("UPDATE Sessions SET status = 'expired', updated_at = :1 WHERE session_id = :2", [datetime.utcnow(), session_id])
-                conn.commit()
-                ucur.close()
-            except Exception:
-                app.logger.exception('Failed to mark session expired')
-            cur.close()
-            conn.close()
-            return jsonify({'ok': False, 'message': 'Session expired'}), 403
+                valid = question_id in selected and grading_key.accepts(question_id, answer_id)
+            except (TypeError, ValueError):
+                valid = False
+            if not valid:
+                conn.rollback()
+                cur.close()
+                conn.close()
+                return 400, {'ok': False, 'message': 'Question or answer is not part of this session'}
+            multi = grading_key.is_multi(question_id)
+        else:
+            multi = isinstance(answer_id, list)
+        # Multi-select picks go into answer_set ("12,15"); single choice keeps using answerID
+        if multi:
+            answer_set = ','.join(str(a) for a in sorted(set(answer_list(answer_id))))
+            answer_id = None
+        else:
+            answer_set = None
+            ids = answer_list(answer_id)
+            answer_id = ids[0] if ids else None
 
         # Upsert into SessionAnswers (update first, insert if no rows updated)
         try:
-            now = datetime.utcnow()
-            # Update
-            cur.execute("UPDATE SessionAnswers SET answerID = :1, updated_at = :2 WHERE session_id = :3 AND questionID = :4", [answer_id, now, session_id, question_id])
+            cur.execute(queries.UPDATE_SAVED_ANSWER, [answer_id, answer_set, now, seq, session_id, question_id])
             if cur.rowcount == 0:
-                # Insert
-                cur.execute("INSERT INTO SessionAnswers (session_id, userID, quizID, questionID, answerID, created_at, updated_at) VALUES (:1,:2,:3,:4,:5,:6,:7)", [session_id, user_id, quiz_id, question_id, answer_id, now, now])
+                cur.execute("INSERT INTO SessionAnswers (session_id, userID, quizID, questionID, answerID, answer_set, seq, created_at, updated_at) VALUES (:1,:2,:3,:4,:5,:6,:7,:8,:9)", [session_id, user_id, quiz_id, question_id, answer_id, answer_set, seq, now, now])
             conn.commit()
         except Exception:
-            app.logger.exception('Failed to upsert SessionAnswers')
+            current_app.logger.exception('Failed to upsert SessionAnswers')
             cur.close()
             conn.close()
-            return jsonify({'ok': False, 'message': 'Failed to save answer'}), 500
+            return 500, {'ok': False, 'message': 'Failed to save answer'}
 
         cur.close()
         conn.close()
-        return jsonify({'ok': True}), 200
+        return 200, {'ok': True, 'seq': seq}
     except Exception as e:
-        app.logger.exception('Error saving answer: %s', e)
-        return jsonify({'ok': False, 'message': 'Database error while saving answer'}), 500
+        current_app.logger.exception('Error saving answer: %s', e)
+        return 500, {'ok': False, 'message': 'Database error while saving answer'}
+
+
+def _session_rejection(conn, user_id, quiz_id, session_id):
+    """Explain why a session cannot accept answers, expiring it if its time ran out."""
+    scur = conn.cursor()
+    scur.execute("SELECT userID, quizID, status, expires_at FROM Sessions WHERE session_id = :1", [session_id])
+    srow = scur.fetchone()
+    scur.close()
+    if not srow:
+        return 400, {'ok': False, 'message': 'Invalid session'}
+    s_userid, s_quizid, s_status, s_expires = srow
+    if int(s_userid) != int(user_id) or int(s_quizid) != int(quiz_id):
+        return 403, {'ok': False, 'message': 'Session does not belong to this user/quiz'}
+    if s_status != 'active':
+        return 403, {'ok': False, 'message': 'Session is not active'}
+    try:
+        ucur = conn.cursor()
+        ucur.execute("UPDATE Sessions SET status = 'expired', updated_at = :1 WHERE session_id = :2", [datetime.utcnow(), session_id])
+        conn.commit()
+        ucur.close()
+    except Exception:
+        current_app.logger.exception('Failed to mark session expired')
+    return 403, {'ok': False, 'message': 'Session expired'}
+
+
+def _session_deadline(session_id: str):
+    """(status, expires_at) of a session as stored now; None when it cannot be read."""
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT status, expires_at FROM Sessions WHERE session_id = :1", [session_id])
+            row = cur.fetchone()
+            cur.close()
+        finally:
+            conn.close()
+    except Exception:
+        current_app.logger.exception('Failed to re-read session %s', session_id)
+        return None
+    return tuple(row) if row else ('missing', None)
+
 
+def _time_frame(expires_at) -> dict:
+    return {'t': 'time', 'server_now_ms': int(datetime.utcnow().timestamp() * 1000), 'remaining_ms': remaining_ms(expires_at)}
 
-@app.route('/api/quizzes/<int:quiz_id>/start', methods=['POST'])
+
+def session_channel(ws, quiz_id):
+    """Persistent per-session exam channel (WebSocket at /api/quizzes/<id>/channel?session_id=...).
+
+    The client authenticates once with {"t": "auth", "token": ...}; afterwards autosaves are
+    small frames {"t": "save", "id": n, "q": questionID, "a": answerID} answered with
+    {"t": "ack", "id": n, "seq": seq} or {"t": "err", "id": n, "message": ...}. The server pushes
+    {"t": "time"} sync frames, {"t": "expired"}, {"t": "notice"} and {"t": "revoked"}.
+    Clients without a channel keep using the REST endpoints.
+
+    The deadline is re-read from Sessions at every time sync and before an expiry is pushed,
+    so a deadline changed by another worker is honoured even if its channel event is lost.
+    """
+    session_id = request.args.get('session_id') or ''
+
+    def send(frame):
+        ws.send(json.dumps(frame))
+
+    try:
+        hello = json.loads(ws.receive(timeout=config.CHANNEL_AUTH_TIMEOUT) or '{}')
+        payload = decode_auth_token(hello.get('token') or '')
+    except Exception:
+        send({'t': 'error', 'message': 'Invalid or expired token'})
+        return
+    if payload.get('role') == 'banned':
+        send({'t': 'error', 'message': 'Banned users cannot take quizzes'})
+        return
+    if not ORACLE_AVAILABLE:
+        send({'t': 'error', 'message': 'Database not available'})
+        return
+    user_id = payload.get('sub')
+
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute("SELECT userID, quizID, status, expires_at FROM Sessions WHERE session_id = :1", [session_id])
+        srow = cur.fetchone()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        current_app.logger.exception('DB error opening session channel: %s', e)
+        send({'t': 'error', 'message': 'Database error'})
+        return
+    if not srow or int(srow[0]) != int(user_id) or int(srow[1]) != int(quiz_id) or srow[2] != 'active':
+        send({'t': 'error', 'message': 'Invalid session'})
+        return
+    expires_at = srow[3]
+
+    subscription = session_hub.subscribe(session_id, quiz_id, user_id)
+    try:
+        send(_time_frame(expires_at))
+        next_sync = time.monotonic() + config.CHANNEL_TIME_SYNC_SECONDS
+        while True:
+            for message in subscription.drain():
+                send(message)
+                if message.get('t') in ('expired', 'revoked'):
+                    return
+            if revocation_index.is_revoked(user_id, payload.get('iat')):
+                send({'t': 'revoked'})
+                return
+            # Tell the client at expiry (not after the grace window) so its auto-submit still lands
+            if expires_at is not None and datetime.utcnow() >= expires_at:
+                current = _session_deadline(session_id)
+                if current is None or current[0] != 'active' or (current[1] is not None and datetime.utcnow() >= current[1]):
+                    send({'t': 'expired'})
+                    return
+                expires_at = current[1]
+
+            raw = ws.receive(timeout=1)
+            if raw is None:
+                if time.monotonic() >= next_sync:
+                    current = _session_deadline(session_id)
+                    if current is not None:
+                        if current[0] != 'active':
+                            send({'t': 'expired'})
+                            return
+                        expires_at = current[1]
+                    send(_time_frame(expires_at))
+                    next_sync = time.monotonic() + config.CHANNEL_TIME_SYNC_SECONDS
+                continue
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                continue
+            kind = frame.get('t')
+            if kind == 'save':
+                if frame.get('q') is None:
+                    send({'t': 'err', 'id': frame.get('id'), 'message': 'questionID is required'})
+                    continue
+                if config.ADMISSION_ENABLED:
+                    try:
+                        admission.acquire('autosave')
+                    except Overloaded as e:
+                        send({'t': 'err', 'id': frame.get('id'), 'message': 'Server is busy', 'retry_after': e.retry_after})
+                        continue
+                    admitted_at = time.monotonic()
+                    try:
+                        status, body = save_session_answer(user_id, quiz_id, session_id, frame.get('q'), frame.get('a'))
+                    finally:
+                        admission.release('autosave', time.monotonic() - admitted_at)
+                else:
+                    status, body = save_session_answer(user_id, quiz_id, session_id, frame.get('q'), frame.get('a'))
+                if status == 200:
+                    send({'t': 'ack', 'id': frame.get('id'), 'seq': body.get('seq')})
+                else:
+                    send({'t': 'err', 'id': frame.get('id'), 'message': body.get('message')})
+                    if status == 403:
+                        send({'t': 'expired'})
+                        return
+            elif kind == 'ping':
+                send(_time_frame(expires_at))
+            elif kind == 'auth':
+                # Clients re-send their renewed access token; keep the newest claims
+                try:
+                    payload = decode_auth_token(frame.get('token') or '')
+                except Exception:
+                    send({'t': 'revoked'})
+                    return
+    except Exception as e:
+        # ConnectionClosed and friends: the client went away
+        current_app.logger.debug('Session channel %s closed: %s', session_id, e)
+    finally:
+        session_hub.unsubscribe(subscription)
+
+
+if sock is not None:
+    sock.route('/api/quizzes/<int:quiz_id>/channel', bp=bp)(session_channel)
+
+
+@bp.route('/api/admin/quizzes/<int:quiz_id>/notice', methods=['POST'])
+def api_admin_quiz_notice(quiz_id):
+    """Push a notice to every candidate connected to this quiz's session channels, on any worker."""
+    admin_required()
+    data = request.get_json() or {}
+    message = (data.get('message') or '').strip()
+    if not message:
+        return jsonify({'ok': False, 'message': 'Message is required'}), 400
+    if len(message) > config.CHANNEL_NOTICE_MAX_CHARS:
+        return jsonify({'ok': False, 'message': f'Message is longer than {config.CHANNEL_NOTICE_MAX_CHARS} characters'}), 400
+    push_channel('quiz', quiz_id, {'t': 'notice', 'message': message})
+    return jsonify({'ok': True, 'message': 'Notice sent'}), 200
+
+
+@bp.route('/api/admin/sessions/<session_id>/expire', methods=['POST'])
+def api_admin_expire_session(session_id):
+    """End a candidate's session now; a connected client is told immediately and auto-submits
+    within the usual grace window."""
+    admin_required()
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        now = datetime.utcnow()
+        cur.execute("UPDATE Sessions SET expires_at = :1, updated_at = :2 WHERE session_id = :3 AND status = 'active'", [now, now, session_id])
+        updated = cur.rowcount
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        current_app.logger.exception('Error expiring session: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while expiring session'}), 500
+    if not updated:
+        return jsonify({'ok': False, 'message': 'No active session with this id'}), 404
+    push_channel('session', session_id, {'t': 'expired'})
+    return jsonify({'ok': True, 'message': 'Session ended'}), 200
+
+
+@bp.route('/api/quizzes/<int:quiz_id>/start', methods=['POST'])
 def api_start_quiz(quiz_id):
     """Start a quiz for an authenticated user. Blocks if the user already took the quiz.
     Returns quiz questions and answers (answers do NOT include is_correct) so the client can render the test.
@@ -768,9 +1808,9 @@ def api_start_quiz(quiz_id):
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error on start quiz: %s', e)
+        current_app.logger.debug('JWT decode error on start quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
 
     if payload.get('role') == 'banned':
@@ -781,24 +1821,55 @@ def api_start_quiz(quiz_id):
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
+    # Exam events: candidates whose pre-allocated session this worker holds skip everything below
+    if service('exam_scheduler') is not None and exam_scheduler.open_event(quiz_id) is not None:
+        reserved = start_reserved_session(user_id, quiz_id)
+        if reserved is not None:
+            return reserved
+
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
         # check existence
-        cur.execute("SELECT 1 FROM UserQuiz WHERE quizID = :1 AND userID = :2", [quiz_id, user_id])
+        cur.execute(queries.QUIZ_TAKEN, [quiz_id, user_id])
         if cur.fetchone():
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Quiz already taken'}), 403
 
-        # fetch quiz basic info
-        cur.execute("SELECT quizID, title, description, timelimit FROM Quiz WHERE quizID = :1", [quiz_id])
-        qrow = cur.fetchone()
-        if not qrow:
+        # The window and the candidate list of exam events come from the tables, so they hold
+        # whether or not this worker has warmed the event
+        event = None
+        access = exam_access(cur, user_id, quiz_id)
+        if access is not None:
+            state, event = access
+            refusal = None
+            if state == 'not_eligible':
+                refusal = {'ok': False, 'message': 'You are not registered for this exam'}
+            elif state == 'not_started':
+                refusal = {'ok': False, 'message': 'Exam has not started yet', 'starts_at': event[1].isoformat()}
+            elif state == 'ended':
+                refusal = {'ok': False, 'message': 'Exam has ended'}
+            if refusal is not None:
+                cur.close()
+                conn.close()
+                return jsonify(refusal), 403
+            reservation = find_reservation(cur, user_id, quiz_id)
+            if reservation is not None:
+                reserved = start_reserved_session(user_id, quiz_id, reservation, conn=conn)
+                if reserved is not None:
+                    cur.close()
+                    conn.close()
+                    return reserved
+
+        # New sessions pin the quiz's current version
+        current_version = quiz_versions.current_version(cur, quiz_id)
+        if current_version is None:
             cur.close()
             conn.close()
             return jsonify({'ok': False, 'message': 'Quiz not found'}), 404
-        quizID, title, description, timelimit = qrow
+        conn.commit()
+        quizID = quiz_id
         # Create or resume a server-side session to enforce the timer
         # Accept optional "force" flag in request body or query string to create a new session even if an old one exists
         force = False
@@ -811,20 +1882,32 @@ def api_start_quiz(quiz_id):
         # also accept ?force=true
         if request.args.get('force') in ('1', 'true', 'True'):
             force = True
+        if event is not None:
+            # an exam clock is never restarted
+            force = False
 
         scur = conn.cursor()
         try:
             # If not forcing, try to find an active session
             if not force:
-                scur.execute("SELECT session_id, start_at, expires_at, status FROM Sessions WHERE userID = :1 AND quizID = :2 AND status = 'active' ORDER BY start_at DESC", [user_id, quizID])
+                scur.execute(queries.ACTIVE_SESSION, [user_id, quizID])
                 srow = scur.fetchone()
             else:
                 srow = None
 
+            saved_answers = []
+            answer_seq = 0
             if srow:
                 session_id = srow[0]
+                logs.bind(session_id=session_id)
                 start_at = srow[1]
                 expires_at = srow[2]
+                answer_seq = int(srow[4] or 0)
+                version_id = int(srow[5]) if srow[5] is not None else current_version
+                seed = int(srow[6]) if srow[6] is not None else None
+                # Resuming: hand back what the candidate already saved so the client can restore it
+                if answer_seq > 0:
+                    saved_answers = load_saved_answers(conn, session_id)
             else:
                 # If forcing, expire any existing active sessions first
                 if force:
@@ -832,9 +1915,13 @@ def api_start_quiz(quiz_id):
                         scur.execute("UPDATE Sessions SET status='expired', updated_at = :1 WHERE userID = :2 AND quizID = :3 AND status = 'active'", [datetime.utcnow(), user_id, quizID])
                         conn.commit()
                     except Exception:
-                        app.logger.exception('Failed to expire existing sessions during force start')
+                        current_app.logger.exception('Failed to expire existing sessions during force start')
 
                 session_id = str(uuid.uuid4())
+                logs.bind(session_id=session_id)
+                version_id = current_version
+                seed = new_seed()
+                timelimit = quiz_versions.snapshot(conn, version_id)['timelimit']
                 start_at = datetime.utcnow()
                 expires_at = None
                 try:
@@ -842,70 +1929,147 @@ def api_start_quiz(quiz_id):
                         expires_at = start_at + timedelta(minutes=int(timelimit))
                 except Exception:
                     expires_at = None
+                event_id = None
+                if event is not None:
+                    # a candidate added after the event was prepared: the session still ends with the event
+                    event_id = event[0]
+                    expires_at = event[2] if expires_at is None else min(expires_at, event[2])
                 # Insert session
                 try:
                     scur.execute(
-                        "INSERT INTO Sessions (session_id, userID, quizID, start_at, expires_at, status, client_ip, user_agent, created_at, updated_at) VALUES (:1,:2,:3,:4,:5,:6,:7,:8,:9,:10)",
-                        [session_id, user_id, quizID, start_at, expires_at, 'active', request.remote_addr, request.headers.get('User-Agent'), datetime.utcnow(), datetime.utcnow()]
+                        "INSERT INTO Sessions (session_id, userID, quizID, versionID, seed, start_at, expires_at, status, client_ip, user_agent, created_at, updated_at, eventID) VALUES (:1,:2,:3,:4,:5,:6,:7,:8,:9,:10,:11,:12,:13)",
+                        [session_id, user_id, quizID, version_id, seed, start_at, expires_at, 'active', request.remote_addr, request.headers.get('User-Agent'), datetime.utcnow(), datetime.utcnow(), event_id]
                     )
                     conn.commit()
                 except Exception:
-                    app.logger.exception('Failed to create session')
+                    current_app.logger.exception('Failed to create session')
         finally:
             scur.close()
 
-        # fetch questions and answers (without is_correct)
-        qcur = conn.cursor()
-        qcur.execute("SELECT questionID, title, category, difficulty, points, description FROM Questions WHERE quizID = :1 ORDER BY questionID", [quizID])
-        questions = []
-        for q in qcur.fetchall():
-            questionID, qtitle, qcategory, qdifficulty, qpoints, qdesc = q
-            acur = conn.cursor()
-            acur.execute("SELECT answerID, answer_text FROM Answers WHERE questionID = :1 ORDER BY answerID", [questionID])
-            answers = []
-            for a in acur.fetchall():
-                aid, atext = a
-                answers.append({'answerID': int(aid), 'text': atext})
-            acur.close()
-            questions.append({'questionID': int(questionID), 'title': qtitle, 'category': qcategory, 'difficulty': qdifficulty, 'points': qpoints, 'description': qdesc, 'answers': answers})
-        qcur.close()
+        # quiz content comes from the immutable snapshot of the pinned version, narrowed and
+        # ordered by the session seed
+        quiz = session_payload(quiz_versions.candidate_payload(conn, version_id), seed)
         cur.close()
         conn.close()
 
-        # Return session info with both ISO strings and epoch-ms fields for robustness
-        session_info = {'session_id': session_id}
-        try:
-            session_info['start_at'] = start_at.isoformat() if start_at else None
-            session_info['expires_at'] = expires_at.isoformat() if expires_at else None
-            session_info['start_at_ms'] = int(start_at.timestamp() * 1000) if start_at else None
-            session_info['expires_at_ms'] = int(expires_at.timestamp() * 1000) if expires_at else None
-            # include server's current time in ms to allow clients to compensate for clock skew
-            session_info['server_now_ms'] = int(datetime.utcnow().timestamp() * 1000)
-        except Exception:
-            session_info['start_at'] = str(start_at) if start_at else None
-            session_info['expires_at'] = str(expires_at) if expires_at else None
-            try:
-                session_info['start_at_ms'] = int(start_at.timestamp() * 1000) if start_at else None
-            except Exception:
-                session_info['start_at_ms'] = None
-            try:
-                session_info['expires_at_ms'] = int(expires_at.timestamp() * 1000) if expires_at else None
-            except Exception:
-                session_info['expires_at_ms'] = None
-            try:
-                session_info['server_now_ms'] = int(datetime.utcnow().timestamp() * 1000)
-            except Exception:
-                session_info['server_now_ms'] = None
+        session_info = session_info_payload(session_id, start_at, expires_at, answer_seq, saved_answers)
+        return jsonify({'ok': True, 'quiz': quiz, 'session': session_info}), 200
+    except Exception as e:
+        current_app.logger.exception('Error starting quiz: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while starting quiz'}), 500
 
-        return jsonify({'ok': True, 'quiz': {'quizID': quizID, 'title': title, 'description': description, 'timelimit': timelimit, 'questions': questions}, 'session': session_info}), 200
+
+def start_reserved_session(user_id, quiz_id, reservation=None, conn=None):
+    """Start a session pre-allocated for an exam event: an in-memory lookup plus one UPDATE.
+
+    ``reservation`` defaults to the one this worker holds in memory; ``conn`` is left open
+    for the caller when given. Returns the /start response, or None when the user holds no
+    usable reservation.
+    """
+    if reservation is None:
+        reservation = exam_scheduler.reservation(user_id, quiz_id)
+    if reservation is None:
+        return None
+    now = datetime.utcnow()
+    if now < reservation['starts_at']:
+        return jsonify({'ok': False, 'message': 'Exam has not started yet', 'starts_at': reservation['starts_at'].isoformat()}), 403
+    if now >= reservation['ends_at']:
+        return jsonify({'ok': False, 'message': 'Exam has ended'}), 403
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        version_id = reservation['versionID']
+        timelimit = quiz_versions.snapshot(conn, version_id)['timelimit']
+        expires_at = reservation['ends_at']
+        if timelimit is not None:
+            expires_at = min(expires_at, now + timedelta(minutes=int(timelimit)))
+        cur.execute(
+            "UPDATE Sessions SET status = 'active', start_at = :1, expires_at = :2, client_ip = :3, user_agent = :4, updated_at = :5 "
+            "WHERE session_id = :6 AND status = 'reserved'",
+            [now, expires_at, request.remote_addr, request.headers.get('User-Agent'), now, reservation['session_id']]
+        )
+        flipped = cur.rowcount == 1
+        conn.commit()
+        exam_scheduler.consume(user_id, quiz_id)
+        if not flipped:
+            # Claimed through another worker already: resume through the regular path
+            cur.close()
+            if own_conn:
+                conn.close()
+            return None
+        quiz = session_payload(quiz_versions.candidate_payload(conn, version_id), reservation['seed'])
+        cur.close()
+        if own_conn:
+            conn.close()
     except Exception as e:
-        app.logger.exception('Error starting quiz: %s', e)
+        current_app.logger.exception('Error starting reserved session: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while starting quiz'}), 500
-    
-@app.route('/api/admin/quizzes', methods=['POST'])
+    session_info = session_info_payload(reservation['session_id'], now, expires_at)
+    return jsonify({'ok': True, 'quiz': quiz, 'session': session_info}), 200
+
+
+@bp.route('/api/quizzes/<int:quiz_id>/sessions/<session_id>/answers', methods=['GET'])
+def api_session_answers(quiz_id, session_id):
+    """Return answers saved in a session after sequence number ``since`` (default 0 = all).
+
+    Lets a client on a flaky connection resync incrementally: it sends the last ``seq`` it
+    has seen and gets back only newer saves plus the current sequence and remaining time.
+    """
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
+    token = auth.split(' ', 1)[1].strip()
+    try:
+        payload = decode_auth_token(token)
+    except Exception as e:
+        current_app.logger.debug('JWT decode error on session answers: %s', e)
+        return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
+
+    user_id = payload.get('sub')
+    try:
+        since = max(0, int(request.args.get('since', 0)))
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'message': 'since must be an integer'}), 400
+
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        cur = conn.cursor()
+        cur.execute("SELECT userID, quizID, status, expires_at, answer_seq FROM Sessions WHERE session_id = :1", [session_id])
+        srow = cur.fetchone()
+        cur.close()
+        if not srow:
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Invalid session'}), 400
+        s_userid, s_quizid, s_status, s_expires, s_seq = srow
+        if int(s_userid) != int(user_id) or int(s_quizid) != int(quiz_id):
+            conn.close()
+            return jsonify({'ok': False, 'message': 'Session does not belong to this user/quiz'}), 403
+        seq = int(s_seq or 0)
+        answers = load_saved_answers(conn, session_id, since) if seq > since else []
+        conn.close()
+        return jsonify({
+            'ok': True,
+            'answers': answers,
+            'seq': seq,
+            'status': s_status,
+            'remaining_ms': remaining_ms(s_expires),
+            'server_now_ms': int(datetime.utcnow().timestamp() * 1000)
+        }), 200
+    except Exception as e:
+        current_app.logger.exception('Error loading session answers: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while loading answers'}), 500
+
+
+@bp.route('/api/admin/quizzes', methods=['POST'])
 def api_admin_create_quiz():
     """Create a quiz with questions and answers. Expects JSON:
-    { title, description, timelimit, questions: [ { title, category, difficulty, points, description, answers: [{ text, is_correct }] } ] }
+    { title, description, timelimit, pass_threshold (0-1, default 0.5), questions: [ { title, category, difficulty, points, description,
+      multi_select, partial_credit, penalty, answers: [{ text, is_correct }] } ] }
     """
     payload = request.get_json() or {}
     title = (payload.get('title') or '').strip()
@@ -917,6 +2081,13 @@ def api_admin_create_quiz():
         return jsonify({'ok': False, 'message': 'Quiz title is required'}), 400
     if not isinstance(questions, list) or len(questions) == 0:
         return jsonify({'ok': False, 'message': 'At least one question is required'}), 400
+    selection, error = quiz_selection_settings(payload)
+    if error:
+        return jsonify({'ok': False, 'message': error}), 400
+    pass_threshold, error = quiz_pass_threshold(payload)
+    if error:
+        return jsonify({'ok': False, 'message': error}), 400
+    selection.append(0.5 if pass_threshold is None else pass_threshold)
 
     # admin check
     try:
@@ -929,20 +2100,25 @@ def api_admin_create_quiz():
         return jsonify({'ok': False, 'message': 'Database not available'}), 503
 
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
         cur = conn.cursor()
 
         # Insert quiz and get generated quizID
         try:
             quiz_id_var = cur.var(oracledb.NUMBER)
             cur.execute(
-                "INSERT INTO Quiz (title, description, timelimit) VALUES (:1, :2, :3) RETURNING quizID INTO :4",
-                [title, description, timelimit, quiz_id_var]
+                "INSERT INTO Quiz (title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, pass_threshold) "
+                "VALUES (:1, :2, :3, :4, :5, :6, :7, :8) RETURNING quizID INTO :9",
+                [title, description, timelimit] + selection + [quiz_id_var]
             )
             quiz_id = int(quiz_id_var.getvalue()[0])
         except Exception:
             # Fallback: insert without returning and select last inserted by title (less safe)
-            cur.execute("INSERT INTO Quiz (title, description, timelimit) VALUES (:1, :2, :3)", [title, description, timelimit])
+            cur.execute(
+                "INSERT INTO Quiz (title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, pass_threshold) "
+                "VALUES (:1, :2, :3, :4, :5, :6, :7, :8)",
+                [title, description, timelimit] + selection
+            )
             conn.commit()
             # Attempt to retrieve recent quiz with same title
             cur.execute("SELECT quizID FROM (SELECT quizID FROM Quiz WHERE title = :1 ORDER BY created_at DESC) WHERE ROWNUM = 1", [title])
@@ -965,8 +2141,9 @@ def api_admin_create_quiz():
                 continue
             qid_var = cur.var(oracledb.NUMBER)
             cur.execute(
-                "INSERT INTO Questions (quizID, title, category, difficulty, points, description) VALUES (:1, :2, :3, :4, :5, :6) RETURNING questionID INTO :7",
-                [quiz_id, qtitle, qcategory, qdifficulty, qpoints, qdesc, qid_var]
+                "INSERT INTO Questions (quizID, title, category, difficulty, points, description, multi_select, partial_credit, penalty) "
+                "VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9) RETURNING questionID INTO :10",
+                [quiz_id, qtitle, qcategory, qdifficulty, qpoints, qdesc] + question_scoring(q) + [qid_var]
             )
             question_id = int(qid_var.getvalue()[0])
             answers = q.get('answers') or []
@@ -980,45 +2157,38 @@ def api_admin_create_quiz():
                     [question_id, atext, is_correct]
                 )
 
-        # Log admin action: Quiz Added
-        try:
-            action = 'Quiz Added'
-            log_reason = f"By {admin_payload.get('name')}"
-            cur.execute("INSERT INTO AdminLog (action, reason) VALUES (:1, :2)", [action, log_reason])
-        except Exception:
-            app.logger.exception('Failed to write AdminLog for quiz creation')
+        # Publish the first immutable version
+        version_id = quiz_versions.publish(cur, quiz_id)
 
         # Commit everything
         conn.commit()
         cur.close()
         conn.close()
-        return jsonify({'ok': True, 'message': 'Quiz created', 'quizID': quiz_id}), 201
+        audit_admin('Quiz Added', admin_payload)
+        return jsonify({'ok': True, 'message': 'Quiz created', 'quizID': quiz_id, 'versionID': version_id}), 201
 
     except Exception as e:
-        app.logger.exception('Error creating quiz: %s', e)
+        current_app.logger.exception('Error creating quiz: %s', e)
         return jsonify({'ok': False, 'message': 'Database error while creating quiz'}), 500
 
-def send_verification_email(to_email: str, code: str) -> None:
-    """Send a simple verification email containing the 5-digit code using Gmail SMTP.
+def mail_configured() -> bool:
+    """Mail needs a sender; credentials are optional so a local SMTP stand-in can be used."""
+    return bool(config.MAIL_USER) and (bool(config.MAIL_APP_PASSWORD) or not config.MAIL_USE_SSL)
+
+
+def send_verification_email(to_email: str, code: str) -> bool:
+    """Queue a simple verification email containing the 5-digit code.
 
-    Requires MAIL_USER and MAIL_APP_PASSWORD set in environment.
+    Delivery happens on the mail dispatcher thread; returns False if mail is not
+    configured or the queue is full.
     """
-    if not MAIL_USER or not MAIL_APP_PASSWORD:
-        app.logger.warning("Mail credentials not configured; skipping send for %s", to_email)
-        return
+    if not mail_configured():
+        current_app.logger.warning("Mail credentials not configured; skipping send for %s", to_email)
+        return False
 
     subject = "Your SecuriQuiz verification code"
     body = f"Your SecuriQuiz verification code is: {code}\n\nThis code expires in 10 minutes."
-    message = f"From: {MAIL_USER}\r\nTo: {to_email}\r\nSubject: {subject}\r\n\r\n{body}"
-
-    context = ssl.create_default_context()
-    try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as server:
-            server.login(MAIL_USER, MAIL_APP_PASSWORD)
-            server.sendmail(MAIL_USER, to_email, message)
-        app.logger.info("Sent verification email to %s", to_email)
-    except Exception as e:
-        app.logger.exception("Failed to send verification email: %s", e)
+    return mail_dispatcher.enqueue(to_email, subject, body)
 
 
 def _cleanup_expired():
@@ -1028,7 +2198,7 @@ def _cleanup_expired():
     for email in expired:
         pending_signups.pop(email, None)
 
-@app.route('/api/signup', methods=['POST'])
+@bp.route('/api/signup', methods=['POST'])
 def api_signup():
     data = request.get_json() or {}
     full_name = (data.get('full_name') or '').strip()
@@ -1043,14 +2213,14 @@ def api_signup():
     # If DB is available, check whether the email already exists in Users
     if ORACLE_AVAILABLE:
         try:
-            conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+            conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
             cur = conn.cursor()
             cur.execute("SELECT userID FROM Users WHERE email = :1", [email])
             existing = cur.fetchone()
             cur.close()
             conn.close()
         except Exception as e:
-            app.logger.exception('DB error checking existing user: %s', e)
+            current_app.logger.exception('DB error checking existing user: %s', e)
             return jsonify({'ok': False, 'message': 'Database error while checking existing user'}), 500
 
         if existing:
@@ -1058,8 +2228,11 @@ def api_signup():
 
     # If already pending, allow resending a new code
     code = str(random.randint(10000, 99999))
-    password_hash = generate_password_hash(password)
-    code_hash = generate_password_hash(code)
+    try:
+        password_hash = password_hasher.hash(password)
+    except HashingBusy:
+        return jsonify({'ok': False, 'message': 'Server busy, please retry'}), 503
+    code_hash = code_digest(config.VERIFY_CODE_SECRET, email, code)
     pending_signups[email] = {
         'full_name': full_name,
         'password_hash': password_hash,
@@ -1069,23 +2242,23 @@ def api_signup():
         'blocked_until': 0
     }
 
-    # Send email (best-effort)
+    # Queue email (best-effort); delivery happens in the background
     try:
         send_verification_email(email, code)
     except Exception:
-        app.logger.exception('Error sending verification email')
+        current_app.logger.exception('Error queueing verification email')
 
     # Log creation (do not log the verification code)
-    app.logger.info('Pending signup created for %s, expires_in=10m', email)
+    current_app.logger.info('Pending signup created for %s, expires_in=10m', email)
 
     # If mail isn't configured, return a generic acknowledgment (do not return the code)
-    if not MAIL_USER or not MAIL_APP_PASSWORD:
+    if not mail_configured():
         return jsonify({'ok': True, 'message': 'Verification code generated'}), 200
 
     return jsonify({'ok': True, 'message': 'Verification code sent to email'}), 200
 
 
-@app.route('/api/verify', methods=['POST'])
+@bp.route('/api/verify', methods=['POST'])
 def api_verify():
     data = request.get_json() or {}
     email = (data.get('email') or '').strip().lower()
@@ -1117,25 +2290,22 @@ def api_verify():
         pending_signups.pop(email, None)
         return jsonify({'ok': False, 'message': 'No pending signup for this email or code expired'}), 400
 
-    try:
-        valid = check_password_hash(pending['code_hash'], code)
-    except Exception:
-        valid = False
+    valid = check_code(config.VERIFY_CODE_SECRET, email, code, pending['code_hash'])
 
     if not valid:
         # increment attempts and possibly lock
         pending['attempts'] = pending.get('attempts', 0) + 1
-        if pending['attempts'] >= MAX_VERIFY_ATTEMPTS:
-            pending['blocked_until'] = now + LOCKOUT_SECONDS
-            app.logger.warning('Pending signup for %s locked due to too many failed attempts', email)
+        if pending['attempts'] >= config.MAX_VERIFY_ATTEMPTS:
+            pending['blocked_until'] = now + config.LOCKOUT_SECONDS
+            current_app.logger.warning('Pending signup for %s locked due to too many failed attempts', email)
         return jsonify({'ok': False, 'message': 'Invalid verification code'}), 400
 
     # Create user in the database (if driver available)
     if not ORACLE_AVAILABLE:
-        app.logger.warning('oracledb not available; skipping DB insert for %s (dev mode)', email)
+        current_app.logger.warning('oracledb not available; skipping DB insert for %s (dev mode)', email)
     else:
         try:
-            conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+            conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
             cur = conn.cursor()
             insert_sql = "INSERT INTO Users (name, email, password, role) VALUES (:1, :2, :3, :4)"
             cur.execute(insert_sql, [pending['full_name'], email, pending['password_hash'], 'member'])
@@ -1143,16 +2313,17 @@ def api_verify():
             cur.close()
             conn.close()
         except Exception as e:
-            app.logger.exception('Failed to create user: %s', e)
+            current_app.logger.exception('Failed to create user: %s', e)
             return jsonify({'ok': False, 'message': 'Failed to create user (maybe duplicate email)'}), 500
 
-    # remove pending
+    # remove pending; drop any cached "unknown email" entry so the new user can log in
     pending_signups.pop(email, None)
+    cache_bus.publish('login', email)
 
     return jsonify({'ok': True, 'message': 'Email verified and account created'}), 200
 
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])
 def api_login():
     data = request.get_json() or {}
     email = (data.get('email') or '').strip().lower()
@@ -1161,58 +2332,181 @@ def api_login():
     if not email or not password:
         return jsonify({'ok': False, 'message': 'email and password are required'}), 400
 
+    # Throttle per client IP and per target email before touching the DB or the KDF
+    for limiter, key in ((login_ip_limiter, request.remote_addr or ''), (login_email_limiter, email)):
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            resp = jsonify({'ok': False, 'message': 'Too many login attempts. Try again later.'})
+            resp.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return resp, 429
+
     # If Oracle driver is available, check persistent Users table
     if ORACLE_AVAILABLE:
-        try:
-            conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
-            cur = conn.cursor()
-            cur.execute("SELECT userID, name, email, password, role FROM Users WHERE email = :1", [email])
-            row = cur.fetchone()
-            cur.close()
-            conn.close()
-        except Exception as e:
-            app.logger.exception('DB error during login: %s', e)
-            return jsonify({'ok': False, 'message': 'Database error during login'}), 500
+        row = user_auth_cache.get(email, False)
+        if row is False:
+            version = cache_bus.version('login', email)
+            try:
+                conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+                cur = conn.cursor()
+                cur.execute(queries.LOGIN_BY_EMAIL, [email])
+                row = cur.fetchone()
+                cur.close()
+                conn.close()
+            except Exception as e:
+                current_app.logger.exception('DB error during login: %s', e)
+                return jsonify({'ok': False, 'message': 'Database error during login'}), 500
+            # Cache misses too, so repeated attempts for unknown emails stay off Oracle. Skip it if
+            # the row was invalidated (e.g. a ban) while we were reading it.
+            if cache_bus.version('login', email) == version:
+                user_auth_cache.set(email, tuple(row) if row else None)
 
         if not row:
             return jsonify({'ok': False, 'message': 'Invalid email or password'}), 401
 
         userID, name, email_db, pw_hash, role = row
-        if not check_password_hash(pw_hash, password):
-            return jsonify({'ok': False, 'message': 'Invalid email or password'}), 401
+        try:
+            if not password_hasher.verify(pw_hash, password):
+                return jsonify({'ok': False, 'message': 'Invalid email or password'}), 401
+        except HashingBusy:
+            return jsonify({'ok': False, 'message': 'Server busy, please retry'}), 503
+
+        # Transparently upgrade hashes produced with older KDF parameters
+        if password_hasher.needs_rehash(pw_hash):
+            try:
+                new_hash = password_hasher.hash(password)
+                conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+                cur = conn.cursor()
+                cur.execute("UPDATE Users SET password = :1 WHERE userID = :2 AND password = :3", [new_hash, userID, pw_hash])
+                conn.commit()
+                cur.close()
+                conn.close()
+                user_auth_cache.set(email, (userID, name, email_db, new_hash, role))
+            except Exception:
+                current_app.logger.exception('Failed to rehash password for user %s', userID)
 
         user = {'userID': userID, 'name': name, 'email': email_db, 'role': role}
-        # Issue JWT
-        payload = {
-            'sub': userID,
-            'name': name,
-            'email': email_db,
-            'role': role,
-            'exp': datetime.utcnow() + timedelta(seconds=JWT_EXP_SECONDS)
-        }
-        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
-        return jsonify({'ok': True, 'message': 'Logged in', 'user': user, 'token': token}), 200
+        user_profile_cache.set(int(userID), {'name': name, 'email': email_db})
+        # Issue a compact access token plus a rotating refresh token
+        token = token_signer.issue(userID, role)
+        try:
+            refresh_token = refresh_store.create(userID)
+        except Exception:
+            current_app.logger.exception('Failed to create refresh token for user %s', userID)
+            refresh_token = None
+        return jsonify({'ok': True, 'message': 'Logged in', 'user': user, 'token': token,
+                        'refresh_token': refresh_token, 'expires_in': config.JWT_EXP_SECONDS}), 200
 
     return jsonify({'ok': False, 'message': 'Database not available or invalid credentials'}), 503
 
 
-@app.route('/api/me', methods=['GET'])
+@bp.route('/api/token/refresh', methods=['POST'])
+def api_token_refresh():
+    """Exchange a refresh token for a new access token and a new (rotated) refresh token."""
+    data = request.get_json() or {}
+    refresh_token = (data.get('refresh_token') or '').strip()
+    if not refresh_token:
+        return jsonify({'ok': False, 'message': 'refresh_token is required'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': False, 'message': 'Database not available'}), 503
+    try:
+        user_id, role, new_refresh = refresh_store.rotate(refresh_token)
+    except RefreshTokenError as e:
+        return jsonify({'ok': False, 'message': str(e)}), 401
+    except Exception as e:
+        current_app.logger.exception('Error refreshing token: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error while refreshing token'}), 500
+    token = token_signer.issue(user_id, role)
+    return jsonify({'ok': True, 'token': token, 'refresh_token': new_refresh, 'expires_in': config.JWT_EXP_SECONDS}), 200
+
+
+@bp.route('/api/logout', methods=['POST'])
+def api_logout():
+    """Revoke the caller's refresh token family. Access tokens simply expire."""
+    data = request.get_json() or {}
+    refresh_token = (data.get('refresh_token') or '').strip()
+    if refresh_token and ORACLE_AVAILABLE:
+        try:
+            refresh_store.revoke(refresh_token)
+        except Exception:
+            current_app.logger.exception('Failed to revoke refresh token on logout')
+    return jsonify({'ok': True}), 200
+
+
+@bp.route('/api/me', methods=['GET'])
 def api_me():
-    """Return authenticated user info when provided a valid Bearer JWT."""
+    """Return authenticated user info when provided a valid Bearer JWT.
+
+    Role and ID come from the token claims; name and email from the cached profile.
+    """
     auth = request.headers.get('Authorization', '')
     if not auth.startswith('Bearer '):
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error: %s', e)
+        current_app.logger.debug('JWT decode error: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
 
-    user = {'userID': payload.get('sub'), 'name': payload.get('name'), 'email': payload.get('email'), 'role': payload.get('role')}
+    profile = get_user_profile(payload.get('sub')) or {}
+    user = {
+        'userID': payload.get('sub'),
+        'name': profile.get('name', payload.get('name')),
+        'email': profile.get('email', payload.get('email')),
+        'role': payload.get('role')
+    }
     return jsonify({'ok': True, 'user': user}), 200
 
-@app.route('/api/admin/users', methods=['GET'])
+@bp.route('/api/me/attempts', methods=['GET'])
+def api_my_attempts():
+    """The caller's graded attempts, newest first, with quiz titles and totals.
+
+    Query params: limit, cursor (the previous page's next_cursor) and details=1 for the
+    per-question breakdown. Pages are cached per user and dropped when they submit.
+    """
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
+    token = auth.split(' ', 1)[1].strip()
+    try:
+        payload = decode_auth_token(token)
+    except Exception as e:
+        current_app.logger.debug('JWT decode error: %s', e)
+        return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
+
+    user_id = int(payload.get('sub'))
+    cursor = request.args.get('cursor') or None
+    details = request.args.get('details', '').lower() in ('1', 'true', 'yes')
+    try:
+        limit = max(1, min(int(request.args.get('limit') or 20), config.ATTEMPTS_PAGE_MAX))
+        if cursor:
+            decode_cursor(cursor)
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'message': 'Invalid limit or cursor'}), 400
+    if not ORACLE_AVAILABLE:
+        return jsonify({'ok': True, 'attempts': [], 'next_cursor': None}), 200
+
+    key = (cursor, limit, details)
+    pages = attempt_cache.get(user_id)
+    if pages is not None and key in pages:
+        return jsonify({'ok': True, **pages[key]}), 200
+    version = cache_bus.version('attempts', user_id)
+    try:
+        conn = read_connection(payload)
+        page = query_attempts(conn, user_id, cursor=cursor, limit=limit, details=details, snapshot=quiz_versions.snapshot)
+        conn.close()
+    except Exception as e:
+        current_app.logger.exception('DB error fetching attempts: %s', e)
+        return jsonify({'ok': False, 'message': 'Database error'}), 500
+    # a submit that landed while this page was loading invalidates it
+    if cache_bus.version('attempts', user_id) == version:
+        pages = attempt_cache.get(user_id) or {}
+        pages[key] = page
+        attempt_cache.set(user_id, pages)
+    return jsonify({'ok': True, **page}), 200
+
+
+@bp.route('/api/admin/users', methods=['GET'])
 def api_admin_users():
     """Return all users for admin panel (admin only)."""
     auth = request.headers.get('Authorization', '')
@@ -1220,16 +2514,16 @@ def api_admin_users():
         return jsonify({'ok': False, 'message': 'Missing authorization token'}), 401
     token = auth.split(' ', 1)[1].strip()
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = decode_auth_token(token)
     except Exception as e:
-        app.logger.debug('JWT decode error: %s', e)
+        current_app.logger.debug('JWT decode error: %s', e)
         return jsonify({'ok': False, 'message': 'Invalid or expired token'}), 401
     if payload.get('role') != 'admin':
         return jsonify({'ok': False, 'message': 'Forbidden'}), 403
     if not ORACLE_AVAILABLE:
         return jsonify({'ok': True, 'users': []})
     try:
-        conn = oracledb.connect(user=DB_USER, password=DB_PASS, dsn=DB_DSN)
+        conn = read_connection(payload)
         cur = conn.cursor()
         cur.execute("SELECT userID, name, email, role FROM Users")
         users = [
@@ -1239,9 +2533,236 @@ def api_admin_users():
         cur.close()
         conn.close()
     except Exception as e:
-        app.logger.exception('DB error fetching users: %s', e)
+        current_app.logger.exception('DB error fetching users: %s', e)
         return jsonify({'ok': False, 'message': 'Database error'}), 500
     return jsonify({'ok': True, 'users': users})
 
+def ping_database() -> dict:
+    """Round trip to the primary with a short call timeout; result is reused for READY_CACHE_SECONDS."""
+    now = time.monotonic()
+    cached = _ready_ping.get('result')
+    if cached is not None and now - _ready_ping['at'] < config.READY_CACHE_SECONDS:
+        return cached
+    started = time.perf_counter()
+    try:
+        conn = oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+        try:
+            conn.call_timeout = config.READY_DB_TIMEOUT_MS
+            cur = conn.cursor()
+            cur.execute('SELECT 1 FROM dual')
+            cur.fetchone()
+        finally:
+            conn.close()
+        result = {'ok': True, 'ms': round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        current_app.logger.warning('Readiness DB ping failed: %s', e)
+        result = {'ok': False, 'ms': round((time.perf_counter() - started) * 1000, 1), 'error': type(e).__name__}
+    _ready_ping.update(result=result, at=now)
+    return result
+
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving. Stays 200 while draining so it is not killed early."""
+    return jsonify({'ok': True, **lifecycle.snapshot()}), 200
+
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 503 while draining or when the database is unreachable.
+
+    Saturated execution slots or nearly full write queues are reported as degraded but
+    stay 200, since taking the worker out of rotation would only move the load elsewhere.
+    The primary is not pooled (each request opens its own connection), so its entry under
+    ``pools`` carries the ping's connect-and-query latency rather than a busy count.
+    """
+    adm = admission.snapshot()
+    database = ping_database() if ORACLE_AVAILABLE else {'ok': True, 'mode': 'dev'}
+    pools = {'admission': {'capacity': adm['capacity'], 'in_use': adm['in_use'], 'queued': adm['queued']},
+             'primary': {'pooled': False, 'ok': database['ok'], 'connect_ms': database.get('ms')},
+             'replica': db_router.snapshot()['replica_pool']}
+    queues = {'audit': audit_log.depth(), 'mail': mail_dispatcher.depth(), 'channels': len(session_hub)}
+    hashing = password_hasher.snapshot()
+    caches = {'quiz_versions': quiz_versions.stats(), 'auth': len(user_auth_cache),
+              'profiles': len(user_profile_cache), 'attempts': len(attempt_cache),
+              'exam_events': exam_scheduler.stats() if service('exam_scheduler') is not None else None}
+    degraded = []
+    if adm['in_use'] >= adm['capacity'] and any(adm['queued'].values()):
+        degraded.append('admission saturated')
+    replica = pools['replica']
+    if replica and replica['max'] and replica['busy'] >= replica['max']:
+        degraded.append('replica pool saturated')
+    if queues['audit'] >= config.AUDIT_QUEUE_SIZE * 0.9:
+        degraded.append('audit queue nearly full')
+    if queues['mail'] >= config.MAIL_QUEUE_SIZE * 0.9:
+        degraded.append('mail queue nearly full')
+    if hashing['queue_time']['p95'] >= config.HASH_ACQUIRE_TIMEOUT / 2:
+        degraded.append('password hashing backlog')
+    ready = not lifecycle.draining and database['ok']
+    status = 'draining' if lifecycle.draining else ('unavailable' if not database['ok']
+                                                    else ('degraded' if degraded else 'ready'))
+    body = {'ok': ready, 'status': status, 'degraded': degraded, 'database': database,
+            'pools': pools, 'queues': queues, 'caches': caches, 'password_hashing': hashing,
+            'logging': log_pipeline.snapshot(),
+            **lifecycle.snapshot()}
+    return jsonify(body), 200 if ready else 503
+
+
+def create_app(config: Config = None) -> Flask:
+    """Build the application: its subsystems, their background threads and the routes.
+
+    Importing this module starts nothing. Each call builds its own subsystems, stored in
+    ``app.extensions[EXTENSION]`` and reached by the routes through the proxies above.
+    ``config`` is read from the environment (and .env) when omitted; ``flask run`` finds
+    this factory, and gunicorn takes ``'app:create_app()'``.
+    """
+    if config is None:
+        load_dotenv()
+        config = Config.from_env()
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(config)
+    CORS(flask_app)  # allow cross-origin requests in dev
+    if config.TRUSTED_PROXY_HOPS > 0:
+        flask_app.wsgi_app = ProxyFix(flask_app.wsgi_app, x_for=config.TRUSTED_PROXY_HOPS, x_proto=config.TRUSTED_PROXY_HOPS,
+                                      x_host=0, x_port=0, x_prefix=0)
+    logger = flask_app.logger
+    log_pipeline = logs.LogPipeline(level=config.LOG_LEVEL, fmt=config.LOG_FORMAT, queue_size=config.LOG_QUEUE_SIZE,
+                                    repeat_window=config.LOG_REPEAT_WINDOW_SECONDS, sample_rate=config.LOG_INFO_SAMPLE_RATE)
+    log_pipeline.install(logger)
+
+    if config.JWT_SECRET == DEFAULT_JWT_SECRET:
+        logger.warning('Using default JWT_SECRET; set JWT_SECRET in environment for production')
+
+    def connect():
+        return oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN)
+
+    # Tokens of banned/deleted users are rejected via this index instead of a Users lookup per request
+    if config.REVOCATION_BACKEND == 'oracle' and ORACLE_AVAILABLE:
+        revocation_backend = OracleRevocationBackend(connect)
+    else:
+        if config.REVOCATION_BACKEND == 'oracle':
+            logger.warning('REVOCATION_BACKEND=oracle but the database driver is missing; '
+                           'revocations stay in this process')
+        revocation_backend = MemoryRevocationBackend()
+    token_signer = TokenSigner(config.JWT_SIGNING_KEYS, active_kid=config.JWT_ACTIVE_KID, algorithm=config.JWT_ALGO,
+                               lifetime=config.JWT_EXP_SECONDS, legacy_secret=config.JWT_SECRET,
+                               legacy_lifetime=config.LEGACY_TOKEN_SECONDS)
+    # A revocation must outlive every token it rejects, including legacy tokens
+    revocation_index = RevocationIndex(revocation_backend, token_lifetime=token_signer.max_lifetime,
+                                       sync_interval=config.REVOCATION_SYNC_SECONDS, logger=logger)
+
+    # Quiz content is served and graded from immutable per-version snapshots
+    quiz_versions = QuizVersionStore(cache_size=config.QUIZ_CACHE_SIZE)
+    # Scheduled exam events: pre-warmed caches and pre-allocated sessions
+    exam_scheduler = ExamScheduler(connect, quiz_versions, new_seed, lead_time=config.EXAM_PREPARE_LEAD_SECONDS,
+                                   interval=config.EXAM_SCHEDULER_INTERVAL, logger=logger) if ORACLE_AVAILABLE else None
+    db_router = DatabaseRouter(
+        connect,
+        pooled(lambda: oracledb.create_pool(user=config.DB_REPLICA_USER, password=config.DB_REPLICA_PASS, dsn=config.DB_REPLICA_DSN,
+                                            min=config.DB_REPLICA_POOL_MIN, max=config.DB_REPLICA_POOL_MAX, increment=1))
+        if ORACLE_AVAILABLE and config.DB_REPLICA_DSN else None,
+        routes=config.READ_CONSISTENCY, ryw_seconds=config.READ_YOUR_WRITES_SECONDS, logger=logger)
+
+    if config.CACHE_BUS_TRANSPORT == 'unix':
+        bus_transport = UnixSocketTransport(config.CACHE_BUS_SOCKET_DIR, logger=logger)
+    elif config.CACHE_BUS_TRANSPORT in ('oracle', 'auto') and ORACLE_AVAILABLE:
+        bus_transport = OraclePollingTransport(connect, interval=config.CACHE_BUS_POLL_SECONDS, logger=logger)
+    else:
+        bus_transport = LocalTransport()
+    cache_bus = InvalidationBus(bus_transport, logger=logger)
+
+    def slots(fraction: float) -> int:
+        return max(1, int(config.ADMISSION_CAPACITY * fraction))
+
+    services = dict(
+        config=config,
+        log_pipeline=log_pipeline,
+        pending_signups={},
+        user_auth_cache=TTLCache(maxsize=config.LOGIN_CACHE_SIZE, ttl=config.LOGIN_CACHE_TTL),
+        login_ip_limiter=RateLimiter(config.LOGIN_IP_BURST, config.LOGIN_IP_PER_MINUTE / 60.0),
+        login_email_limiter=RateLimiter(config.LOGIN_EMAIL_BURST, config.LOGIN_EMAIL_PER_MINUTE / 60.0),
+        token_signer=token_signer,
+        revocation_index=revocation_index,
+        refresh_store=RefreshTokenStore(connect, lifetime=config.REFRESH_TOKEN_SECONDS) if ORACLE_AVAILABLE else None,
+        user_profile_cache=TTLCache(maxsize=config.LOGIN_CACHE_SIZE, ttl=config.PROFILE_CACHE_TTL),
+        attempt_cache=TTLCache(maxsize=config.ATTEMPTS_CACHE_SIZE, ttl=config.ATTEMPTS_CACHE_TTL),
+        quiz_versions=quiz_versions,
+        session_hub=SessionHub(),
+        exam_scheduler=exam_scheduler,
+        retention_job=RetentionJob(connect, retention_days=config.RETENTION_DAYS, batch_size=config.RETENTION_BATCH_SIZE,
+                                   max_batches=config.RETENTION_MAX_BATCHES, pause=config.RETENTION_PAUSE_SECONDS,
+                                   window=config.RETENTION_WINDOW, logger=logger),
+        db_router=db_router,
+        cache_bus=cache_bus,
+        audit_log=AuditLog(connect, queue_size=config.AUDIT_QUEUE_SIZE, batch_size=config.AUDIT_BATCH_SIZE,
+                           flush_interval=config.AUDIT_FLUSH_SECONDS, logger=logger),
+        submit_results=TTLCache(maxsize=config.SUBMIT_RESULT_CACHE_SIZE, ttl=config.SUBMIT_RESULT_TTL),
+        submits_in_flight=SingleFlight(),
+        # RequestClass(name, priority, max concurrent, queue length, max queue wait seconds)
+        admission=AdmissionController(config.ADMISSION_CAPACITY, [
+            RequestClass('submit', 0, config.ADMISSION_CAPACITY, 1000, 30.0),
+            RequestClass('start', 1, slots(0.75), 200, 10.0),
+            RequestClass('autosave', 2, slots(0.5), 100, 2.0),
+            RequestClass('default', 3, slots(0.5), 50, 5.0),
+            RequestClass('admin', 4, slots(0.25), 10, 2.0),
+        ]),
+        password_hasher=PasswordHasher(
+            method=config.PASSWORD_HASH_METHOD,
+            workers=config.HASH_WORKERS,
+            max_pending=config.HASH_MAX_PENDING,
+            acquire_timeout=config.HASH_ACQUIRE_TIMEOUT,
+        ),
+        # Verification mail is delivered by a background worker so signup never waits on SMTP.
+        mail_dispatcher=MailDispatcher(
+            host=config.MAIL_HOST,
+            port=config.MAIL_PORT,
+            sender=config.MAIL_USER,
+            username=config.MAIL_USER,
+            password=config.MAIL_APP_PASSWORD,
+            use_ssl=config.MAIL_USE_SSL,
+            starttls=config.MAIL_STARTTLS,
+            queue_size=config.MAIL_QUEUE_SIZE,
+            batch_size=config.MAIL_BATCH_SIZE,
+            max_retries=config.MAIL_MAX_RETRIES,
+            logger=logger,
+        ),
+        lifecycle=Lifecycle(drain_timeout=config.DRAIN_TIMEOUT_SECONDS, logger=logger),
+        ready_ping={},
+    )
+    flask_app.extensions[EXTENSION] = services
+    flask_app.register_blueprint(bp)
+
+    # login rows by email, profiles and attempt histories by userID, exam reservations by eventID,
+    # and session channel events for the connections open on this worker
+    cache_bus.subscribe('login', services['user_auth_cache'].pop)
+    cache_bus.subscribe('profile', lambda key: services['user_profile_cache'].pop(int(key)))
+    cache_bus.subscribe('attempts', lambda key: services['attempt_cache'].pop(int(key)))
+    if exam_scheduler is not None:
+        cache_bus.subscribe('exam_event', lambda key: exam_scheduler.forget_event(int(key)))
+    cache_bus.subscribe('channel', services['session_hub'].dispatch)
+
+    # Background threads start only now that everything they use exists
+    if isinstance(revocation_backend, OracleRevocationBackend):
+        revocation_index.start()
+    if exam_scheduler is not None:
+        exam_scheduler.start()
+    cache_bus.start()
+    # The KDF parameter probe runs in the pool now, not on the first login request
+    services['password_hasher'].warm_up()
+
+    # Shutdown order: stop producing background work, flush buffered writes, then stop listeners
+    lifecycle = services['lifecycle']
+    if exam_scheduler is not None:
+        lifecycle.on_shutdown('exam_scheduler', lambda timeout: exam_scheduler.stop())
+    lifecycle.on_shutdown('audit_log', lambda timeout: services['audit_log'].stop(timeout))
+    lifecycle.on_shutdown('mail', lambda timeout: services['mail_dispatcher'].stop(timeout))
+    lifecycle.on_shutdown('cache_bus', lambda timeout: cache_bus.close())
+    lifecycle.on_shutdown('password_hasher', lambda timeout: services['password_hasher'].shutdown())
+    lifecycle.on_shutdown('logging', log_pipeline.stop)
+    if config.DRAIN_ON_SIGTERM:
+        lifecycle.install_signal_handlers()
+    return flask_app
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Attempt history of one student (``GET /api/me/attempts``).
+
+A page is read with a single statement: the caller's UserQuiz rows, newest first, are
+keyset-paginated on (taken_at, userQuizID) in a subquery. That subquery is joined to the
+quiz, to the submitted session (for the version the attempt was graded against) and to
+the attempt's Submissions rows. An attempt therefore spans several result rows (one per
+graded question), which are folded back into one entry here.
+
+Question points and titles come from the pinned QuizVersions snapshot, so editing a
+quiz later does not rewrite past totals. Attempts from before versioning fall back to
+the live Questions row. Attempts whose session was archived by retention.py have no
+Submissions left; they are read from the SessionArchive payload, which keeps each
+question's points and the total.
+
+Pass/fail is not returned: members only see their score (see ``api_submit_quiz``).
+"""
+import json
+
+from audit import encode_cursor, decode_cursor
+
+
+PAGE_SQL = """
+WITH page AS (
+    SELECT uq.userQuizID, uq.userID, uq.quizID, uq.score, uq.taken_at
+    FROM UserQuiz uq
+    WHERE uq.userID = :user_id {keyset}
+    ORDER BY uq.taken_at DESC, uq.userQuizID DESC
+    FETCH FIRST :limit ROWS ONLY
+)
+SELECT p.userQuizID, p.quizID, qz.title, p.score, p.taken_at, NVL(s.versionID, sa.versionID), sa.payload,
+       sb.questionID, qs.title, qs.points, sb.iscorrect, sb.points_earned
+FROM page p
+JOIN Quiz qz ON qz.quizID = p.quizID
+LEFT JOIN Sessions s ON s.userID = p.userID AND s.quizID = p.quizID AND s.status = 'submitted'
+LEFT JOIN SessionArchive sa ON sa.userID = p.userID AND sa.quizID = p.quizID AND sa.status = 'submitted'
+    AND s.session_id IS NULL
+LEFT JOIN (Submissions sb JOIN Questions qs ON qs.questionID = sb.questionID)
+    ON sb.userID = p.userID AND qs.quizID = p.quizID AND sa.session_id IS NULL
+ORDER BY p.taken_at DESC, p.userQuizID DESC, sb.questionID
+"""
+KEYSET = "AND (uq.taken_at < :before_ts OR (uq.taken_at = :before_ts AND uq.userQuizID < :before_id))"
+
+
+def page_sql(keyset: bool = False) -> str:
+    """PAGE_SQL for a first page, or with the keyset condition for the following ones."""
+    return PAGE_SQL.format(keyset=KEYSET if keyset else '')
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def _read_lob(value):
+    return value.read() if hasattr(value, 'read') else value
+
+
+def _archived_rows(payload):
+    """(questionID, title, points, iscorrect, points_earned) of an archived attempt."""
+    archived = json.loads(_read_lob(payload))
+    return [(sub['questionID'], sub.get('title'), sub.get('points'), sub.get('iscorrect'), sub.get('points_earned'))
+            for sub in archived.get('submissions', ())]
+
+
+def query_attempts(conn, user_id, cursor: str = None, limit: int = 20, details: bool = False,
+                   snapshot=None) -> dict:
+    """One page of a user's attempts, newest first. Pass the returned ``next_cursor`` to continue.
+
+    ``snapshot(conn, version_id)`` returns a QuizVersions snapshot (``QuizVersionStore.snapshot``);
+    without it the live question points are used. Raises ValueError for a malformed cursor.
+    """
+    binds = {'user_id': int(user_id), 'limit': limit + 1}
+    if cursor:
+        binds['before_ts'], binds['before_id'] = decode_cursor(cursor)
+    cur = conn.cursor()
+    try:
+        cur.arraysize = 500
+        cur.execute(page_sql(keyset=bool(cursor)), binds)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+
+    attempts = []
+    last = None
+    versions = {}
+    for uq_id, quiz_id, quiz_title, score, taken_at, version_id, archived, qid, qtitle, points, iscorrect, earned in rows:
+        if last is None or last['userQuizID'] != uq_id:
+            last = {'userQuizID': int(uq_id), 'quizID': int(quiz_id), 'title': quiz_title,
+                    'score': _number(score), 'total': 0.0, 'question_count': 0,
+                    'correct_count': 0, 'taken_at': taken_at.isoformat() if taken_at else None,
+                    '_taken_at': taken_at}
+            if details:
+                last['questions'] = []
+            attempts.append(last)
+            pinned = None
+            if version_id is not None and snapshot is not None:
+                if version_id not in versions:
+                    snap = snapshot(conn, version_id)
+                    versions[version_id] = {q['questionID']: q for q in snap['questions']} if snap else None
+                pinned = versions[version_id]
+            if archived is not None:
+                last['archived'] = True
+                for graded in _archived_rows(archived):
+                    _add_question(last, details, pinned, *graded)
+                continue
+        if qid is not None:
+            _add_question(last, details, pinned, qid, qtitle, points, iscorrect, earned)
+
+    next_cursor = None
+    if len(attempts) > limit:
+        attempts = attempts[:limit]
+        next_cursor = encode_cursor(attempts[-1]['_taken_at'], attempts[-1]['userQuizID'])
+    for attempt in attempts:
+        del attempt['_taken_at']
+    return {'attempts': attempts, 'next_cursor': next_cursor}
+
+
+def _add_question(attempt: dict, details: bool, pinned, qid, title, points, iscorrect, earned) -> None:
+    q = pinned.get(int(qid)) if pinned else None
+    if q is not None:
+        # the version the attempt was graded against, not the question as edited since
+        title, points = q['title'], q['points']
+    points = _number(points) or 0.0
+    correct = iscorrect == 'Y'
+    attempt['total'] += points
+    attempt['question_count'] += 1
+    attempt['correct_count'] += int(correct)
+    if details:
+        # rows graded before points_earned existed were all-or-nothing
+        attempt['questions'].append({'questionID': int(qid), 'title': title, 'points': points, 'correct': correct,
+                                     'earned': _number(earned) if earned is not None else (points if correct else 0.0)})
@@ -0,0 +1,251 @@
+"""Admin audit log (the AdminLog table).
+
+Entries are written in one of two ways:
+
+* ``write(cur, ...)`` inserts inside the caller's transaction. Use it for critical
+  actions (bans, deletions) whose log row must commit or roll back together with
+  the change.
+* ``record(...)`` puts the entry on a bounded in-process queue. A worker thread inserts
+  queued entries in batches with one array INSERT per batch. When the queue is
+  full, the entry is written synchronously instead of being dropped.
+
+Timestamps come from the database clock, like the column default (CURRENT_TIMESTAMP
+in the session time zone) that older rows were written with. A queued entry is
+stamped CURRENT_TIMESTAMP minus the time it spent in the queue, so batching does not
+shift or reorder history.
+
+``query`` reads the log newest first with keyset pagination on (timestamp, logID).
+Filters by action prefix, actor and time range are served by the AdminLog indexes.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+INSERT = ("INSERT INTO AdminLog (action, reason, actor, actorID, timestamp) "
+          "VALUES (:1, :2, :3, :4, CURRENT_TIMESTAMP - NUMTODSINTERVAL(:5, 'SECOND'))")
+# Column sizes from the AdminLog table
+_ACTION_LIMIT = 100
+_REASON_LIMIT = 500
+_ACTOR_LIMIT = 100
+_SESSION_TIME = "CAST(FROM_TZ(CAST({} AS TIMESTAMP), 'UTC') AT TIME ZONE SESSIONTIMEZONE AS TIMESTAMP)"
+# Entries older than the last one of the previous page
+KEYSET = "(timestamp < :before_ts OR (timestamp = :before_ts AND logID < :before_id))"
+
+
+def page_sql(conditions=()) -> str:
+    """Statement for one page of AdminLog entries, newest first, filtered by ``conditions``."""
+    sql = "SELECT logID, action, reason, actor, actorID, timestamp FROM AdminLog"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql + " ORDER BY timestamp DESC, logID DESC FETCH FIRST :limit ROWS ONLY"
+
+
+def _row(action: str, reason: str, actor: str = None, actor_id=None) -> list:
+    """An entry, ending with the monotonic time it was recorded at."""
+    return [
+        (action or '')[:_ACTION_LIMIT],
+        reason[:_REASON_LIMIT] if reason else None,
+        actor[:_ACTOR_LIMIT] if actor else None,
+        int(actor_id) if actor_id is not None else None,
+        time.monotonic(),
+    ]
+
+
+def _binds(rows: list) -> list:
+    """INSERT binds: the recorded time becomes the entry's age in seconds."""
+    now = time.monotonic()
+    return [row[:4] + [round(max(0.0, now - row[4]), 6)] for row in rows]
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    return f'{timestamp.isoformat()}|{log_id}'
+
+
+def decode_cursor(cursor: str):
+    """``"<iso timestamp>|<logID>"`` -> (datetime, int); raises ValueError when malformed."""
+    stamp, _, log_id = (cursor or '').partition('|')
+    return datetime.fromisoformat(stamp), int(log_id)
+
+
+class AuditLog:
+    """Buffered AdminLog writer plus the paginated reader."""
+
+    def __init__(self, connect, queue_size: int = 10000, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_retries: int = 5, logger: logging.Logger = None):
+        self._connect = connect
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.logger = logger or logging.getLogger(__name__)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._stopping = threading.Event()
+        self._thread = None
+        self.stats = {'recorded': 0, 'written': 0, 'batches': 0, 'sync_fallbacks': 0, 'failed': 0}
+
+    # -- writing ----------------------------------------------------------------
+
+    @staticmethod
+    def write(cur, action: str, reason: str = None, actor: str = None, actor_id=None) -> None:
+        """Insert an entry with the caller's cursor (caller commits)."""
+        cur.execute(INSERT, _binds([_row(action, reason, actor, actor_id)])[0])
+
+    @staticmethod
+    def write_many(cur, entries) -> None:
+        """Insert several (action, reason, actor, actor_id) entries with the caller's cursor."""
+        rows = [_row(*entry) for entry in entries]
+        if rows:
+            cur.executemany(INSERT, _binds(rows))
+
+    def record(self, action: str, reason: str = None, actor: str = None, actor_id=None) -> None:
+        """Queue an entry for the background writer; falls back to a synchronous insert when full."""
+        self.start()
+        row = _row(action, reason, actor, actor_id)
+        try:
+            with self._idle:
+                self._queue.put_nowait((row, 0))
+                self._pending += 1
+        except queue.Full:
+            self.stats['sync_fallbacks'] += 1
+            self._insert([row])
+            return
+        self.stats['recorded'] += 1
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far was written (or given up on)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write what is queued and stop the worker."""
+        self._stopping.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+                continue
+            if self._stopping.is_set() and self._queue.empty():
+                break
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch: list) -> None:
+        try:
+            self._insert([row for row, _ in batch])
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+            self._done(len(batch))
+        except Exception:
+            self.logger.exception('Failed to write %d audit entries', len(batch))
+            retry = [(row, attempts + 1) for row, attempts in batch if attempts + 1 < self.max_retries]
+            self.stats['failed'] += len(batch) - len(retry)
+            self._done(len(batch) - len(retry))
+            for item in retry:
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    self.stats['failed'] += 1
+                    self._done(1)
+            # back off before retrying against a database that just failed
+            self._stopping.wait(min(30.0, self.flush_interval * 5))
+
+    def _insert(self, rows: list) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.executemany(INSERT, _binds(rows))
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    def _done(self, count: int) -> None:
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    # -- reading ----------------------------------------------------------------
+
+    @staticmethod
+    def query(conn, action: str = None, actor: str = None, actor_id=None, since: datetime = None,
+              until: datetime = None, cursor: str = None, limit: int = 50) -> dict:
+        """One page of entries, newest first. Pass the returned ``next_cursor`` to continue."""
+        where = []
+        binds = {}
+        if action:
+            # actions start with their verb ("ban alice", "Quiz Deleted: ..."), so filter by prefix
+            where.append("action LIKE :action ESCAPE '\\'")
+            binds['action'] = action.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        if actor:
+            where.append("actor = :actor")
+            binds['actor'] = actor
+        if actor_id is not None:
+            where.append("actorID = :actor_id")
+            binds['actor_id'] = int(actor_id)
+        # since/until are UTC; the column holds session-time-zone values
+        if since:
+            where.append("timestamp >= " + _SESSION_TIME.format(':since'))
+            binds['since'] = since
+        if until:
+            where.append("timestamp < " + _SESSION_TIME.format(':until'))
+            binds['until'] = until
+        if cursor:
+            before_ts, before_id = decode_cursor(cursor)
+            where.append(KEYSET)
+            binds['before_ts'] = before_ts
+            binds['before_id'] = before_id
+        binds['limit'] = limit + 1
+        cur = conn.cursor()
+        try:
+            cur.execute(page_sql(where), binds)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        entries = [{
+            'logID': int(log_id), 'action': action_, 'reason': reason, 'actor': actor_,
+            'actorID': int(actor_id_) if actor_id_ is not None else None,
+            'timestamp': ts.isoformat() if ts else None,
+        } for log_id, action_, reason, actor_, actor_id_, ts in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[5], int(last[0]))
+        return {'entries': entries, 'next_cursor': next_cursor}
@@ -0,0 +1,121 @@
+"""Small in-process caches and rate limiters shared by the API routes."""
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ``ttl`` seconds after they were set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[0] <= now:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string (client IP, email, ...).
+
+    Each key may burst up to ``capacity`` requests and then earns ``rate`` tokens per
+    second. Only the ``maxkeys`` most recently used buckets are kept; an evicted key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, capacity: float, rate: float, maxkeys: int = 50000):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.maxkeys = maxkeys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost: float = 1.0):
+        """Take ``cost`` tokens for ``key``. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed = False
+                retry_after = (cost - tokens) / self.rate if self.rate > 0 else float('inf')
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxkeys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self, key) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SingleFlight:
+    """Collapse concurrent work on one key: the first caller runs it, later callers wait for it."""
+
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def enter(self, key, timeout: float = None) -> bool:
+        """Return True if the caller now owns ``key`` (and must call ``leave``).
+
+        Otherwise block until the owner leaves (or ``timeout`` passes) and return False.
+        """
+        with self._lock:
+            event = self._events.get(key)
+            if event is None:
+                self._events[key] = threading.Event()
+                return True
+        event.wait(timeout)
+        return False
+
+    def leave(self, key) -> None:
+        with self._lock:
+            event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._events)
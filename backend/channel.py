@@ -0,0 +1,104 @@
+"""In-process registry of open exam session channels.
+
+Each WebSocket connection handling an exam session registers a Subscription. Other
+request threads (admin notices, forced expiry) publish small dict messages to a
+session, to every session of a quiz, or to everyone; the connection loop drains its
+subscription queue and writes the frames itself, so sockets are only ever written
+from their own thread.
+
+The hub only knows this worker's connections. To reach a session wherever it is
+connected, publish ``event_key(...)`` on the cache bus in the ``channel`` namespace;
+every worker (the publisher included) hands it to ``SessionHub.dispatch``.
+"""
+import json
+import queue
+import threading
+
+
+def event_key(target: str, ident, message: dict) -> str:
+    """Cache-bus key carrying ``message`` for a 'session', 'quiz', 'user' or 'all' target."""
+    return json.dumps({'to': target, 'id': ident, 'm': message}, separators=(',', ':'))
+
+
+class Subscription:
+    __slots__ = ('session_id', 'quiz_id', 'user_id', 'messages')
+
+    def __init__(self, session_id: str, quiz_id: int, user_id, maxsize: int = 100):
+        self.session_id = session_id
+        self.quiz_id = quiz_id
+        self.user_id = user_id
+        self.messages = queue.Queue(maxsize=maxsize)
+
+    def put(self, message: dict) -> bool:
+        try:
+            self.messages.put_nowait(message)
+            return True
+        except queue.Full:
+            # A stuck client must not make publishers block
+            return False
+
+    def drain(self) -> list:
+        out = []
+        while True:
+            try:
+                out.append(self.messages.get_nowait())
+            except queue.Empty:
+                return out
+
+
+class SessionHub:
+    """Thread-safe fan-out of server messages to connected exam sessions."""
+
+    def __init__(self):
+        self._by_session = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id: str, quiz_id: int, user_id=None) -> Subscription:
+        sub = Subscription(session_id, int(quiz_id), user_id)
+        with self._lock:
+            self._by_session.setdefault(session_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._by_session.get(sub.session_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_session[sub.session_id]
+
+    def _targets(self, predicate) -> list:
+        with self._lock:
+            return [sub for subs in self._by_session.values() for sub in subs if predicate(sub)]
+
+    def publish_session(self, session_id: str, message: dict) -> int:
+        with self._lock:
+            targets = list(self._by_session.get(session_id, ()))
+        return sum(1 for sub in targets if sub.put(message))
+
+    def publish_quiz(self, quiz_id: int, message: dict) -> int:
+        return sum(1 for sub in self._targets(lambda s: s.quiz_id == int(quiz_id)) if sub.put(message))
+
+    def publish_user(self, user_id, message: dict) -> int:
+        return sum(1 for sub in self._targets(lambda s: s.user_id is not None and int(s.user_id) == int(user_id)) if sub.put(message))
+
+    def publish_all(self, message: dict) -> int:
+        return sum(1 for sub in self._targets(lambda s: True) if sub.put(message))
+
+    def dispatch(self, key: str) -> int:
+        """Deliver an ``event_key`` to the matching local connections."""
+        event = json.loads(key)
+        target, ident, message = event['to'], event.get('id'), event['m']
+        if target == 'session':
+            return self.publish_session(ident, message)
+        if target == 'quiz':
+            return self.publish_quiz(ident, message)
+        if target == 'user':
+            return self.publish_user(ident, message)
+        if target == 'all':
+            return self.publish_all(message)
+        raise ValueError('Unknown channel target %r' % target)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._by_session.values())
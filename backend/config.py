@@ -0,0 +1,227 @@
+"""Application settings.
+
+Every setting is a typed, UPPERCASE attribute of ``Config`` with its default. The
+attribute names are the environment variable names, except where ``ENV_NAMES`` maps
+them (the database settings keep their ``ORACLE_DB_*`` names). ``Config.from_env()``
+reads them from ``os.environ``, or from any mapping passed in, so tests and tools
+can build a config without touching the process environment. ``app.config.from_object``
+picks up the same attributes.
+"""
+import os
+from typing import Optional
+
+from db import parse_consistency
+from tokens import parse_signing_keys
+
+
+DEFAULT_JWT_SECRET = 'please-change-this-secret'
+_TRUE = ('1', 'true', 'yes', 'y', 'on')
+
+ENV_NAMES = {
+    'DB_USER': 'ORACLE_DB_USER',
+    'DB_PASS': 'ORACLE_DB_PASS',
+    'DB_DSN': 'ORACLE_DB_DSN',
+    'DB_REPLICA_DSN': 'ORACLE_DB_REPLICA_DSN',
+    'DB_REPLICA_USER': 'ORACLE_DB_REPLICA_USER',
+    'DB_REPLICA_PASS': 'ORACLE_DB_REPLICA_PASS',
+    'DB_REPLICA_POOL_MIN': 'ORACLE_DB_REPLICA_POOL_MIN',
+    'DB_REPLICA_POOL_MAX': 'ORACLE_DB_REPLICA_POOL_MAX',
+}
+
+
+class Config:
+    # Database configuration
+    DB_USER: Optional[str] = None
+    DB_PASS: Optional[str] = None
+    DB_DSN: Optional[str] = None
+    # Optional read replica for read-only admin routes (credentials default to the primary's)
+    DB_REPLICA_DSN: Optional[str] = None
+    DB_REPLICA_USER: Optional[str] = None
+    DB_REPLICA_PASS: Optional[str] = None
+    DB_REPLICA_POOL_MIN: int = 1
+    DB_REPLICA_POOL_MAX: int = 8
+    # route=primary|session|eventual; "session" reads the replica except right after the admin's own write
+    READ_CONSISTENCY: dict = parse_consistency(
+        'api_admin_get_quizzes=session,api_admin_users=session,api_admin_quiz_results=session,'
+        'api_admin_exam_events=session,api_admin_audit_log=eventual,api_admin_export_questions=session'
+    )
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Mail configuration (use Gmail app password)
+    MAIL_USER: Optional[str] = None
+    MAIL_APP_PASSWORD: Optional[str] = None
+    # SMTP endpoint; point these at a local debugging server (MAIL_USE_SSL=0) in tests
+    MAIL_HOST: str = 'smtp.gmail.com'
+    MAIL_PORT: int = 465
+    MAIL_USE_SSL: bool = True
+    MAIL_STARTTLS: bool = False
+    MAIL_QUEUE_SIZE: int = 1000
+    MAIL_BATCH_SIZE: int = 20
+    MAIL_MAX_RETRIES: int = 5
+
+    # Ops flags and rate-limit config
+    MAX_VERIFY_ATTEMPTS: int = 5
+    LOCKOUT_SECONDS: int = 15 * 60
+
+    # JWT configuration
+    JWT_SECRET: str = DEFAULT_JWT_SECRET
+    JWT_ALGO: str = 'HS256'
+    # Access tokens are short-lived; clients renew them through /api/token/refresh
+    JWT_EXP_SECONDS: int = 900
+    REFRESH_TOKEN_SECONDS: int = 7 * 24 * 3600
+    # Signing keys as "kid1:secret1,kid2:secret2"; JWT_ACTIVE_KID selects the one used for new tokens.
+    # Keep the previous key listed until tokens signed with it have expired. Empty: JWT_SECRET as "k0".
+    JWT_SIGNING_KEYS: dict = {}
+    JWT_ACTIVE_KID: Optional[str] = None
+    # Tokens issued before key IDs existed (no kid header) are accepted with JWT_SECRET; they were
+    # valid this long, and revocations are kept as long. Set to 0 to stop accepting them.
+    LEGACY_TOKEN_SECONDS: int = 14000
+    PROFILE_CACHE_TTL: int = 600
+
+    # Number of immutable quiz version snapshots kept in memory
+    QUIZ_CACHE_SIZE: int = 256
+
+    # How long a submit result is kept to answer client retries without regrading
+    SUBMIT_RESULT_TTL: int = 900
+    SUBMIT_RESULT_CACHE_SIZE: int = 10000
+    # How long a duplicate submit waits for the original one to finish
+    SUBMIT_WAIT_SECONDS: float = 10.0
+
+    # Admission control: API requests share ADMISSION_CAPACITY execution slots, handed out by
+    # priority (submit > start > autosave > other > admin) with bounded queues per class.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CAPACITY: int = 32
+    # A shed submit retried within this many seconds is judged by its first arrival time
+    SUBMIT_SHED_HONOR_SECONDS: int = 120
+
+    # Exam events are prepared (caches warmed, sessions pre-created) this long before they start
+    EXAM_PREPARE_LEAD_SECONDS: int = 600
+    EXAM_SCHEDULER_INTERVAL: int = 30
+
+    # Finished sessions older than RETENTION_DAYS are archived by `python retention.py run`
+    # (batched, only inside RETENTION_WINDOW, UTC)
+    RETENTION_DAYS: int = 180
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_WINDOW: str = '01:00-05:00'
+    RETENTION_MAX_BATCHES: int = 200
+    RETENTION_PAUSE_SECONDS: float = 0.5
+
+    # Question bank imports insert and commit this many questions at a time
+    BANK_IMPORT_BATCH_SIZE: int = 500
+
+    # Most users one bulk moderation request may touch (they go into one IN list, capped at 1000)
+    MODERATION_BULK_LIMIT: int = 1000
+
+    # Non-critical AdminLog entries are queued and inserted in batches by a background writer
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_SECONDS: float = 1.0
+    AUDIT_PAGE_MAX: int = 200
+
+    # Cache invalidation between workers: oracle (poll CacheInvalidations), unix (sockets in
+    # CACHE_BUS_SOCKET_DIR, one host) or local (single process). "auto" picks oracle when available.
+    CACHE_BUS_TRANSPORT: str = 'auto'
+    CACHE_BUS_POLL_SECONDS: float = 1.0
+    CACHE_BUS_SOCKET_DIR: str = '/tmp/quiz-cache-bus'
+
+    # Attempt history pages (/api/me/attempts), cached per user until their next submit
+    ATTEMPTS_CACHE_TTL: int = 600
+    ATTEMPTS_CACHE_SIZE: int = 10000
+    ATTEMPTS_PAGE_MAX: int = 100
+
+    # Password hashing: KDF calls run in a small process pool with a cap on queued work.
+    # Changing PASSWORD_HASH_METHOD makes existing hashes get rehashed on next login.
+    PASSWORD_HASH_METHOD: str = 'scrypt'
+    HASH_WORKERS: int = 2
+    HASH_MAX_PENDING: int = 64
+    HASH_ACQUIRE_TIMEOUT: float = 5.0
+    # Key for the verification-code HMAC (defaults to the JWT secret)
+    VERIFY_CODE_SECRET: Optional[str] = None
+
+    # Login path: cache of user auth records and per-IP / per-email token buckets
+    LOGIN_CACHE_TTL: int = 300
+    LOGIN_CACHE_SIZE: int = 20000
+    LOGIN_IP_BURST: int = 30
+    LOGIN_IP_PER_MINUTE: int = 30
+    LOGIN_EMAIL_BURST: int = 5
+    LOGIN_EMAIL_PER_MINUTE: int = 5
+    # Reverse proxies in front of the app (load balancer, nginx). The client address (per-IP login
+    # limit, Sessions.client_ip) is then read from X-Forwarded-For that many hops back. Keep 0 when
+    # clients connect directly: the header is ignored, since any client can send one.
+    TRUSTED_PROXY_HOPS: int = 0
+
+    # Token revocation sharing between workers: 'oracle' (TokenRevocations table) or 'memory'
+    # (single process only). Without the database driver the app warns and uses memory.
+    REVOCATION_BACKEND: str = 'oracle'
+    REVOCATION_SYNC_SECONDS: float = 2.0
+
+    # Session grace window (seconds) to tolerate small client/server clock skew or network latency
+    SESSION_GRACE_SECONDS: int = 5
+
+    # Exam session channel: how often the server pushes authoritative time, and how long a new
+    # connection may take to send its auth frame
+    CHANNEL_TIME_SYNC_SECONDS: int = 15
+    CHANNEL_AUTH_TIMEOUT: int = 10
+    # Admin notices travel between workers as cache-bus keys (CacheInvalidations.cache_key)
+    CHANNEL_NOTICE_MAX_CHARS: int = 500
+
+    # Graceful drain: on SIGTERM refuse new exam sessions, let in-flight requests finish for up
+    # to DRAIN_TIMEOUT_SECONDS, then flush buffered writes and stop background threads
+    DRAIN_ON_SIGTERM: bool = True
+    DRAIN_TIMEOUT_SECONDS: float = 30.0
+    # Readiness: DB ping timeout, and how long a ping result is reused between probes
+    READY_DB_TIMEOUT_MS: int = 1000
+    READY_CACHE_SECONDS: float = 2.0
+
+    # Logging: records are queued and written (as JSON lines, or "text") by a background thread.
+    # A repeated warning/error from the same line is logged once per LOG_REPEAT_WINDOW_SECONDS;
+    # LOG_INFO_SAMPLE_RATE keeps that fraction of requests' info/debug lines.
+    LOG_LEVEL: str = 'INFO'
+    LOG_FORMAT: str = 'json'
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_REPEAT_WINDOW_SECONDS: float = 60.0
+    LOG_INFO_SAMPLE_RATE: float = 1.0
+
+    @classmethod
+    def from_env(cls, environ=None) -> 'Config':
+        """Read every setting from ``environ`` (default ``os.environ``). Raises ValueError on bad values."""
+        env = os.environ if environ is None else environ
+        cfg = cls()
+        for name, kind in cls.__annotations__.items():
+            raw = env.get(ENV_NAMES.get(name, name))
+            if raw is None:
+                continue
+            try:
+                setattr(cfg, name, _convert(name, kind, raw))
+            except ValueError:
+                raise ValueError('Invalid value for %s: %r' % (ENV_NAMES.get(name, name), raw))
+        # Derived settings and defaults that depend on other settings
+        cfg.DB_REPLICA_USER = cfg.DB_REPLICA_USER or cfg.DB_USER
+        cfg.DB_REPLICA_PASS = cfg.DB_REPLICA_PASS or cfg.DB_PASS
+        cfg.READ_CONSISTENCY = dict(cfg.READ_CONSISTENCY)
+        cfg.JWT_SIGNING_KEYS = dict(cfg.JWT_SIGNING_KEYS) or {'k0': cfg.JWT_SECRET}
+        cfg.VERIFY_CODE_SECRET = cfg.VERIFY_CODE_SECRET or cfg.JWT_SECRET
+        cfg.MODERATION_BULK_LIMIT = min(cfg.MODERATION_BULK_LIMIT, 1000)
+        if cfg.REVOCATION_BACKEND not in ('oracle', 'memory'):
+            raise ValueError('Invalid value for REVOCATION_BACKEND: %r' % cfg.REVOCATION_BACKEND)
+        return cfg
+
+
+# Settings given as text in the environment and parsed into the annotated type
+PARSERS = {
+    'READ_CONSISTENCY': parse_consistency,
+    'JWT_SIGNING_KEYS': lambda raw: parse_signing_keys(raw, None),
+}
+
+
+def _convert(name: str, kind, raw: str):
+    if kind is dict:
+        return PARSERS[name](raw)
+    if kind is bool:
+        return raw.strip().lower() in _TRUE
+    if kind is int:
+        return int(raw)
+    if kind is float:
+        return float(raw)
+    # str and Optional[str]
+    return raw
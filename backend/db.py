@@ -0,0 +1,165 @@
+"""Read/write splitting between the primary database and an optional read replica.
+
+Routes that only read can be served from a replica so heavy admin listings do not
+compete with exam writes. Each route has a consistency level:
+
+* ``primary``  always read from the primary;
+* ``session``  read from the replica, except shortly after the same admin wrote
+  something (read-your-writes), since the replica may not have caught up yet;
+* ``eventual`` always read from the replica.
+
+Both roles are plain zero-argument callables returning a DB-API connection, so tests
+and local setups can point them at any stand-in. When no replica is configured, or
+it cannot be reached, reads go to the primary.
+"""
+import importlib.util
+import sys
+import threading
+import time
+
+
+CONSISTENCY_LEVELS = ('primary', 'session', 'eventual')
+
+
+def parse_consistency(spec: str) -> dict:
+    """``"api_admin_users=eventual, api_admin_quiz_results=session"`` -> {route: level}."""
+    routes = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        route, _, level = item.partition('=')
+        level = level.strip().lower()
+        if level not in CONSISTENCY_LEVELS:
+            raise ValueError('Unknown consistency level %r for %s' % (level, route.strip()))
+        routes[route.strip()] = level
+    return routes
+
+
+def optional_module(name: str):
+    """Import an optional dependency lazily: the module object, or None when not installed.
+
+    The module body only runs on first attribute access (``importlib.util.LazyLoader``),
+    so importing the app does not pay for the database driver until a request uses it.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def pooled(create_pool):
+    """Wrap a pool factory into a connect callable that creates the pool on first use."""
+    lock = threading.Lock()
+    state = {}
+
+    def connect():
+        pool = state.get('pool')
+        if pool is None:
+            with lock:
+                pool = state.get('pool')
+                if pool is None:
+                    pool = state['pool'] = create_pool()
+        # close() on an acquired connection returns it to the pool
+        return pool.acquire()
+
+    connect.pool = lambda: state.get('pool')
+    return connect
+
+
+def pool_stats(connect):
+    """{'opened', 'busy', 'max'} of a ``pooled`` connect callable's pool, or None before first use."""
+    pool = getattr(connect, 'pool', lambda: None)()
+    if pool is None:
+        return None
+    return {'opened': pool.opened, 'busy': pool.busy, 'max': pool.max}
+
+
+class DatabaseRouter:
+    """Hand out primary or replica connections according to the route's consistency level."""
+
+    def __init__(self, primary, replica=None, routes: dict = None, default: str = 'primary',
+                 ryw_seconds: float = 5.0, replica_retry_seconds: float = 30.0, logger=None):
+        self._primary = primary
+        self._replica = replica
+        self.routes = dict(routes or {})
+        self.default = default
+        self.ryw_seconds = ryw_seconds
+        self.replica_retry_seconds = replica_retry_seconds
+        self._logger = logger
+        self._lock = threading.Lock()
+        # {userID: monotonic time of their last write} for read-your-writes in this worker
+        self._last_write = {}
+        # replica connects are skipped until this time after a failure
+        self._replica_down_until = 0.0
+        self.stats = {'primary': 0, 'replica': 0, 'ryw_fallbacks': 0, 'replica_errors': 0}
+
+    @property
+    def has_replica(self) -> bool:
+        return self._replica is not None
+
+    def connect(self):
+        """A primary connection (for writes)."""
+        return self._primary()
+
+    def note_write(self, user_id) -> None:
+        if user_id is None or not self.has_replica:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[str(user_id)] = now
+            if len(self._last_write) > 10000:
+                # keep the map bounded: drop entries older than the window
+                cutoff = now - self.ryw_seconds
+                self._last_write = {k: t for k, t in self._last_write.items() if t >= cutoff}
+
+    def _wrote_recently(self, user_id, wrote_at_ms=None) -> bool:
+        if wrote_at_ms:
+            # client-carried marker, covers writes that went through another worker
+            try:
+                if time.time() * 1000 - int(wrote_at_ms) < self.ryw_seconds * 1000:
+                    return True
+            except (TypeError, ValueError):
+                pass
+        if user_id is None:
+            return False
+        with self._lock:
+            at = self._last_write.get(str(user_id))
+        return at is not None and time.monotonic() - at < self.ryw_seconds
+
+    def role_for(self, route: str, user_id=None, wrote_at_ms=None) -> str:
+        level = self.routes.get(route, self.default)
+        if not self.has_replica or level == 'primary' or time.monotonic() < self._replica_down_until:
+            return 'primary'
+        if level == 'session' and self._wrote_recently(user_id, wrote_at_ms):
+            self.stats['ryw_fallbacks'] += 1
+            return 'primary'
+        return 'replica'
+
+    def read_connection(self, route: str, user_id=None, wrote_at_ms=None):
+        """Connection for a read-only route. Falls back to the primary if the replica fails."""
+        if self.role_for(route, user_id, wrote_at_ms) == 'replica':
+            try:
+                conn = self._replica()
+                self.stats['replica'] += 1
+                return conn
+            except Exception:
+                self.stats['replica_errors'] += 1
+                self._replica_down_until = time.monotonic() + self.replica_retry_seconds
+                if self._logger:
+                    self._logger.exception('Read replica unavailable; using the primary for %ss',
+                                           self.replica_retry_seconds)
+        self.stats['primary'] += 1
+        return self._primary()
+
+    def snapshot(self) -> dict:
+        return {'replica': self.has_replica, 'routes': dict(self.routes), 'default': self.default,
+                'replica_pool': pool_stats(self._replica) if self.has_replica else None,
+                'stats': dict(self.stats)}
@@ -0,0 +1,273 @@
+"""Scheduled exam events.
+
+An exam event gives a quiz a start/end window and a list of eligible users
+(ExamEvents / ExamEventUsers). Shortly before an event starts, the scheduler:
+
+* pins the quiz's current version on the event and loads the candidate payload and
+  compiled grading key into the version caches;
+* bulk-inserts one ``reserved`` Sessions row per eligible user (array DML), each with
+  its selection seed already chosen;
+* keeps an in-memory index of those reservations.
+
+``/start`` for a reserved user is then an in-memory lookup plus one UPDATE that
+flips the row to ``active``. Every worker runs the scheduler. Only one of them does
+the inserts (the event row is locked and moved to ``prepared``); the others just
+warm their own caches from the prepared rows.
+
+The in-memory index is only a fast path. Whether a user may start an event-bound
+quiz at all is decided from the tables (``exam_access``), so it holds before the
+lead time, after the event and on a worker that has not warmed the event yet.
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+# Reservations of a prepared event, loaded into memory by warm
+RESERVED_SESSIONS_SQL = "SELECT session_id, userID, seed FROM Sessions WHERE eventID = :1 AND status = 'reserved'"
+# Every event of a quiz that was not cancelled, and whether the user is on its list
+EVENT_ACCESS_SQL = (
+    "SELECT e.eventID, e.starts_at, e.ends_at, CASE WHEN eu.userID IS NULL THEN 0 ELSE 1 END "
+    "FROM ExamEvents e LEFT JOIN ExamEventUsers eu ON eu.eventID = e.eventID AND eu.userID = :1 "
+    "WHERE e.quizID = :2 AND e.status <> 'cancelled'"
+)
+RESERVATION_SQL = (
+    "SELECT s.session_id, s.versionID, s.seed, s.eventID, e.starts_at, e.ends_at "
+    "FROM Sessions s JOIN ExamEvents e ON e.eventID = s.eventID "
+    "WHERE s.userID = :1 AND s.quizID = :2 AND s.status = 'reserved'"
+)
+
+
+def decide_access(rows, now: datetime):
+    """Decide a /start from a quiz's events: rows of (eventID, starts_at, ends_at, eligible).
+
+    Returns None when the quiz has no events (anyone may start it). Otherwise returns
+    (state, (eventID, starts_at, ends_at)) with state 'open', 'not_started' (the user's next
+    event), 'ended' or 'not_eligible' (event None).
+    """
+    if not rows:
+        return None
+    mine = sorted((r[1], int(r[0]), r[2]) for r in rows if r[3])
+    for starts_at, event_id, ends_at in mine:
+        if starts_at <= now < ends_at:
+            return 'open', (event_id, starts_at, ends_at)
+    for starts_at, event_id, ends_at in mine:
+        if now < starts_at:
+            return 'not_started', (event_id, starts_at, ends_at)
+    if mine:
+        starts_at, event_id, ends_at = mine[-1]
+        return 'ended', (event_id, starts_at, ends_at)
+    return 'not_eligible', None
+
+
+def exam_access(cur, user_id, quiz_id, now: datetime = None):
+    """``decide_access`` for a user and quiz, read from ExamEvents / ExamEventUsers."""
+    cur.execute(EVENT_ACCESS_SQL, [int(user_id), int(quiz_id)])
+    return decide_access(cur.fetchall(), now or datetime.utcnow())
+
+
+def find_reservation(cur, user_id, quiz_id):
+    """A reserved session of the user from the tables (for workers that have not warmed the event)."""
+    cur.execute(RESERVATION_SQL, [int(user_id), int(quiz_id)])
+    row = cur.fetchone()
+    if not row:
+        return None
+    session_id, version_id, seed, event_id, starts_at, ends_at = row
+    return {'session_id': session_id, 'versionID': int(version_id), 'seed': int(seed) if seed is not None else None,
+            'eventID': int(event_id), 'starts_at': starts_at, 'ends_at': ends_at}
+
+
+def parse_utc(value):
+    """Parse an ISO-8601 string into a naive UTC datetime (the form stored in the DB)."""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class ExamScheduler:
+    """Prepare upcoming exam events and serve their session reservations."""
+
+    def __init__(self, connect, versions, seed_factory, lead_time: int = 600, interval: int = 30, logger=None):
+        self._connect = connect
+        self._versions = versions
+        self._new_seed = seed_factory
+        self.lead_time = lead_time
+        self.interval = interval
+        self._logger = logger
+        self._lock = threading.Lock()
+        # {(userID, quizID): {'session_id', 'versionID', 'seed', 'eventID', 'starts_at', 'ends_at'}}
+        self._reservations = {}
+        # {eventID: (quizID, starts_at, ends_at)} of events warmed in this worker
+        self._events = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -- background loop ----------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='exam-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'events': len(self._events), 'reservations': len(self._reservations)}
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                if self._logger:
+                    self._logger.exception('Exam scheduler pass failed')
+            self._stop.wait(self.interval)
+
+    def run_once(self, now: datetime = None) -> int:
+        """Prepare and warm events starting within the lead time; close finished ones.
+
+        Returns the number of events prepared by this call.
+        """
+        now = now or datetime.utcnow()
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT eventID, status FROM ExamEvents WHERE status IN ('scheduled', 'prepared') "
+                "AND starts_at <= :1 AND ends_at > :2 ORDER BY starts_at",
+                [now + timedelta(seconds=self.lead_time), now]
+            )
+            due = cur.fetchall()
+            cur.execute(
+                "SELECT eventID FROM ExamEvents WHERE status IN ('scheduled', 'prepared') AND ends_at <= :1",
+                [now]
+            )
+            finished = [int(r[0]) for r in cur.fetchall()]
+            cur.close()
+            prepared = 0
+            for event_id, status in due:
+                event_id = int(event_id)
+                if status == 'scheduled' and self.prepare(conn, event_id):
+                    prepared += 1
+                if event_id not in self._events:
+                    self.warm(conn, event_id)
+            for event_id in finished:
+                self.close(conn, event_id)
+            return prepared
+        finally:
+            conn.close()
+
+    # -- preparation ----------------------------------------------------------
+
+    def prepare(self, conn, event_id: int) -> bool:
+        """Pin the version and pre-create reserved sessions. False if another worker got there first."""
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT quizID, status FROM ExamEvents WHERE eventID = :1 FOR UPDATE SKIP LOCKED",
+                [event_id]
+            )
+            row = cur.fetchone()
+            if not row or row[1] != 'scheduled':
+                conn.rollback()
+                return False
+            quiz_id = int(row[0])
+            version_id = self._versions.current_version(cur, quiz_id)
+            # Eligible users who have neither taken the quiz nor hold a live session for it
+            cur.execute(
+                "SELECT eu.userID FROM ExamEventUsers eu WHERE eu.eventID = :1 "
+                "AND NOT EXISTS (SELECT 1 FROM UserQuiz uq WHERE uq.userID = eu.userID AND uq.quizID = :2) "
+                "AND NOT EXISTS (SELECT 1 FROM Sessions s WHERE s.userID = eu.userID AND s.quizID = :3 "
+                "AND s.status IN ('reserved', 'active'))",
+                [event_id, quiz_id, quiz_id]
+            )
+            now = datetime.utcnow()
+            rows = [[str(uuid.uuid4()), int(r[0]), quiz_id, version_id, self._new_seed(), event_id, now]
+                    for r in cur.fetchall()]
+            if rows:
+                cur.executemany(
+                    "INSERT INTO Sessions (session_id, userID, quizID, versionID, seed, eventID, status, created_at) "
+                    "VALUES (:1, :2, :3, :4, :5, :6, 'reserved', :7)",
+                    rows
+                )
+            cur.execute(
+                "UPDATE ExamEvents SET status = 'prepared', versionID = :1, prepared_at = :2 WHERE eventID = :3",
+                [version_id, now, event_id]
+            )
+            conn.commit()
+            if self._logger:
+                self._logger.info('Prepared exam event %s: %s sessions reserved', event_id, len(rows))
+            return True
+        finally:
+            cur.close()
+
+    def warm(self, conn, event_id: int) -> None:
+        """Load the event's quiz version into the caches and its reservations into memory."""
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT quizID, versionID, starts_at, ends_at, status FROM ExamEvents WHERE eventID = :1", [event_id])
+            row = cur.fetchone()
+            if not row or row[4] != 'prepared':
+                return
+            quiz_id, version_id, starts_at, ends_at = int(row[0]), int(row[1]), row[2], row[3]
+            self._versions.candidate_payload(conn, version_id)
+            self._versions.grading_key(conn, version_id)
+            cur.execute(RESERVED_SESSIONS_SQL, [event_id])
+            reservations = {
+                (int(user_id), quiz_id): {'session_id': session_id, 'versionID': version_id,
+                                          'seed': int(seed) if seed is not None else None, 'eventID': event_id,
+                                          'starts_at': starts_at, 'ends_at': ends_at}
+                for session_id, user_id, seed in cur.fetchall()
+            }
+            with self._lock:
+                self._reservations.update(reservations)
+                self._events[event_id] = (quiz_id, starts_at, ends_at)
+        finally:
+            cur.close()
+
+    def close(self, conn, event_id: int) -> None:
+        """Mark a finished event closed and drop reservations nobody claimed."""
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM Sessions WHERE eventID = :1 AND status = 'reserved'", [event_id])
+            cur.execute("UPDATE ExamEvents SET status = 'closed' WHERE eventID = :1 AND status IN ('scheduled', 'prepared')", [event_id])
+            conn.commit()
+        finally:
+            cur.close()
+        self.forget_event(event_id)
+
+    def cancel(self, cur, event_id: int) -> None:
+        """Cancel an event using the caller's cursor (caller commits, then calls forget_event)."""
+        cur.execute("DELETE FROM Sessions WHERE eventID = :1 AND status = 'reserved'", [event_id])
+        cur.execute("UPDATE ExamEvents SET status = 'cancelled' WHERE eventID = :1", [event_id])
+
+    def forget_event(self, event_id: int) -> None:
+        with self._lock:
+            self._events.pop(event_id, None)
+            for key in [k for k, r in self._reservations.items() if r['eventID'] == event_id]:
+                del self._reservations[key]
+
+    # -- lookups used by /start ------------------------------------------------
+
+    def reservation(self, user_id, quiz_id):
+        with self._lock:
+            return self._reservations.get((int(user_id), int(quiz_id)))
+
+    def consume(self, user_id, quiz_id) -> None:
+        with self._lock:
+            self._reservations.pop((int(user_id), int(quiz_id)), None)
+
+    def open_event(self, quiz_id, now: datetime = None):
+        """(eventID, starts_at, ends_at) of a warmed, unfinished event for the quiz, if any."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            for event_id, (qid, starts_at, ends_at) in self._events.items():
+                if qid == int(quiz_id) and ends_at > now:
+                    return event_id, starts_at, ends_at
+        return None
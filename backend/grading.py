@@ -0,0 +1,137 @@
+"""Grading kernel.
+
+A quiz version's answer key is compiled once into a ``CompiledKey`` (cached per version
+by ``QuizVersionStore``). Each question becomes one slot in flat arrays (points,
+penalty, flags). Its correct answers become a bitmask in which every answer option
+owns one bit. A response is encoded into the same bits, so checking an answer is a
+few integer operations and no per-request dicts or sets are built.
+
+Scoring per question (``mask`` = selected bits, ``key`` = correct bits):
+
+* single choice: full points when exactly one option is picked and it is correct;
+* multi-select: full points when ``mask == key``. With partial credit, the points scale
+  by ``(correct picks - wrong picks) / correct options``, floored at zero;
+* negative marking: a non-blank answer that earns nothing loses ``penalty`` points.
+  Blank answers score zero. The attempt total never goes below zero.
+
+An attempt passes when ``earned / total >= pass_threshold`` (a fraction stored on Quiz).
+"""
+from array import array
+from collections import namedtuple
+
+
+Grade = namedtuple('Grade', 'earned total passed details')
+
+_EPSILON = 1e-9
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value: int) -> int:
+        return bin(value).count('1')
+
+
+def answer_list(answer) -> list:
+    """Normalize a submitted answer (None, an ID, or a list of IDs) into a list of ints."""
+    if answer is None or answer == '':
+        return []
+    if isinstance(answer, (list, tuple, set, frozenset)):
+        return [int(a) for a in answer if a is not None]
+    return [int(answer)]
+
+
+class CompiledKey:
+    """Answer key of one quiz version as flat arrays and per-question bitmasks."""
+
+    def __init__(self, snapshot: dict):
+        questions = snapshot['questions']
+        threshold = snapshot.get('pass_threshold')
+        self.pass_threshold = float(threshold) if threshold is not None else 0.5
+        self.question_ids = array('q', (q['questionID'] for q in questions))
+        self.position = {q['questionID']: i for i, q in enumerate(questions)}
+        self.points = array('d', (float(q.get('points') or 0) for q in questions))
+        self.penalty = array('d', (float(q.get('penalty') or 0) for q in questions))
+        self.multi = bytes(1 if q.get('multi_select') else 0 for q in questions)
+        self.partial = bytes(1 if q.get('partial_credit') else 0 for q in questions)
+        # {answerID: bit} per question, in snapshot (answerID) order
+        self.bits = [{a['answerID']: 1 << j for j, a in enumerate(q['answers'])} for q in questions]
+        self.correct = [sum(1 << j for j, a in enumerate(q['answers']) if a['is_correct']) for q in questions]
+        self.n_correct = array('H', (_popcount(c) for c in self.correct))
+
+    def __contains__(self, question_id) -> bool:
+        return question_id in self.position
+
+    def accepts(self, question_id, answer) -> bool:
+        """Whether ``answer`` (None, an ID or a list of IDs) is valid for the question."""
+        i = self.position.get(question_id)
+        if i is None:
+            return False
+        ids = answer_list(answer)
+        if len(ids) > 1 and not self.multi[i]:
+            return False
+        return all(a in self.bits[i] for a in ids)
+
+    def is_multi(self, question_id) -> bool:
+        i = self.position.get(question_id)
+        return i is not None and bool(self.multi[i])
+
+    def encode(self, i: int, answer) -> int:
+        bits = self.bits[i]
+        mask = 0
+        for a in answer_list(answer):
+            mask |= bits.get(a, 0)
+        return mask
+
+    def total(self, question_ids) -> float:
+        return sum(self.points[self.position[qid]] for qid in question_ids if qid in self.position)
+
+    def _score(self, i: int, mask: int) -> tuple:
+        """(credit fraction, points earned) of one encoded answer to question slot ``i``."""
+        if not mask:
+            return 0.0, 0.0
+        key = self.correct[i]
+        if self.multi[i]:
+            if mask == key:
+                credit = 1.0
+            elif self.partial[i] and self.n_correct[i]:
+                credit = max(0, _popcount(mask & key) - _popcount(mask & ~key)) / self.n_correct[i]
+            else:
+                credit = 0.0
+        else:
+            # one option picked, and it is one of the correct ones
+            credit = 1.0 if (mask & (mask - 1)) == 0 and mask & key else 0.0
+        if credit > 0:
+            return credit, self.points[i] * credit
+        return 0.0, -self.penalty[i]
+
+    def _passed(self, earned: float, total: float, all_correct: bool) -> bool:
+        if total <= 0:
+            # no points configured: pass only if everything was right
+            return all_correct
+        return earned / total >= self.pass_threshold - _EPSILON
+
+    def grade(self, question_ids, responses: dict) -> Grade:
+        """Grade one attempt: ``question_ids`` drawn for it, ``responses`` {questionID: answer}."""
+        earned = 0.0
+        total = 0.0
+        all_correct = True
+        details = []
+        for qid in question_ids:
+            i = self.position.get(qid)
+            if i is None:
+                continue
+            answer = responses.get(qid)
+            credit, points = self._score(i, self.encode(i, answer))
+            earned += points
+            total += self.points[i]
+            all_correct = all_correct and credit >= 1.0
+            ids = answer_list(answer)
+            details.append({
+                'questionID': qid,
+                'selected': sorted(ids) if self.multi[i] else (ids[0] if ids else None),
+                'correct': credit >= 1.0,
+                'points': self.points[i],
+                'earned': round(points, 4),
+            })
+        earned = max(0.0, earned)
+        return Grade(earned, total, self._passed(earned, total, all_correct), details)
@@ -0,0 +1,173 @@
+"""Password hashing off the request thread.
+
+Password KDF calls (scrypt/pbkdf2) are CPU bound and hold the GIL, so a burst of
+logins at exam start would starve every other request in the worker. PasswordHasher
+runs them in a small process pool, caps how many may be queued at once and records
+how long each call waited before a pool process picked it up. Pool processes are
+started with forkserver (spawn where that is missing), never fork: the pool is
+created and recreated while other threads are running, and a forked child would
+inherit whatever locks those threads held at that moment.
+
+Verification codes are short-lived and only need to resist online guessing (attempts
+are already rate-limited), so they use a keyed HMAC instead of a full password KDF.
+"""
+import hashlib
+import hmac
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full and the caller should retry later."""
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _timed_call(func, *args):
+    # Runs in the pool process; the start timestamp lets the parent compute queue time.
+    return time.time(), func(*args)
+
+
+class PasswordHasher:
+    """Run password hash/verify calls in a bounded process pool.
+
+    ``workers=0`` runs the KDF inline on the calling thread (still subject to the
+    concurrency cap), which is handy for development and tests.
+    """
+
+    def __init__(self, method: str = 'scrypt', workers: int = 2, max_pending: int = 64,
+                 acquire_timeout: float = 5.0, window: int = 1024):
+        self.method = method
+        self.workers = workers
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._current_params = None
+        self._probe = None
+        self._queue_times = deque(maxlen=window)
+        self.stats = {'calls': 0, 'rejected': 0, 'queue_time_max': 0.0}
+
+    @property
+    def current_params(self) -> str:
+        """Hash prefix (everything before the salt) for the configured parameters, e.g. "scrypt:32768:8:1".
+
+        Found by hashing a probe, which costs a full KDF run; ``warm_up`` starts it in the pool
+        at startup, so normally this only reads the finished result.
+        """
+        if self._current_params is None:
+            self.warm_up()
+            try:
+                probe_hash = self._probe.result()
+            except Exception:
+                # the pool broke while probing; this is rare enough to pay for inline
+                probe_hash = generate_password_hash('probe', method=self.method)
+            self._current_params = probe_hash.split('$', 1)[0]
+        return self._current_params
+
+    def warm_up(self) -> None:
+        """Start the parameter probe in the pool (a thread when ``workers=0``) without waiting for it."""
+        with self._pool_lock:
+            if self._probe is not None:
+                return
+            self._probe = probe = Future()
+        if self.workers <= 0:
+            threading.Thread(target=lambda: probe.set_result(generate_password_hash('probe', method=self.method)),
+                             name='hash-probe', daemon=True).start()
+            return
+        try:
+            pooled = self._executor().submit(generate_password_hash, 'probe', self.method)
+        except Exception as e:
+            probe.set_exception(e)
+            return
+        pooled.add_done_callback(lambda f: probe.set_exception(f.exception()) if f.exception() else probe.set_result(f.result()))
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, func, *args):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.stats['rejected'] += 1
+            raise HashingBusy('password hashing queue is full')
+        try:
+            submitted = time.time()
+            if self.workers <= 0:
+                started, result = _timed_call(func, *args)
+            else:
+                try:
+                    started, result = self._executor().submit(_timed_call, func, *args).result()
+                except BrokenProcessPool:
+                    # A pool process died (OOM killer etc.); start a fresh pool and retry once
+                    self._reset_pool()
+                    started, result = self._executor().submit(_timed_call, func, *args).result()
+            self._record(max(0.0, started - submitted))
+            return result
+        finally:
+            self._slots.release()
+
+    def _record(self, queued: float) -> None:
+        self.stats['calls'] += 1
+        self._queue_times.append(queued)
+        if queued > self.stats['queue_time_max']:
+            self.stats['queue_time_max'] = queued
+
+    def queue_time_summary(self) -> dict:
+        """Queue-time percentiles (seconds) over the most recent calls."""
+        samples = sorted(self._queue_times)
+        if not samples:
+            return {'count': 0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        return {
+            'count': len(samples),
+            'p50': samples[len(samples) // 2],
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1],
+        }
+
+    def snapshot(self) -> dict:
+        return {'workers': self.workers, 'queue_time': self.queue_time_summary(), 'stats': dict(self.stats)}
+
+    def hash(self, password: str) -> str:
+        return self._call(generate_password_hash, password, self.method)
+
+    def verify(self, pw_hash: str, password: str) -> bool:
+        try:
+            return bool(self._call(check_password_hash, pw_hash, password))
+        except HashingBusy:
+            raise
+        except Exception:
+            return False
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        """True when a stored hash was produced with different KDF parameters."""
+        return (pw_hash or '').split('$', 1)[0] != self.current_params
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+
+
+def code_digest(secret: str, email: str, code: str) -> str:
+    """HMAC a verification code, bound to the email it was issued for."""
+    msg = f"{email}:{code}".encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), msg, hashlib.sha256).hexdigest()
+
+
+def check_code(secret: str, email: str, code: str, digest: str) -> bool:
+    return hmac.compare_digest(code_digest(secret, email, code), digest or '')
@@ -0,0 +1,314 @@
+"""Cross-worker cache invalidation.
+
+Each worker keeps its own in-process caches (login rows, profiles, exam reservations).
+When one worker changes the underlying data it publishes ``(namespace, key)`` on the
+bus. Every worker, including the publisher, then drops its cached entry.
+
+Every message carries its publisher's id (``origin``) and a per-publisher sequence
+number (``version``). Receivers drop a message they have already applied, identified
+by ``(origin, version)`` or, for the Oracle transport, by the table's ``seq``; any
+other message evicts, whatever order it arrives in. Publisher clocks are never
+compared, so clock drift between hosts cannot make a genuine invalidation look stale.
+
+Each applied invalidation bumps a local per-key counter. A reader can take
+``version(ns, key)`` before loading from the database and only cache the result if
+the version is unchanged afterwards, so a load that raced with an invalidation does
+not put stale data back. Counters of keys not invalidated for ``keep_seconds`` are
+forgotten (``version`` returns 0 again), which keeps the table bounded.
+
+Transports:
+
+* ``LocalTransport``: in-process fan-out (one worker, or several buses in a test).
+* ``UnixSocketTransport``: datagrams between processes on one host via a shared
+  directory of sockets (POSIX only).
+* ``OraclePollingTransport``: the CacheInvalidations table, polled every
+  ``interval`` seconds; that interval bounds the propagation delay.
+
+Every received message records its propagation lag (receive time minus publish time).
+"""
+import glob
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def _message(namespace: str, key, origin: str, version: int) -> dict:
+    return {'ns': namespace, 'key': str(key), 'version': version, 'at': int(time.time() * 1000),
+            'origin': origin}
+
+
+class LocalTransport:
+    """Deliver synchronously to every bus attached to this transport object."""
+
+    def __init__(self):
+        self._receivers = []
+        self._lock = threading.Lock()
+
+    def start(self, deliver) -> None:
+        with self._lock:
+            self._receivers.append(deliver)
+
+    def publish(self, messages: list) -> None:
+        with self._lock:
+            receivers = list(self._receivers)
+        for deliver in receivers:
+            deliver(messages)
+
+    def close(self) -> None:
+        with self._lock:
+            self._receivers.clear()
+
+
+class UnixSocketTransport:
+    """One datagram socket per worker in ``directory``; publishing sends to all of them."""
+
+    def __init__(self, directory: str, logger: logging.Logger = None):
+        self.directory = directory
+        self.logger = logger or logging.getLogger(__name__)
+        self.path = os.path.join(directory, 'worker-%d-%s.sock' % (os.getpid(), uuid.uuid4().hex[:8]))
+        self._sock = None
+        self._thread = None
+
+    def start(self, deliver) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._thread = threading.Thread(target=self._run, args=(deliver,), name='invalidation-socket', daemon=True)
+        self._thread.start()
+
+    def _run(self, deliver) -> None:
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                return
+            try:
+                deliver([json.loads(data)])
+            except Exception:
+                self.logger.exception('Bad invalidation datagram')
+
+    def publish(self, messages: list) -> None:
+        data = [json.dumps(m, separators=(',', ':')).encode('utf-8') for m in messages]
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for path in glob.glob(os.path.join(self.directory, 'worker-*.sock')):
+                if path == self.path:
+                    continue
+                try:
+                    for datagram in data:
+                        sender.sendto(datagram, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # socket file of a worker that exited without cleaning up
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+        finally:
+            sender.close()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class OraclePollingTransport:
+    """Share invalidations through the CacheInvalidations table."""
+
+    # Identity values are handed out at insert but become visible at commit, so a lower seq
+    # can appear after a higher one was read. Each poll re-reads this many seqs below the
+    # high-water mark and skips the ones already delivered.
+    OVERLAP = 200
+
+    def __init__(self, connect, interval: float = 1.0, keep_seconds: int = 3600, logger: logging.Logger = None):
+        self._connect = connect
+        self.interval = interval
+        self.keep_seconds = keep_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self._high_water = None
+        self._seen = set()
+        self._last_purge = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, deliver) -> None:
+        self._thread = threading.Thread(target=self._run, args=(deliver,), name='invalidation-poll', daemon=True)
+        self._thread.start()
+
+    def publish(self, messages: list) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT INTO CacheInvalidations (namespace, cache_key, version, published_at, origin) "
+                "VALUES (:1, :2, :3, :4, :5)",
+                [[m['ns'], m['key'], m['version'], m['at'], m['origin']] for m in messages]
+            )
+            if time.monotonic() - self._last_purge > 60:
+                self._last_purge = time.monotonic()
+                cur.execute("DELETE FROM CacheInvalidations WHERE published_at < :1",
+                            [int((time.time() - self.keep_seconds) * 1000)])
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    def poll(self) -> list:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            if self._high_water is None:
+                # start from the current end; anything older is already reflected in the DB
+                cur.execute("SELECT NVL(MAX(seq), 0) FROM CacheInvalidations")
+                self._high_water = int(cur.fetchone()[0])
+                cur.close()
+                return []
+            cur.execute(
+                "SELECT seq, namespace, cache_key, version, published_at, origin FROM CacheInvalidations "
+                "WHERE seq > :1 ORDER BY seq",
+                [self._high_water - self.OVERLAP]
+            )
+            rows = [r for r in cur.fetchall() if int(r[0]) not in self._seen]
+            cur.close()
+        finally:
+            conn.close()
+        if rows:
+            self._high_water = max(self._high_water, int(rows[-1][0]))
+            self._seen.update(int(r[0]) for r in rows)
+            floor = self._high_water - self.OVERLAP
+            self._seen = {seq for seq in self._seen if seq > floor}
+        return [{'ns': ns, 'key': key, 'version': int(version), 'at': int(at), 'origin': origin, 'seq': int(seq)}
+                for seq, ns, key, version, at, origin in rows]
+
+    def _run(self, deliver) -> None:
+        while not self._stop.is_set():
+            try:
+                messages = self.poll()
+                if messages:
+                    deliver(messages)
+            except Exception:
+                self.logger.exception('Cache invalidation poll failed')
+            self._stop.wait(self.interval)
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+class InvalidationBus:
+    """Publish and apply versioned cache invalidations over a transport."""
+
+    def __init__(self, transport, logger: logging.Logger = None, keep_seconds: float = 600.0,
+                 max_keys: int = 100000, max_seen: int = 10000):
+        self.transport = transport
+        self.origin = uuid.uuid4().hex
+        self.logger = logger or logging.getLogger(__name__)
+        self.keep_seconds = keep_seconds
+        self.max_keys = max_keys
+        self.max_seen = max_seen
+        self._handlers = {}
+        self._sequence = itertools.count(1)
+        self._counter = itertools.count(1)
+        # (ns, key) -> (local version, monotonic time of the last invalidation), oldest first
+        self._versions = OrderedDict()
+        # ids of recently applied messages, for dropping duplicates
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._started = False
+        self.stats = {'published': 0, 'received': 0, 'applied': 0, 'duplicates': 0, 'expired_keys': 0,
+                      'publish_errors': 0, 'lag_ms_last': None, 'lag_ms_max': 0, 'lag_ms_avg': None}
+
+    def subscribe(self, namespace: str, handler) -> None:
+        """Call ``handler(key)`` (key as a string) whenever ``namespace`` entries are invalidated."""
+        self._handlers.setdefault(namespace, []).append(handler)
+
+    def start(self) -> None:
+        if not self._started:
+            self._started = True
+            self.transport.start(self._deliver)
+
+    def close(self) -> None:
+        self.transport.close()
+
+    def version(self, namespace: str, key) -> int:
+        """Latest version seen for a key (0 if never invalidated)."""
+        with self._lock:
+            entry = self._versions.get((namespace, str(key)))
+        return entry[0] if entry is not None else 0
+
+    def publish(self, namespace: str, key) -> None:
+        """Invalidate locally right away, then tell the other workers."""
+        self.publish_many([(namespace, key)])
+
+    def publish_many(self, entries) -> None:
+        """Invalidate several (namespace, key) pairs with one transport call."""
+        messages = [_message(namespace, key, self.origin, next(self._sequence)) for namespace, key in entries]
+        if not messages:
+            return
+        for message in messages:
+            self._apply(message)
+        self.stats['published'] += len(messages)
+        try:
+            self.transport.publish(messages)
+        except Exception:
+            # Other workers fall back to their cache TTL for these keys
+            self.stats['publish_errors'] += 1
+            self.logger.exception('Failed to publish %d cache invalidation(s)', len(messages))
+
+    def _deliver(self, messages: list) -> None:
+        now_ms = time.time() * 1000
+        for message in messages:
+            if message.get('origin') == self.origin:
+                continue
+            self.stats['received'] += 1
+            lag = max(0.0, now_ms - message.get('at', now_ms))
+            avg = self.stats['lag_ms_avg']
+            self.stats['lag_ms_avg'] = lag if avg is None else 0.9 * avg + 0.1 * lag
+            self.stats['lag_ms_last'] = lag
+            self.stats['lag_ms_max'] = max(self.stats['lag_ms_max'], lag)
+            self._apply(message)
+
+    def _apply(self, message: dict) -> None:
+        # Evicting twice is harmless, so only exact duplicates are dropped; there is no "older"
+        # message to skip, since versions from different publishers are not comparable.
+        message_id = ('seq', message['seq']) if 'seq' in message else (message['origin'], message['version'])
+        ident = (message['ns'], message['key'])
+        now = time.monotonic()
+        with self._lock:
+            if message_id in self._seen:
+                self.stats['duplicates'] += 1
+                return
+            self._seen[message_id] = None
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            self._versions.pop(ident, None)
+            self._versions[ident] = (next(self._counter), now)
+            self._expire(now)
+        self.stats['applied'] += 1
+        for handler in self._handlers.get(message['ns'], ()):
+            try:
+                handler(message['key'])
+            except Exception:
+                self.logger.exception('Cache invalidation handler for %s failed', message['ns'])
+
+    def _expire(self, now: float) -> None:
+        # Entries are in invalidation order, so the expired ones are at the front. Past max_keys
+        # the oldest go early; a reader that loaded across that key then just skips caching.
+        while self._versions:
+            ident, (_, at) = next(iter(self._versions.items()))
+            if now - at < self.keep_seconds and len(self._versions) <= self.max_keys:
+                break
+            del self._versions[ident]
+            self.stats['expired_keys'] += 1
+
+    def snapshot(self) -> dict:
+        return {'transport': type(self.transport).__name__, 'keys_tracked': len(self._versions),
+                'stats': dict(self.stats)}
@@ -0,0 +1,117 @@
+"""Worker lifecycle: in-flight request tracking and graceful drain on SIGTERM.
+
+When the worker is told to stop, it first enters drain mode. Readiness then reports
+503 so the load balancer stops routing new traffic here, and routes marked as new
+work (starting an exam session) are refused. Requests already running, submits in
+particular, are allowed to finish. Once nothing is in flight, or ``drain_timeout``
+has passed, the registered shutdown hooks run in order (flush buffered writes, stop
+background threads). Finally the signal is re-delivered to whatever handler was
+installed before (gunicorn's), or the process exits as the default action would.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+
+
+class Lifecycle:
+    """Drain state, in-flight counter and ordered shutdown hooks of one worker."""
+
+    def __init__(self, drain_timeout: float = 30.0, logger: logging.Logger = None):
+        self.drain_timeout = drain_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.started_at = time.time()
+        self.draining_since = None
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._hooks = []
+        self._shutdown_lock = threading.Lock()
+        self._shut_down = False
+        self._previous_handlers = {}
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def enter(self) -> None:
+        with self._idle:
+            self._in_flight += 1
+
+    def leave(self) -> None:
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight <= 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until no request is in flight. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def on_shutdown(self, name: str, hook) -> None:
+        """Run ``hook(timeout)`` at shutdown, in registration order; ``timeout`` is the time left in seconds."""
+        self._hooks.append((name, hook))
+
+    def begin_drain(self, reason: str = '') -> None:
+        if self.draining_since is None:
+            self.draining_since = time.time()
+            self.logger.warning('Draining worker %d%s', os.getpid(), ': ' + reason if reason else '')
+
+    def shutdown(self) -> None:
+        """Drain, wait for in-flight requests, then run the hooks (once)."""
+        with self._shutdown_lock:
+            if self._shut_down:
+                return
+            self._shut_down = True
+        self.begin_drain('shutdown')
+        deadline = time.monotonic() + self.drain_timeout
+        if not self.wait_idle(self.drain_timeout):
+            self.logger.warning('Drain timed out with %d request(s) still in flight', self._in_flight)
+        for name, hook in self._hooks:
+            try:
+                hook(max(1.0, deadline - time.monotonic()))
+            except Exception:
+                self.logger.exception('Shutdown hook %s failed', name)
+        self.logger.warning('Worker %d drained', os.getpid())
+
+    # -- signals ------------------------------------------------------------------
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM,)) -> bool:
+        """Drain on these signals. Only possible from the main thread; returns False otherwise."""
+        try:
+            for signum in signals:
+                self._previous_handlers[signum] = signal.signal(signum, self._on_signal)
+        except ValueError:
+            return False
+        return True
+
+    def _on_signal(self, signum, frame) -> None:
+        # The handler runs on the main thread, which may be the one serving requests, so the
+        # waiting happens on a separate thread.
+        self.begin_drain('received signal %d' % signum)
+        threading.Thread(target=self._finish, args=(signum,), name='drain', daemon=True).start()
+
+    def _finish(self, signum) -> None:
+        self.shutdown()
+        previous = self._previous_handlers.get(signum, signal.SIG_DFL)
+        if callable(previous):
+            # e.g. gunicorn's worker handler, which then stops its accept loop and exits
+            previous(signum, None)
+        elif previous != signal.SIG_IGN:
+            # the default action of SIGTERM is to terminate; do that now that the work is done
+            logging.shutdown()
+            os._exit(128 + signum)
+
+    def snapshot(self) -> dict:
+        return {'pid': os.getpid(), 'uptime_seconds': round(time.time() - self.started_at, 1),
+                'draining': self.draining, 'in_flight': self._in_flight}
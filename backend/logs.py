@@ -0,0 +1,241 @@
+"""Structured, non-blocking logging.
+
+Request threads never write log output themselves. A ``QueueHandler`` on the root
+logger puts each record on a bounded in-memory queue, and one ``QueueListener``
+thread formats the records as JSON lines and writes them to stderr. When the queue
+is full, records are dropped and counted instead of blocking the request.
+
+Two filters run on the calling thread before a record is queued:
+
+* ``RepeatFilter`` lets the first occurrence of a warning or error through, then
+  suppresses the same call site (logger, file, line, message template) for
+  ``window`` seconds. The next record from that site that gets through carries a
+  ``repeated`` count, so a failure storm costs one line per window instead of one
+  per request.
+* ``SampleFilter`` keeps a fraction of the records below WARNING. The decision is
+  made per request id, so a sampled request keeps all of its lines.
+
+Each record is tagged with the correlation fields bound for the current request
+(``request_id``, ``route``, ``user_id``, ``session_id``; see ``bind``). They live in a
+``contextvars`` variable, so every thread and every WebSocket connection sees only
+its own request's fields.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+
+_context = contextvars.ContextVar('log_context', default={})
+# Attributes every LogRecord has; anything else on a record came from ``extra=`` and is emitted
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def bind(**fields) -> None:
+    """Add correlation fields to every record logged from the current context. None values are skipped."""
+    current = dict(_context.get())
+    current.update((k, v) for k, v in fields.items() if v is not None)
+    _context.set(current)
+
+
+def clear() -> None:
+    _context.set({})
+
+
+def context() -> dict:
+    return _context.get()
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound correlation fields onto the record (as ``record.context``)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'context'):
+            record.context = _context.get()
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """Suppress a WARNING-or-above call site for ``window`` seconds after it logged."""
+
+    def __init__(self, window: float = 60.0, max_sites: int = 10000):
+        super().__init__()
+        self.window = window
+        self.max_sites = max_sites
+        self._lock = threading.Lock()
+        # (logger, pathname, lineno, msg) -> [window start (monotonic), suppressed count]
+        self._sites = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0 or record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is not None and now - site[0] < self.window:
+                site[1] += 1
+                self.suppressed += 1
+                return False
+            if site is not None and site[1]:
+                record.repeated = site[1]
+            if site is None and len(self._sites) >= self.max_sites:
+                self._prune(now)
+            self._sites[key] = [now, 0]
+        return True
+
+    def _prune(self, now: float) -> None:
+        # Sites whose window is over and that suppressed nothing carry no information
+        for key, (started, count) in list(self._sites.items()):
+            if now - started >= self.window and not count:
+                del self._sites[key]
+        if len(self._sites) >= self.max_sites:
+            self._sites.clear()
+
+
+class SampleFilter(logging.Filter):
+    """Keep ``rate`` of the records below WARNING, chosen per request id when one is bound."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self._threshold = int(max(0.0, min(rate, 1.0)) * 0xFFFFFFFF)
+        self._counter = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        request_id = getattr(record, 'context', None) or _context.get()
+        request_id = request_id.get('request_id')
+        if request_id is not None:
+            keep = zlib.crc32(str(request_id).encode()) <= self._threshold
+        else:
+            # outside a request: keep every n-th record
+            self._counter += 1
+            keep = self.rate > 0 and self._counter % max(1, round(1 / self.rate)) == 0
+        if not keep:
+            self.dropped += 1
+        return keep
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation fields, extras, exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key != 'context':
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line format, with the correlation fields appended."""
+
+    def __init__(self):
+        super().__init__('[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = dict(getattr(record, 'context', None) or {})
+        if getattr(record, 'repeated', None):
+            fields['repeated'] = record.repeated
+        if not fields:
+            return line
+        head, sep, tail = line.partition('\n')
+        return head + ' ' + ' '.join('%s=%s' % kv for kv in fields.items()) + sep + tail
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that drops (and counts) records when the queue is full."""
+
+    def __init__(self, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The record stays in this process, so unlike the base class it is not flattened for
+        # pickling: only the message is rendered now, before the caller can change its arguments,
+        # and the traceback is formatted later by the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class LogPipeline:
+    """Root logger -> filters -> bounded queue -> listener thread -> stderr."""
+
+    def __init__(self, level: str = 'INFO', fmt: str = 'json', queue_size: int = 10000,
+                 repeat_window: float = 60.0, sample_rate: float = 1.0, stream=None):
+        self.handler = NonBlockingQueueHandler(queue_size)
+        self.repeats = RepeatFilter(repeat_window)
+        self.sampler = SampleFilter(sample_rate)
+        for f in (ContextFilter(), self.repeats, self.sampler):
+            self.handler.addFilter(f)
+        self.output = logging.StreamHandler(stream or sys.stderr)
+        self.output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+        self.output.addFilter(ContextFilter())
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.output, respect_handler_level=False)
+        self.level = level
+        self._started = False
+
+    def install(self, *loggers: logging.Logger) -> None:
+        """Route the root logger (and these loggers, e.g. Flask's app.logger) through the queue."""
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(self.level.upper())
+        for logger in loggers:
+            # Drop their own handlers (Flask's default stderr handler) and let records propagate
+            for existing in list(logger.handlers):
+                logger.removeHandler(existing)
+            logger.setLevel(logging.NOTSET)
+            logger.propagate = True
+        if not self._started:
+            self.listener.start()
+            self._started = True
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = None) -> None:
+        """Write out what is queued and stop the listener thread.
+
+        Records logged afterwards (the last lines of a shutdown) are written directly.
+        """
+        if self._started:
+            self._started = False
+            self.listener.stop()
+            root = logging.getLogger()
+            root.removeHandler(self.handler)
+            root.addHandler(self.output)
+
+    def snapshot(self) -> dict:
+        return {'queued': self.handler.queue.qsize(), 'dropped': self.handler.dropped,
+                'suppressed_repeats': self.repeats.suppressed, 'sampled_out': self.sampler.dropped}
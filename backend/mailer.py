@@ -0,0 +1,245 @@
+"""Background mail dispatcher used for verification emails.
+
+Messages are pushed onto a bounded queue by request handlers and delivered by a
+single worker thread that keeps one SMTP session open and reuses it across
+sends. Failed deliveries are retried with exponential backoff; messages that
+keep failing end up in ``dead_letters`` so they can be inspected or replayed.
+"""
+import heapq
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+
+class MailMessage:
+    """A single outgoing message plus its delivery bookkeeping."""
+
+    __slots__ = ('to_addr', 'subject', 'body', 'attempts', 'last_error', 'created_at')
+
+    def __init__(self, to_addr: str, subject: str, body: str):
+        self.to_addr = to_addr
+        self.subject = subject
+        self.body = body
+        self.attempts = 0
+        self.last_error = None
+        self.created_at = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            'to': self.to_addr,
+            'subject': self.subject,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at,
+        }
+
+
+class MailDispatcher:
+    """Deliver queued mail from a background thread over a persistent SMTP session.
+
+    ``use_ssl`` selects implicit TLS (SMTP_SSL, e.g. Gmail on 465); ``starttls`` upgrades a
+    plain connection. With both disabled the dispatcher talks plain SMTP, which is what a
+    local debugging server (``python -m aiosmtpd -n`` or similar) expects in tests.
+    """
+
+    def __init__(self, host: str, port: int, sender: str, username: str = None, password: str = None,
+                 use_ssl: bool = True, starttls: bool = False, queue_size: int = 1000, batch_size: int = 20,
+                 max_retries: int = 5, backoff_base: float = 2.0, backoff_max: float = 300.0,
+                 idle_timeout: float = 30.0, connect_timeout: float = 10.0, dead_letter_size: int = 500,
+                 logger: logging.Logger = None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        # Retries waiting for their backoff to elapse: heap of (ready_at, seq, message)
+        self._retries = []
+        self._seq = itertools.count()
+        self._smtp = None
+        self._last_used = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._in_flight = 0
+
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self.stats = {'enqueued': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'rejected': 0, 'connections': 0}
+
+    # -- public API -------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the worker thread (idempotent)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='mail-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask the worker to deliver what is queued, close the SMTP session and exit."""
+        self._stopping.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def enqueue(self, to_addr: str, subject: str, body: str) -> bool:
+        """Queue a message for delivery. Returns False when the queue is full."""
+        self.start()
+        msg = MailMessage(to_addr, subject, body)
+        try:
+            with self._idle:
+                self._queue.put_nowait(msg)
+                self._in_flight += 1
+        except queue.Full:
+            self.stats['rejected'] += 1
+            self.logger.warning('Mail queue full; dropping message to %s', to_addr)
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def depth(self) -> int:
+        """Number of messages queued or waiting for a retry."""
+        return self._queue.qsize() + len(self._retries)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every accepted message was either sent or dead-lettered."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    # -- worker -----------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+                continue
+            if self._stopping.is_set() and self._queue.empty() and not self._retries:
+                break
+            # Nothing to do: drop the SMTP session once it has been idle for a while so the
+            # server does not time it out under us mid-send.
+            if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._disconnect()
+        self._disconnect()
+
+    def _next_batch(self) -> list:
+        """Collect up to batch_size due messages, waiting until one is available or a retry is due."""
+        batch = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._retries)[2])
+        if not batch:
+            wait = 1.0
+            if self._retries:
+                wait = min(wait, max(0.0, self._retries[0][0] - now))
+            try:
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch: list) -> None:
+        for msg in batch:
+            msg.attempts += 1
+            try:
+                self._send_one(msg)
+            except Exception as e:
+                msg.last_error = str(e)
+                # A broken session must not poison the rest of the batch
+                self._disconnect()
+                self._schedule_retry(msg)
+                continue
+            self.stats['sent'] += 1
+            self._done()
+            self.logger.info('Sent mail to %s', msg.to_addr)
+
+    def _send_one(self, msg: MailMessage) -> None:
+        import smtplib
+        payload = f"From: {self.sender}\r\nTo: {msg.to_addr}\r\nSubject: {msg.subject}\r\n\r\n{msg.body}"
+        smtp = self._connection()
+        try:
+            smtp.sendmail(self.sender, msg.to_addr, payload)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed a reused session; reconnect once before counting a failure
+            self._disconnect()
+            smtp = self._connection()
+            smtp.sendmail(self.sender, msg.to_addr, payload)
+        self._last_used = time.monotonic()
+
+    def _schedule_retry(self, msg: MailMessage) -> None:
+        if msg.attempts > self.max_retries:
+            self.stats['dead'] += 1
+            self.dead_letters.append(msg)
+            self._done()
+            self.logger.error('Giving up on mail to %s after %d attempts: %s', msg.to_addr, msg.attempts, msg.last_error)
+            return
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (msg.attempts - 1)))
+        delay *= random.uniform(0.8, 1.2)
+        self.stats['retried'] += 1
+        heapq.heappush(self._retries, (time.monotonic() + delay, next(self._seq), msg))
+        self.logger.warning('Mail to %s failed (attempt %d), retrying in %.1fs: %s', msg.to_addr, msg.attempts, delay, msg.last_error)
+
+    def _done(self) -> None:
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight <= 0:
+                self._idle.notify_all()
+
+    def _connection(self):
+        if self._smtp is not None:
+            return self._smtp
+        # imported here: only the dispatcher thread needs them, not app startup
+        import smtplib
+        import ssl
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.connect_timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.connect_timeout)
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        self._last_used = time.monotonic()
+        self.stats['connections'] += 1
+        return smtp
+
+    def _disconnect(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
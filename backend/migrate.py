@@ -0,0 +1,277 @@
+"""Versioned schema migrations and execution-plan checks for the Oracle database.
+
+Migrations are the ``migrations/NNNN_name.sql`` files, applied in order. Each applied
+version is recorded in SchemaVersion together with the file checksum, so editing a
+migration after it has run is reported instead of silently diverging.
+
+Usage (reads ORACLE_DB_USER / ORACLE_DB_PASS / ORACLE_DB_DSN like the app):
+
+    python migrate.py status             list migrations and whether they are applied
+    python migrate.py up [--check]       apply pending migrations (then run the plan check)
+    python migrate.py baseline VERSION   mark migrations up to VERSION as applied without
+                                         running them (databases created from create_tables.sql)
+    python migrate.py check              EXPLAIN every hot query; exit 1 if any full-scans
+"""
+import hashlib
+import os
+import re
+import sys
+
+from dotenv import load_dotenv
+
+import attempts
+import audit
+import events
+import queries
+import questionbank
+import tokens
+import versions
+
+try:
+    import oracledb  # optional: may not be installed in dev
+except Exception:
+    oracledb = None
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+_FILENAME = re.compile(r'^(\d{4})_([\w-]+)\.sql$')
+# Statements that contain their own semicolons and end with a "/" line instead
+_PLSQL = re.compile(r'^\s*(BEGIN|DECLARE|CREATE\s+(OR\s+REPLACE\s+)?(TRIGGER|PROCEDURE|FUNCTION|PACKAGE))\b', re.I)
+
+
+# Queries on the request hot paths, taken from the constants the code executes so the
+# checked text cannot drift from it. ``full_scan_ok`` lists tables a query may legitimately
+# read in full (small tables listed as a whole). Plans depend on optimizer statistics, so
+# run the check against a database with realistic data.
+HOT_QUERIES = {
+    'session_by_id': {'sql': queries.SUBMIT_SESSION},
+    'autosave_claim_seq': {'sql': queries.CLAIM_ANSWER_SEQ},
+    'autosave_upsert': {'sql': queries.UPDATE_SAVED_ANSWER},
+    'saved_answers_since': {'sql': queries.SAVED_ANSWERS_SINCE},
+    'active_session': {'sql': queries.ACTIVE_SESSION},
+    'reserved_sessions': {'sql': events.RESERVED_SESSIONS_SQL},
+    'exam_event_access': {'sql': events.EVENT_ACCESS_SQL},
+    'exam_reservation': {'sql': events.RESERVATION_SQL},
+    'quiz_taken': {'sql': queries.QUIZ_TAKEN},
+    'user_quiz_result': {'sql': queries.USER_QUIZ_RESULT},
+    'quiz_results': {'sql': queries.QUIZ_RESULTS},
+    'question_count': {'sql': queries.QUESTION_COUNT},
+    'quiz_questions': {'sql': queries.QUIZ_QUESTIONS},
+    'question_answers': {'sql': queries.QUESTION_ANSWERS},
+    'current_version': {'sql': versions.CURRENT_VERSION_SQL},
+    'version_snapshot': {'sql': versions.SNAPSHOT_SQL},
+    'draft_quiz': {'sql': versions.DRAFT_QUIZ_SQL},
+    'draft_questions': {'sql': versions.DRAFT_QUESTIONS_SQL},
+    'draft_answers': {'sql': versions.DRAFT_ANSWERS_SQL},
+    'bank_export': {'sql': questionbank.EXPORT_SQL},
+    'login_by_email': {'sql': queries.LOGIN_BY_EMAIL},
+    'profile_by_id': {'sql': queries.PROFILE_BY_ID},
+    'refresh_token': {'sql': tokens.REFRESH_TOKEN_SQL},
+    'users_by_client_ip': {'sql': queries.USERS_BY_CLIENT_IP},
+    'user_attempts': {'sql': attempts.page_sql(keyset=True)},
+    'audit_log_page': {'sql': audit.page_sql([audit.KEYSET])},
+    'quiz_list': {
+        'sql': queries.QUIZ_LIST,
+        # every quiz is listed
+        'full_scan_ok': {'QUIZ'},
+    },
+}
+
+
+def connect():
+    load_dotenv()
+    if oracledb is None:
+        raise SystemExit('oracledb is not installed')
+    return oracledb.connect(user=os.environ.get('ORACLE_DB_USER'), password=os.environ.get('ORACLE_DB_PASS'),
+                            dsn=os.environ.get('ORACLE_DB_DSN'))
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list:
+    """[(version, name, path)] of migration files, in version order."""
+    found = []
+    for filename in sorted(os.listdir(directory)):
+        m = _FILENAME.match(filename)
+        if m:
+            found.append((int(m.group(1)), m.group(2), os.path.join(directory, filename)))
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise SystemExit('Duplicate migration version numbers in %s' % directory)
+    return found
+
+
+def checksum(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _strip_comment(line: str) -> str:
+    """Remove a ``--`` comment that is not inside a string literal."""
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and line.startswith('--', i):
+            return line[:i].rstrip()
+    return line
+
+
+def split_statements(text: str) -> list:
+    """Split a SQL script into statements (without the trailing ``;``) for cursor.execute."""
+    statements = []
+    buf = []
+    plsql = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not buf and (not stripped or stripped.startswith('--')):
+            continue
+        if not buf:
+            plsql = bool(_PLSQL.match(line))
+        if plsql:
+            if stripped == '/':
+                statements.append('\n'.join(buf).strip())
+                buf = []
+            else:
+                buf.append(line)
+            continue
+        # drop trailing comments so "...; -- note" still terminates the statement
+        code = _strip_comment(line)
+        buf.append(code)
+        if code.rstrip().endswith(';'):
+            statements.append('\n'.join(buf).rstrip().rstrip(';').strip())
+            buf = []
+    if buf and '\n'.join(buf).strip():
+        statements.append('\n'.join(buf).strip().rstrip(';'))
+    return statements
+
+
+def ensure_version_table(cur) -> None:
+    cur.execute("SELECT COUNT(*) FROM user_tables WHERE table_name = 'SCHEMAVERSION'")
+    if int(cur.fetchone()[0]) == 0:
+        cur.execute(
+            "CREATE TABLE SchemaVersion ("
+            "version NUMBER PRIMARY KEY, name VARCHAR2(200) NOT NULL, checksum VARCHAR2(64) NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+
+
+def applied_versions(cur) -> dict:
+    cur.execute("SELECT version, name, checksum FROM SchemaVersion ORDER BY version")
+    return {int(v): (name, digest) for v, name, digest in cur.fetchall()}
+
+
+def status(conn) -> list:
+    cur = conn.cursor()
+    ensure_version_table(cur)
+    applied = applied_versions(cur)
+    cur.close()
+    rows = []
+    for version, name, path in discover():
+        state = 'pending'
+        if version in applied:
+            state = 'applied' if applied[version][1] == checksum(path) else 'applied (file changed since)'
+        rows.append((version, name, state))
+    return rows
+
+
+def upgrade(conn, out=print) -> int:
+    """Apply pending migrations in order; each one commits on success. Returns how many ran."""
+    cur = conn.cursor()
+    ensure_version_table(cur)
+    applied = applied_versions(cur)
+    count = 0
+    for version, name, path in discover():
+        if version in applied:
+            continue
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        out('Applying %04d_%s (%d statements)' % (version, name, len(statements)))
+        for statement in statements:
+            try:
+                cur.execute(statement)
+            except Exception:
+                # Oracle DDL auto-commits, so earlier statements of this file stay applied
+                out('Failed in %04d_%s at:\n%s' % (version, name, statement))
+                raise
+        cur.execute("INSERT INTO SchemaVersion (version, name, checksum) VALUES (:1, :2, :3)",
+                    [version, name, checksum(path)])
+        conn.commit()
+        count += 1
+    cur.close()
+    return count
+
+
+def baseline(conn, up_to: int) -> int:
+    """Record migrations up to ``up_to`` as applied without running them."""
+    cur = conn.cursor()
+    ensure_version_table(cur)
+    applied = applied_versions(cur)
+    count = 0
+    for version, name, path in discover():
+        if version <= up_to and version not in applied:
+            cur.execute("INSERT INTO SchemaVersion (version, name, checksum) VALUES (:1, :2, :3)",
+                        [version, name, checksum(path)])
+            count += 1
+    conn.commit()
+    cur.close()
+    return count
+
+
+def full_scans(conn, name: str, sql: str) -> list:
+    """Tables that the optimizer plans to read in full for ``sql``."""
+    statement_id = ('hot_' + name)[:30]
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM plan_table WHERE statement_id = :1", [statement_id])
+        cur.execute("EXPLAIN PLAN SET STATEMENT_ID = '%s' FOR %s" % (statement_id, sql))
+        cur.execute(
+            "SELECT object_name FROM plan_table WHERE statement_id = :1 "
+            "AND operation = 'TABLE ACCESS' AND options LIKE 'FULL%'",
+            [statement_id]
+        )
+        tables = sorted({r[0] for r in cur.fetchall() if r[0]})
+        cur.execute("DELETE FROM plan_table WHERE statement_id = :1", [statement_id])
+        conn.commit()
+        return tables
+    finally:
+        cur.close()
+
+
+def check_plans(conn, queries: dict = None, out=print) -> list:
+    """EXPLAIN every hot query; return [(name, tables)] of those that regressed to full scans."""
+    failures = []
+    for name, query in (queries or HOT_QUERIES).items():
+        tables = [t for t in full_scans(conn, name, query['sql']) if t not in query.get('full_scan_ok', ())]
+        out('%-22s %s' % (name, 'FULL SCAN of ' + ', '.join(tables) if tables else 'ok'))
+        if tables:
+            failures.append((name, tables))
+    return failures
+
+
+def main(argv: list) -> int:
+    if not argv or argv[0] not in ('status', 'up', 'baseline', 'check'):
+        print(__doc__)
+        return 2
+    command = argv[0]
+    conn = connect()
+    try:
+        if command == 'status':
+            for version, name, state in status(conn):
+                print('%04d_%-40s %s' % (version, name, state))
+            return 0
+        if command == 'baseline':
+            if len(argv) < 2 or not argv[1].isdigit():
+                print('usage: python migrate.py baseline VERSION')
+                return 2
+            print('Marked %d migration(s) as applied' % baseline(conn, int(argv[1])))
+            return 0
+        if command == 'up':
+            print('Applied %d migration(s)' % upgrade(conn))
+            if '--check' not in argv:
+                return 0
+        return 1 if check_plans(conn) else 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
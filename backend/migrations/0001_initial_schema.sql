@@ -1,4 +1,4 @@
--- Securinets-Quiz: Oracle SQL Table Definitions
+-- Securinets-Quiz: initial Oracle schema (the original create_tables.sql)
 CREATE TABLE Users (
     userID NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     name VARCHAR2(100) NOT NULL,
@@ -94,14 +94,3 @@ CREATE TABLE SessionAnswers (
 );
 
 CREATE INDEX idx_sessionanswers_session_q ON SessionAnswers(session_id, questionID);
-
-select * FROM USERS;
-select * from ADMINLOG;
-
-DROP TABLE AdminLog CASCADE CONSTRAINTS;
-DROP TABLE Submissions CASCADE CONSTRAINTS;
-DROP TABLE Answers CASCADE CONSTRAINTS;
-DROP TABLE Questions CASCADE CONSTRAINTS;
-DROP TABLE UserQuiz CASCADE CONSTRAINTS;
-DROP TABLE Quiz CASCADE CONSTRAINTS;
-DROP TABLE Users CASCADE CONSTRAINTS;
\ No newline at end of file
@@ -0,0 +1,9 @@
+-- TokenRevocations: tokens for userID issued at or before revoked_at (epoch seconds) are rejected.
+-- Rows are only needed until expires_at (revoked_at + token lifetime).
+CREATE TABLE TokenRevocations (
+    userID NUMBER PRIMARY KEY,
+    revoked_at NUMBER NOT NULL,
+    expires_at NUMBER NOT NULL
+);
+
+CREATE INDEX idx_tokenrevocations_revoked ON TokenRevocations(revoked_at);
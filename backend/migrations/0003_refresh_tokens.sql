@@ -0,0 +1,14 @@
+-- RefreshTokens: rotating refresh tokens (only the SHA-256 of the token is stored).
+-- Tokens rotated from the same login share a family_id; replaying a used token drops the family.
+CREATE TABLE RefreshTokens (
+    token_hash VARCHAR2(64) PRIMARY KEY,
+    userID NUMBER NOT NULL REFERENCES Users(userID) ON DELETE CASCADE,
+    family_id VARCHAR2(36) NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    used_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_refreshtokens_user ON RefreshTokens(userID);
+CREATE INDEX idx_refreshtokens_family ON RefreshTokens(family_id);
+CREATE INDEX idx_refreshtokens_expires ON RefreshTokens(expires_at);
@@ -0,0 +1,4 @@
+-- Resuming a session: saves are numbered per session so a client can resync only what
+-- changed since the last sequence number it saw.
+ALTER TABLE Sessions ADD (answer_seq NUMBER DEFAULT 0); -- last SessionAnswers.seq handed out for this session
+ALTER TABLE SessionAnswers ADD (seq NUMBER); -- per-session save sequence, used for incremental resync
@@ -0,0 +1,23 @@
+-- QuizVersions: immutable JSON snapshots of a quiz (questions, answers and key) taken on each publish.
+-- Sessions pin the version they started on; unreferenced non-current versions are garbage-collected.
+CREATE TABLE QuizVersions (
+    versionID NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    quizID NUMBER NOT NULL REFERENCES Quiz(quizID) ON DELETE CASCADE,
+    version_no NUMBER NOT NULL,
+    content_hash VARCHAR2(64) NOT NULL,
+    snapshot CLOB NOT NULL CHECK (snapshot IS JSON),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_quizversions_no UNIQUE (quizID, version_no)
+);
+
+-- QuizVersions.versionID served to new sessions. Existing quizzes start without one; their
+-- first version is published when the next session starts.
+ALTER TABLE Quiz ADD (current_version NUMBER);
+
+-- Removed from the draft, kept for older versions
+ALTER TABLE Questions ADD (retired CHAR(1) DEFAULT 'N' NOT NULL CHECK (retired IN ('Y', 'N')));
+ALTER TABLE Answers ADD (retired CHAR(1) DEFAULT 'N' NOT NULL CHECK (retired IN ('Y', 'N')));
+
+-- Content version this attempt is graded against (NULL for sessions started before versioning)
+ALTER TABLE Sessions ADD (versionID NUMBER REFERENCES QuizVersions(versionID) ON DELETE SET NULL);
+CREATE INDEX idx_sessions_version ON Sessions(versionID);
@@ -0,0 +1,10 @@
+-- Per-session question sampling and answer shuffling
+ALTER TABLE Quiz ADD (
+    pool_size NUMBER, -- questions drawn per attempt; NULL = all
+    stratify_by VARCHAR2(20) CHECK (stratify_by IN ('category', 'difficulty')),
+    shuffle_questions CHAR(1) DEFAULT 'N' CHECK (shuffle_questions IN ('Y', 'N')),
+    shuffle_answers CHAR(1) DEFAULT 'N' CHECK (shuffle_answers IN ('Y', 'N'))
+);
+
+-- Regenerates this attempt's question draw and answer order; NULL = full quiz, unshuffled
+ALTER TABLE Sessions ADD (seed NUMBER);
@@ -0,0 +1,15 @@
+-- One graded attempt per user and quiz: a duplicate submit racing on another worker fails
+-- this constraint instead of grading twice.
+
+-- The original schema allowed several rows per (userID, quizID); keep the newest attempt.
+-- Rows with both columns NULL do not conflict under a UNIQUE constraint and are left alone.
+DELETE FROM UserQuiz WHERE userQuizID IN (
+    SELECT userQuizID FROM (
+        SELECT userQuizID,
+               ROW_NUMBER() OVER (PARTITION BY userID, quizID ORDER BY taken_at DESC NULLS LAST, userQuizID DESC) AS rn
+        FROM UserQuiz
+        WHERE userID IS NOT NULL OR quizID IS NOT NULL
+    ) WHERE rn > 1
+);
+
+ALTER TABLE UserQuiz ADD CONSTRAINT uq_userquiz_user_quiz UNIQUE (userID, quizID);
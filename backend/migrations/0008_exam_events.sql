@@ -0,0 +1,25 @@
+-- ExamEvents: scheduled sittings of a quiz. Before starts_at the scheduler pins the version and
+-- pre-creates a 'reserved' session for every eligible user listed in ExamEventUsers.
+CREATE TABLE ExamEvents (
+    eventID NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    quizID NUMBER NOT NULL REFERENCES Quiz(quizID) ON DELETE CASCADE,
+    starts_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ends_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    versionID NUMBER REFERENCES QuizVersions(versionID) ON DELETE SET NULL, -- pinned when prepared
+    status VARCHAR2(16) DEFAULT 'scheduled' NOT NULL CHECK (status IN ('scheduled', 'prepared', 'closed', 'cancelled')),
+    prepared_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT SYSTIMESTAMP
+);
+
+CREATE INDEX idx_examevents_status_start ON ExamEvents(status, starts_at);
+CREATE INDEX idx_examevents_quiz ON ExamEvents(quizID);
+
+CREATE TABLE ExamEventUsers (
+    eventID NUMBER NOT NULL REFERENCES ExamEvents(eventID) ON DELETE CASCADE,
+    userID NUMBER NOT NULL REFERENCES Users(userID) ON DELETE CASCADE,
+    CONSTRAINT pk_exameventusers PRIMARY KEY (eventID, userID)
+);
+
+-- Exam event that pre-allocated this session. Sessions.status gains 'reserved'.
+ALTER TABLE Sessions ADD (eventID NUMBER REFERENCES ExamEvents(eventID) ON DELETE SET NULL);
+CREATE INDEX idx_sessions_event_status ON Sessions(eventID, status);
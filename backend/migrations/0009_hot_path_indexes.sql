@@ -0,0 +1,25 @@
+-- Indexes and constraints for the hot request paths (see HOT_QUERIES in migrate.py).
+
+-- Quiz lists, admin reads, question counts and snapshot builds filter questions by quiz
+CREATE INDEX idx_questions_quiz ON Questions(quizID, retired);
+
+-- Per-question answer reads and snapshot joins
+CREATE INDEX idx_answers_question ON Answers(questionID, retired);
+
+-- "already taken" checks use the (userID, quizID) unique index from 0007;
+-- admin results read a quiz's attempts newest first
+CREATE INDEX idx_userquiz_quiz_taken ON UserQuiz(quizID, taken_at);
+
+-- Per-user answer history, and the ON DELETE CASCADE from Users
+CREATE INDEX idx_submissions_user_question ON Submissions(userID, questionID);
+-- ON DELETE CASCADE from Questions
+CREATE INDEX idx_submissions_question ON Submissions(questionID);
+
+-- One saved answer per question and session: the autosave upsert relies on it.
+-- Older racing saves may have left duplicates; keep the newest.
+DELETE FROM SessionAnswers WHERE id NOT IN (SELECT MAX(id) FROM SessionAnswers GROUP BY session_id, questionID);
+DROP INDEX idx_sessionanswers_session_q;
+ALTER TABLE SessionAnswers ADD CONSTRAINT uq_sessionanswers_session_q UNIQUE (session_id, questionID);
+
+-- Quiz lists are ordered by creation time
+CREATE INDEX idx_quiz_created ON Quiz(created_at);
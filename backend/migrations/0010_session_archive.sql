@@ -0,0 +1,25 @@
+-- Retention: finished sessions are compacted into one SessionArchive row (session, saved
+-- answers and graded submissions as JSON) and removed from the hot tables.
+
+-- Tie graded rows to the attempt that produced them so they can be archived with it
+ALTER TABLE Submissions ADD (session_id VARCHAR2(36), created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE INDEX idx_submissions_session ON Submissions(session_id);
+
+CREATE TABLE SessionArchive (
+    session_id VARCHAR2(36) PRIMARY KEY,
+    userID NUMBER,
+    quizID NUMBER,
+    versionID NUMBER,
+    status VARCHAR2(16),
+    score NUMBER,
+    start_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    payload CLOB NOT NULL CHECK (payload IS JSON), -- {"session": {...}, "answers": [...], "submissions": [...]}
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_sessionarchive_user_quiz ON SessionArchive(userID, quizID);
+CREATE INDEX idx_sessionarchive_archived ON SessionArchive(archived_at);
+
+-- Finds sessions past retention without scanning the live ones
+CREATE INDEX idx_sessions_status_updated ON Sessions(status, updated_at);
@@ -0,0 +1,2 @@
+-- Bulk moderation selects every user who had a session from a given address
+CREATE INDEX idx_sessions_client_ip ON Sessions(client_ip, userID);
@@ -0,0 +1,12 @@
+-- Audit log: who performed each admin action, and indexes for the paginated reader
+-- (newest first by timestamp, optionally filtered by action prefix or actor).
+ALTER TABLE AdminLog ADD (actor VARCHAR2(100), actorID NUMBER);
+
+-- Older rows only have the actor inside the reason text ("By <name> because of ...")
+UPDATE AdminLog SET actor = REGEXP_SUBSTR(reason, '^By (.+?)( because of .*| \(.*\))?$', 1, 1, 'n', 1)
+WHERE actor IS NULL AND reason LIKE 'By %';
+
+CREATE INDEX idx_adminlog_timestamp ON AdminLog(timestamp, logID);
+CREATE INDEX idx_adminlog_action ON AdminLog(action, timestamp);
+CREATE INDEX idx_adminlog_actor ON AdminLog(actor, timestamp);
+CREATE INDEX idx_adminlog_actor_id ON AdminLog(actorID, timestamp);
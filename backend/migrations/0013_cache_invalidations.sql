@@ -0,0 +1,14 @@
+-- Cross-worker cache invalidation: workers append (namespace, key) rows and poll for
+-- rows newer than the last seq they have seen (re-reading a short overlap for rows that
+-- commit late). Receivers drop a row whose seq they already applied. Rows are purged
+-- after an hour.
+CREATE TABLE CacheInvalidations (
+    seq NUMBER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    namespace VARCHAR2(30) NOT NULL,
+    cache_key VARCHAR2(200) NOT NULL,
+    version NUMBER NOT NULL,        -- per-publisher sequence; (origin, version) identifies the message
+    published_at NUMBER NOT NULL,   -- epoch ms, for propagation lag
+    origin VARCHAR2(32) NOT NULL    -- publishing worker
+);
+
+CREATE INDEX idx_cacheinvalidations_published ON CacheInvalidations(published_at);
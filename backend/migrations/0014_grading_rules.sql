@@ -0,0 +1,17 @@
+-- Grading rules: a per-quiz pass mark (fraction of the total points) and per-question
+-- multi-select, partial credit and negative marking.
+ALTER TABLE Quiz ADD (
+    pass_threshold NUMBER(5,4) DEFAULT 0.5 NOT NULL CONSTRAINT chk_quiz_pass_threshold CHECK (pass_threshold BETWEEN 0 AND 1)
+);
+
+ALTER TABLE Questions ADD (
+    multi_select CHAR(1) DEFAULT 'N' NOT NULL,
+    partial_credit CHAR(1) DEFAULT 'N' NOT NULL,
+    penalty NUMBER DEFAULT 0 NOT NULL CONSTRAINT chk_questions_penalty CHECK (penalty >= 0)
+);
+
+-- Multi-select answers are saved as a sorted comma-separated list of answerIDs
+ALTER TABLE SessionAnswers ADD (answer_set VARCHAR2(400));
+
+-- Points earned per question (partial credit and penalties make this more than a Y/N)
+ALTER TABLE Submissions ADD (points_earned NUMBER);
@@ -0,0 +1,2 @@
+-- Attempt history (/api/me/attempts) pages a user's UserQuiz rows newest first
+CREATE INDEX idx_userquiz_user_taken ON UserQuiz(userID, taken_at, userQuizID);
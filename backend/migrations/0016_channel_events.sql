@@ -0,0 +1,3 @@
+-- Session channel events (notices, forced expiry) travel between workers on the cache bus
+-- with the event as the key, so the key column must fit a notice
+ALTER TABLE CacheInvalidations MODIFY (cache_key VARCHAR2(4000));
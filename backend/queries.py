@@ -0,0 +1,52 @@
+"""SQL of the request hot paths run by the routes in app.py.
+
+The routes execute these constants and ``migrate.py check`` explains the same
+constants, so a statement cannot change in one place and not in the other. Queries
+owned by other modules live next to the code that runs them (versions.py, events.py,
+tokens.py, attempts.py, audit.py, questionbank.py).
+"""
+
+# -- sessions and autosave ----------------------------------------------------------
+
+SUBMIT_SESSION = "SELECT userID, quizID, status, expires_at, versionID, seed, score FROM Sessions WHERE session_id = :1"
+ACTIVE_SESSION = (
+    "SELECT session_id, start_at, expires_at, status, answer_seq, versionID, seed FROM Sessions "
+    "WHERE userID = :1 AND quizID = :2 AND status = 'active' ORDER BY start_at DESC"
+)
+# the route adds a RETURNING clause, which EXPLAIN PLAN does not take
+CLAIM_ANSWER_SEQ = (
+    "UPDATE Sessions SET answer_seq = NVL(answer_seq, 0) + 1, last_seen = :1 "
+    "WHERE session_id = :2 AND userID = :3 AND quizID = :4 AND status = 'active' "
+    "AND (expires_at IS NULL OR expires_at >= :5)"
+)
+UPDATE_SAVED_ANSWER = (
+    "UPDATE SessionAnswers SET answerID = :1, answer_set = :2, updated_at = :3, seq = :4 "
+    "WHERE session_id = :5 AND questionID = :6"
+)
+SAVED_ANSWERS_SINCE = (
+    "SELECT questionID, answerID, answer_set, seq FROM SessionAnswers WHERE session_id = :1 AND NVL(seq, 0) > :2 "
+    "ORDER BY seq"
+)
+
+# -- quizzes and results ------------------------------------------------------------
+
+QUIZ_LIST = "SELECT quizID, title, description, timelimit, pool_size FROM Quiz ORDER BY created_at DESC"
+QUIZ_TAKEN = "SELECT 1 FROM UserQuiz WHERE quizID = :1 AND userID = :2"
+USER_QUIZ_RESULT = "SELECT score, passed FROM UserQuiz WHERE quizID = :1 AND userID = :2 ORDER BY taken_at DESC"
+QUIZ_RESULTS = (
+    "SELECT uq.userID, u.name, u.email, uq.score, uq.passed, uq.taken_at "
+    "FROM UserQuiz uq JOIN Users u ON uq.userID = u.userID "
+    "WHERE uq.quizID = :1 ORDER BY uq.taken_at DESC"
+)
+QUESTION_COUNT = "SELECT COUNT(*) FROM Questions WHERE quizID = :1 AND retired = 'N'"
+QUIZ_QUESTIONS = (
+    "SELECT questionID, title, category, difficulty, points, description, multi_select, partial_credit, penalty "
+    "FROM Questions WHERE quizID = :1 AND retired = 'N' ORDER BY questionID"
+)
+QUESTION_ANSWERS = "SELECT answerID, answer_text, is_correct FROM Answers WHERE questionID = :1 AND retired = 'N' ORDER BY answerID"
+
+# -- users --------------------------------------------------------------------------
+
+LOGIN_BY_EMAIL = "SELECT userID, name, email, password, role FROM Users WHERE email = :1"
+PROFILE_BY_ID = "SELECT name, email FROM Users WHERE userID = :1"
+USERS_BY_CLIENT_IP = "SELECT DISTINCT userID FROM Sessions WHERE client_ip = :1"
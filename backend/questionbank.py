@@ -0,0 +1,244 @@
+"""Streaming import and export of question banks.
+
+Two interchange formats are supported:
+
+* JSONL: one question per line, in the same shape the admin API uses:
+  ``{"title", "category", "difficulty", "points", "description", "multi_select", "partial_credit",
+  "penalty", "answers": [{"text", "is_correct"}]}``
+* CSV: a header row with ``title, category, difficulty, points, description, multi_select,
+  partial_credit, penalty`` (only ``title`` is required), then any
+  number of ``answer_1 .. answer_N`` columns and a ``correct`` column listing the
+  correct answer numbers separated by ``;`` (e.g. ``1;3``). CSV holds up to 10 answers.
+
+Import reads the upload one record at a time. It validates each record, inserts valid
+ones in array-bound batches (questions with DML RETURNING, then their answers), commits
+after every batch, and collects per-record errors instead of stopping. Export streams
+rows straight from a cursor and formats them one question at a time.
+"""
+import csv
+import io
+import json
+
+from db import optional_module
+
+oracledb = optional_module('oracledb')  # optional: may not be installed in dev
+
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ['title', 'category', 'difficulty', 'points', 'description', 'multi_select', 'partial_credit', 'penalty']
+MAX_ANSWERS = 10
+# Column sizes from the Questions/Answers tables
+_LIMITS = {'title': 200, 'category': 50, 'difficulty': 20, 'description': 500}
+_ANSWER_LIMIT = 500
+
+
+class BankFormatError(Exception):
+    """The upload itself cannot be read (bad format or header)."""
+
+
+def _flag(value) -> str:
+    """JSON booleans or CSV text (Y/yes/true/1) -> 'Y'/'N'."""
+    if isinstance(value, str):
+        return 'Y' if value.strip().lower() in ('y', 'yes', 'true', '1') else 'N'
+    return 'Y' if value else 'N'
+
+
+def validate_question(raw) -> dict:
+    """Normalize one record into insertable values or raise ValueError with the reason."""
+    if not isinstance(raw, dict):
+        raise ValueError('record must be an object')
+    title = (raw.get('title') or '').strip()
+    if not title:
+        raise ValueError('title is required')
+    q = {'title': title}
+    for field in ('category', 'difficulty', 'description'):
+        value = raw.get(field)
+        q[field] = str(value).strip() if value not in (None, '') else None
+    for field, limit in _LIMITS.items():
+        if q[field] is not None and len(q[field]) > limit:
+            raise ValueError('%s is longer than %d characters' % (field, limit))
+    points = raw.get('points')
+    if points in (None, ''):
+        q['points'] = None
+    else:
+        try:
+            q['points'] = float(points)
+        except (TypeError, ValueError):
+            raise ValueError('points must be a number')
+        if q['points'] < 0:
+            raise ValueError('points cannot be negative')
+    q['multi_select'] = _flag(raw.get('multi_select'))
+    q['partial_credit'] = _flag(raw.get('partial_credit'))
+    penalty = raw.get('penalty')
+    try:
+        q['penalty'] = float(penalty) if penalty not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        raise ValueError('penalty must be a number')
+    if q['penalty'] < 0:
+        raise ValueError('penalty cannot be negative')
+    answers = []
+    for a in raw.get('answers') or []:
+        text = (a.get('text') or '').strip() if isinstance(a, dict) else ''
+        if not text:
+            continue
+        if len(text) > _ANSWER_LIMIT:
+            raise ValueError('answer text is longer than %d characters' % _ANSWER_LIMIT)
+        answers.append((text, 'Y' if a.get('is_correct') else 'N'))
+    if len(answers) < 2:
+        raise ValueError('at least two answers are required')
+    if not any(flag == 'Y' for _, flag in answers):
+        raise ValueError('at least one answer must be correct')
+    q['answers'] = answers
+    return q
+
+
+def read_jsonl(stream):
+    """Yield (line_no, record or exception) from a binary stream of JSON lines."""
+    for line_no, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError('invalid JSON: %s' % e)
+
+
+def read_csv(stream):
+    """Yield (line_no, record or exception) from a binary CSV stream."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames or 'title' not in [f.strip().lower() for f in reader.fieldnames]:
+        raise BankFormatError('CSV header must include a title column')
+    for row in reader:
+        row = {(k or '').strip().lower(): v for k, v in row.items()}
+        texts = [(row.get('answer_%d' % i) or '').strip() for i in range(1, MAX_ANSWERS + 1)]
+        try:
+            correct = {int(x) for x in (row.get('correct') or '').replace(',', ';').split(';') if x.strip()}
+        except ValueError:
+            yield reader.line_num, ValueError('correct must list answer numbers, e.g. 1;3')
+            continue
+        record = {field: row.get(field) for field in CSV_FIELDS}
+        record['answers'] = [{'text': t, 'is_correct': i in correct} for i, t in enumerate(texts, start=1) if t]
+        yield reader.line_num, record
+
+
+class BankImporter:
+    """Append questions from a stream to a quiz in batches. Call ``run`` once."""
+
+    def __init__(self, conn, quiz_id: int, batch_size: int = 500, max_errors: int = 1000):
+        self.conn = conn
+        self.quiz_id = quiz_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self._batch = []
+
+    def _error(self, line_no: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_no, 'message': message})
+
+    def run(self, records) -> dict:
+        for line_no, record in records:
+            if isinstance(record, Exception):
+                self._error(line_no, str(record))
+                continue
+            try:
+                self._batch.append((line_no, validate_question(record)))
+            except ValueError as e:
+                self._error(line_no, str(e))
+                continue
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        self.flush()
+        return {'imported': self.imported, 'failed': self.failed, 'errors': self.errors,
+                'errors_truncated': self.failed > len(self.errors)}
+
+    def flush(self) -> None:
+        """Insert the pending batch with two array DML calls and commit it."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        cur = self.conn.cursor()
+        try:
+            qid_var = cur.var(oracledb.NUMBER, arraysize=len(batch))
+            cur.setinputsizes(None, None, None, None, None, None, None, None, None, qid_var)
+            cur.executemany(
+                "INSERT INTO Questions (quizID, title, category, difficulty, points, description, multi_select, partial_credit, penalty) "
+                "VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9) RETURNING questionID INTO :10",
+                [[self.quiz_id, q['title'], q['category'], q['difficulty'], q['points'], q['description'],
+                  q['multi_select'], q['partial_credit'], q['penalty']] for _, q in batch]
+            )
+            answer_rows = []
+            for i, (_, q) in enumerate(batch):
+                question_id = int(qid_var.getvalue(i)[0])
+                answer_rows.extend([question_id, text, flag] for text, flag in q['answers'])
+            cur.executemany("INSERT INTO Answers (questionID, answer_text, is_correct) VALUES (:1, :2, :3)", answer_rows)
+            self.conn.commit()
+            self.imported += len(batch)
+        except Exception as e:
+            # A batch fails as a whole (e.g. a constraint the validation does not know about)
+            self.conn.rollback()
+            for line_no, _ in batch:
+                self._error(line_no, 'database rejected the batch: %s' % e)
+        finally:
+            cur.close()
+
+
+# -- export ------------------------------------------------------------------------
+
+# Live questions joined with their answers, streamed in question order
+EXPORT_SQL = (
+    "SELECT q.questionID, q.title, q.category, q.difficulty, q.points, q.description, "
+    "q.multi_select, q.partial_credit, q.penalty, a.answer_text, a.is_correct "
+    "FROM Questions q LEFT JOIN Answers a ON a.questionID = q.questionID AND a.retired = 'N' "
+    "WHERE q.quizID = :1 AND q.retired = 'N' ORDER BY q.questionID, a.answerID"
+)
+
+
+def iter_questions(conn, quiz_id: int, arraysize: int = 1000):
+    """Yield live questions of a quiz with their answers, grouping rows as they stream in."""
+    cur = conn.cursor()
+    cur.arraysize = arraysize
+    try:
+        cur.execute(EXPORT_SQL, [quiz_id])
+        current = None
+        for qid, title, category, difficulty, points, description, multi, partial, penalty, text, is_correct in cur:
+            if current is None or current['questionID'] != qid:
+                if current is not None:
+                    yield current
+                current = {'questionID': qid, 'title': title, 'category': category, 'difficulty': difficulty,
+                           'points': points, 'description': description, 'multi_select': multi == 'Y',
+                           'partial_credit': partial == 'Y', 'penalty': float(penalty or 0), 'answers': []}
+            if text is not None:
+                current['answers'].append({'text': text, 'is_correct': is_correct == 'Y'})
+        if current is not None:
+            yield current
+    finally:
+        cur.close()
+
+
+def export_jsonl(questions):
+    for q in questions:
+        q.pop('questionID', None)
+        yield json.dumps(q, ensure_ascii=False) + '\n'
+
+
+def export_csv(questions):
+    header = CSV_FIELDS + ['answer_%d' % i for i in range(1, MAX_ANSWERS + 1)] + ['correct']
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield buf.getvalue()
+    for q in questions:
+        buf.seek(0)
+        buf.truncate()
+        answers = q['answers'][:MAX_ANSWERS]
+        texts = [a['text'] for a in answers] + [''] * (MAX_ANSWERS - len(answers))
+        correct = ';'.join(str(i) for i, a in enumerate(answers, start=1) if a['is_correct'])
+        writer.writerow([q['title'], q['category'] or '', q['difficulty'] or '',
+                         '' if q['points'] is None else q['points'], q['description'] or '',
+                         'Y' if q['multi_select'] else 'N', 'Y' if q['partial_credit'] else 'N',
+                         '' if q['penalty'] is None else q['penalty']] + texts + [correct])
+        yield buf.getvalue()
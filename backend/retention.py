@@ -0,0 +1,325 @@
+"""Retention for finished exam sessions.
+
+Sessions past the retention period are compacted into one SessionArchive row each
+(the session itself, its saved answers and its graded Submissions, as JSON) and then
+deleted from Sessions, SessionAnswers and Submissions. The live tables and their
+indexes then only hold recent attempts. Scores stay in UserQuiz. Expired refresh
+tokens are deleted by the same run.
+
+Each archived submission also keeps the question's title and points from the version
+the attempt was graded against, and the payload carries the attempt's ``total``, so
+the attempt history (attempts.py) can still show totals and a per-question breakdown
+after the version itself has been garbage-collected.
+
+Work happens in bounded batches (one transaction each, with a pause in between). By
+default it only runs inside the configured off-peak window. A dry run reports what a
+real run would remove, without changing anything.
+
+Usage (reads the ORACLE_DB_* and RETENTION_* settings through config.Config like the app):
+
+    python retention.py report           dry run: rows and estimated bytes reclaimable
+    python retention.py run [--now]      archive now (--now ignores the off-peak window)
+"""
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from versions import QuizVersionStore
+from tokens import RefreshTokenStore
+from db import optional_module
+
+oracledb = optional_module('oracledb')  # optional: may not be installed in dev
+
+
+# Finished sessions, or active ones whose time ran out long ago (abandoned)
+ELIGIBLE = (
+    "((s.status IN ('submitted', 'expired', 'cancelled') AND s.updated_at < :cutoff) "
+    "OR (s.status = 'active' AND s.expires_at < :cutoff))"
+)
+_TABLES = ('SESSIONS', 'SESSIONANSWERS', 'SUBMISSIONS')
+
+
+def parse_window(spec: str):
+    """``"01:00-05:00"`` (UTC) -> ((1, 0), (5, 0)); None for an empty spec (always allowed)."""
+    if not spec:
+        return None
+    start, end = spec.split('-', 1)
+    return _hour_minute(start), _hour_minute(end)
+
+
+def _hour_minute(part: str) -> tuple:
+    hour, minute = part.strip().split(':', 1)
+    return int(hour), int(minute)
+
+
+def in_window(window, now: datetime) -> bool:
+    if window is None:
+        return True
+    current = (now.hour, now.minute)
+    start, end = window
+    if start <= end:
+        return start <= current < end
+    # window wraps past midnight
+    return current >= start or current < end
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class RetentionJob:
+    """Archive and delete sessions older than ``retention_days``."""
+
+    def __init__(self, connect, retention_days: int = 180, batch_size: int = 500, max_batches: int = 200,
+                 pause: float = 0.5, window: str = '01:00-05:00', logger=None):
+        self._connect = connect
+        self.retention_days = retention_days
+        # batch IDs go into one IN list, which Oracle caps at 1000 entries
+        self.batch_size = max(1, min(batch_size, 1000))
+        self.max_batches = max_batches
+        self.pause = pause
+        self.window = parse_window(window)
+        self._logger = logger
+        self._versions = QuizVersionStore(cache_size=64)
+
+    def cutoff(self, now: datetime = None) -> datetime:
+        return (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+
+    # -- dry run ----------------------------------------------------------------
+
+    def report(self, now: datetime = None) -> dict:
+        """Rows a run would remove and an estimate of the bytes reclaimed (from optimizer stats)."""
+        cutoff = self.cutoff(now)
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM Sessions s WHERE " + ELIGIBLE, {'cutoff': cutoff})
+            sessions = int(cur.fetchone()[0])
+            cur.execute(
+                "SELECT COUNT(*) FROM SessionAnswers sa WHERE sa.session_id IN (SELECT s.session_id FROM Sessions s WHERE " + ELIGIBLE + ")",
+                {'cutoff': cutoff}
+            )
+            answers = int(cur.fetchone()[0])
+            cur.execute(
+                "SELECT COUNT(*) FROM Submissions sb WHERE sb.session_id IN (SELECT s.session_id FROM Sessions s WHERE " + ELIGIBLE + ")",
+                {'cutoff': cutoff}
+            )
+            submissions = int(cur.fetchone()[0])
+            cur.execute(
+                "SELECT table_name, avg_row_len FROM user_tables WHERE table_name IN ('SESSIONS', 'SESSIONANSWERS', 'SUBMISSIONS')"
+            )
+            row_len = {name: int(avg or 0) for name, avg in cur.fetchall()}
+            cur.execute("SELECT COUNT(*) FROM RefreshTokens WHERE expires_at < :1", [now or datetime.utcnow()])
+            refresh_tokens = int(cur.fetchone()[0])
+            cur.close()
+        finally:
+            conn.close()
+        rows = {'SESSIONS': sessions, 'SESSIONANSWERS': answers, 'SUBMISSIONS': submissions}
+        by_table = {name: {'rows': rows[name], 'bytes': rows[name] * row_len.get(name, 0)} for name in _TABLES}
+        return {
+            'dry_run': True,
+            'cutoff': cutoff.isoformat(),
+            'sessions': sessions,
+            'session_answers': answers,
+            'submissions': submissions,
+            'refresh_tokens': refresh_tokens,
+            'bytes_reclaimed': sum(t['bytes'] for t in by_table.values()),
+            # avg_row_len is 0 until the tables have optimizer statistics
+            'bytes_estimated_from_stats': all(row_len.get(name) for name in _TABLES),
+            'by_table': by_table,
+            'batches': -(-sessions // self.batch_size) if sessions else 0,
+        }
+
+    # -- archiving ----------------------------------------------------------------
+
+    def run(self, now: datetime = None, ignore_window: bool = False) -> dict:
+        """Archive eligible sessions batch by batch until done, out of batches, or out of the window."""
+        totals = {'dry_run': False, 'sessions': 0, 'session_answers': 0, 'submissions': 0,
+                  'archive_bytes': 0, 'batches': 0, 'stopped': 'done'}
+        cutoff = self.cutoff(now)
+        conn = self._connect()
+        try:
+            while True:
+                if totals['batches'] >= self.max_batches:
+                    totals['stopped'] = 'max_batches'
+                    break
+                if not ignore_window and not in_window(self.window, datetime.utcnow()):
+                    totals['stopped'] = 'outside_window'
+                    break
+                sessions, answers, submissions, size = self.archive_batch(conn, cutoff)
+                if sessions == 0:
+                    break
+                totals['batches'] += 1
+                totals['sessions'] += sessions
+                totals['session_answers'] += answers
+                totals['submissions'] += submissions
+                totals['archive_bytes'] += size
+                if sessions < self.batch_size:
+                    break
+                time.sleep(self.pause)
+            if totals['sessions']:
+                # versions only pinned by the archived sessions can go now
+                cur = conn.cursor()
+                totals['versions_collected'] = QuizVersionStore.collect_garbage(cur)
+                conn.commit()
+                cur.close()
+            totals['refresh_tokens'] = self.purge_refresh_tokens(conn, now or datetime.utcnow(), ignore_window)
+        finally:
+            conn.close()
+        if self._logger:
+            self._logger.info('Retention run: %s', totals)
+        return totals
+
+    def purge_refresh_tokens(self, conn, now: datetime, ignore_window: bool = False) -> int:
+        """Delete refresh tokens expired before ``now`` in batches; returns how many went."""
+        purged = 0
+        cur = conn.cursor()
+        try:
+            for _ in range(self.max_batches):
+                if not ignore_window and not in_window(self.window, datetime.utcnow()):
+                    break
+                count = RefreshTokenStore.purge_expired(cur, now, self.batch_size)
+                conn.commit()
+                purged += count
+                if count < self.batch_size:
+                    break
+                time.sleep(self.pause)
+        finally:
+            cur.close()
+        return purged
+
+    def archive_batch(self, conn, cutoff: datetime):
+        """Archive up to ``batch_size`` sessions in one transaction.
+
+        Returns (sessions, answers, submissions, archive payload bytes).
+        """
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT s.session_id, s.userID, s.quizID, s.versionID, s.seed, s.eventID, s.status, s.score, "
+                "s.start_at, s.expires_at, s.submitted_at, s.updated_at, s.answer_seq, s.client_ip, s.user_agent "
+                "FROM Sessions s WHERE " + ELIGIBLE + " AND ROWNUM <= :batch FOR UPDATE SKIP LOCKED",
+                {'cutoff': cutoff, 'batch': self.batch_size}
+            )
+            columns = [d[0].lower() for d in cur.description]
+            sessions = [dict(zip(columns, row)) for row in cur.fetchall()]
+            if not sessions:
+                conn.rollback()
+                return 0, 0, 0, 0
+            ids = [s['session_id'] for s in sessions]
+            binds = ', '.join(':%d' % (i + 1) for i in range(len(ids)))
+
+            answers = {sid: [] for sid in ids}
+            cur.execute(
+                "SELECT session_id, questionID, answerID, answer_set, seq, updated_at FROM SessionAnswers WHERE session_id IN (%s) "
+                "ORDER BY session_id, seq" % binds, ids
+            )
+            answer_count = 0
+            for sid, qid, aid, answer_set, seq, updated_at in cur.fetchall():
+                answers[sid].append({'questionID': qid, 'answerID': aid, 'answer_set': answer_set, 'seq': seq,
+                                     'updated_at': _iso(updated_at)})
+                answer_count += 1
+
+            submissions = {sid: [] for sid in ids}
+            cur.execute(
+                "SELECT session_id, questionID, iscorrect, points_earned FROM Submissions WHERE session_id IN (%s)" % binds, ids
+            )
+            submission_count = 0
+            for sid, qid, iscorrect, points_earned in cur.fetchall():
+                submissions[sid].append({'questionID': qid, 'iscorrect': iscorrect,
+                                         'points_earned': float(points_earned) if points_earned is not None else None})
+                submission_count += 1
+
+            total = self._describe_submissions(conn, sessions, submissions)
+
+            rows = []
+            size = 0
+            for s in sessions:
+                sid = s['session_id']
+                payload = json.dumps({'session': {k: _iso(v) for k, v in s.items()}, 'answers': answers[sid],
+                                      'submissions': submissions[sid], 'total': total[sid]}, separators=(',', ':'))
+                size += len(payload)
+                rows.append([sid, s['userid'], s['quizid'], s['versionid'], s['status'], s['score'], s['start_at'],
+                             s['submitted_at'] or s['updated_at'] or s['expires_at'], payload])
+            cur.setinputsizes(None, None, None, None, None, None, None, None, oracledb.DB_TYPE_CLOB)
+            cur.executemany(
+                "INSERT INTO SessionArchive (session_id, userID, quizID, versionID, status, score, start_at, finished_at, payload) "
+                "VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9)", rows
+            )
+            id_rows = [[sid] for sid in ids]
+            cur.executemany("DELETE FROM Submissions WHERE session_id = :1", id_rows)
+            cur.executemany("DELETE FROM SessionAnswers WHERE session_id = :1", id_rows)
+            cur.executemany("DELETE FROM Sessions WHERE session_id = :1", id_rows)
+            conn.commit()
+            return len(sessions), answer_count, submission_count, size
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _describe_submissions(self, conn, sessions: list, submissions: dict) -> dict:
+        """Add each question's title and points to the archived submissions; {session_id: total points}.
+
+        Points come from the session's pinned version, or from the live question for
+        sessions started before versioning.
+        """
+        described = {}
+        unversioned = set()
+        for s in sessions:
+            snap = self._versions.snapshot(conn, s['versionid']) if s['versionid'] is not None else None
+            by_id = {q['questionID']: q for q in snap['questions']} if snap else {}
+            for sub in submissions[s['session_id']]:
+                q = by_id.get(int(sub['questionID']))
+                if q is not None:
+                    sub['title'], sub['points'] = q['title'], q['points']
+                else:
+                    unversioned.add(int(sub['questionID']))
+        if unversioned:
+            cur = conn.cursor()
+            qids = sorted(unversioned)
+            for start in range(0, len(qids), 1000):
+                chunk = qids[start:start + 1000]
+                cur.execute("SELECT questionID, title, points FROM Questions WHERE questionID IN (%s)"
+                            % ', '.join(':%d' % (i + 1) for i in range(len(chunk))), chunk)
+                described.update((int(qid), (title, float(points) if points is not None else None))
+                                 for qid, title, points in cur.fetchall())
+            cur.close()
+        totals = {}
+        for s in sessions:
+            total = 0.0
+            for sub in submissions[s['session_id']]:
+                if 'points' not in sub:
+                    sub['title'], sub['points'] = described.get(int(sub['questionID']), (None, None))
+                total += sub['points'] or 0.0
+            totals[s['session_id']] = total
+        return totals
+
+
+def main(argv: list) -> int:
+    from dotenv import load_dotenv
+    from config import Config
+
+    if not argv or argv[0] not in ('report', 'run'):
+        print(__doc__)
+        return 2
+    load_dotenv()
+    config = Config.from_env()
+    if oracledb is None:
+        raise SystemExit('oracledb is not installed')
+    job = RetentionJob(
+        lambda: oracledb.connect(user=config.DB_USER, password=config.DB_PASS, dsn=config.DB_DSN),
+        retention_days=config.RETENTION_DAYS,
+        batch_size=config.RETENTION_BATCH_SIZE,
+        max_batches=config.RETENTION_MAX_BATCHES,
+        pause=config.RETENTION_PAUSE_SECONDS,
+        window=config.RETENTION_WINDOW,
+    )
+    result = job.report() if argv[0] == 'report' else job.run(ignore_window='--now' in argv)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
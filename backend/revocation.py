@@ -0,0 +1,144 @@
+"""Token revocation index.
+
+Access tokens carry the user's role, so banning or deleting a user would otherwise only
+take effect once their token expires. Instead of looking the user up on every request,
+each worker keeps a dict ``{userID: revoked_at}``: any token for that user issued at or
+before ``revoked_at`` is rejected. The dict is tiny (only users moderated within the
+token lifetime) and the check is a single lookup.
+
+Workers share revocations through a backend. ``MemoryRevocationBackend`` is enough for
+a single process; ``OracleRevocationBackend`` stores them in the TokenRevocations table
+and each worker polls it for rows newer than the last one it has seen.
+"""
+import logging
+import threading
+import time
+
+
+class MemoryRevocationBackend:
+    """Process-local backend (single worker, development and tests)."""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id: int, revoked_at: int, expires_at: int) -> None:
+        with self._lock:
+            self._rows[user_id] = (revoked_at, expires_at)
+
+    def fetch_since(self, since: int) -> list:
+        with self._lock:
+            return [(uid, r, e) for uid, (r, e) in self._rows.items() if r >= since]
+
+
+class OracleRevocationBackend:
+    """Share revocations between workers through the TokenRevocations table."""
+
+    def __init__(self, connect):
+        self._connect = connect
+
+    def publish(self, user_id: int, revoked_at: int, expires_at: int) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "MERGE INTO TokenRevocations t USING (SELECT :1 AS userID, :2 AS revoked_at, :3 AS expires_at FROM dual) s "
+                "ON (t.userID = s.userID) "
+                "WHEN MATCHED THEN UPDATE SET t.revoked_at = s.revoked_at, t.expires_at = s.expires_at "
+                "WHEN NOT MATCHED THEN INSERT (userID, revoked_at, expires_at) VALUES (s.userID, s.revoked_at, s.expires_at)",
+                [user_id, revoked_at, expires_at]
+            )
+            # Rows past the token lifetime can no longer match any valid token
+            cur.execute("DELETE FROM TokenRevocations WHERE expires_at < :1", [int(time.time())])
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    def fetch_since(self, since: int) -> list:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT userID, revoked_at, expires_at FROM TokenRevocations WHERE revoked_at >= :1", [since])
+            rows = [(int(r[0]), int(r[1]), int(r[2])) for r in cur.fetchall()]
+            cur.close()
+            return rows
+        finally:
+            conn.close()
+
+
+class RevocationIndex:
+    """In-memory ``userID -> revoked_at`` map kept in sync with a shared backend."""
+
+    def __init__(self, backend, token_lifetime: int, sync_interval: float = 2.0, logger: logging.Logger = None):
+        self.backend = backend
+        self.token_lifetime = token_lifetime
+        self.sync_interval = sync_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._revoked = {}
+        self._expires = {}
+        self._high_water = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def revoke_user(self, user_id, at: int = None) -> None:
+        """Invalidate every token issued to ``user_id`` up to now (or ``at``)."""
+        revoked_at = int(time.time()) if at is None else int(at)
+        expires_at = revoked_at + self.token_lifetime
+        self._apply(int(user_id), revoked_at, expires_at)
+        try:
+            self.backend.publish(int(user_id), revoked_at, expires_at)
+        except Exception:
+            # Local workers still honour the revocation; others pick it up on a later publish
+            self.logger.exception('Failed to publish token revocation for user %s', user_id)
+
+    def is_revoked(self, user_id, issued_at) -> bool:
+        if user_id is None:
+            return False
+        try:
+            revoked_at = self._revoked.get(int(user_id))
+        except (TypeError, ValueError):
+            return False
+        if revoked_at is None:
+            return False
+        # Tokens minted before revocations were tracked carry no iat; treat them as oldest
+        return int(issued_at or 0) <= revoked_at
+
+    def _apply(self, user_id: int, revoked_at: int, expires_at: int) -> None:
+        with self._lock:
+            if revoked_at >= self._revoked.get(user_id, -1):
+                self._revoked[user_id] = revoked_at
+                self._expires[user_id] = expires_at
+
+    def sync(self) -> None:
+        """Pull revocations published by other workers and forget expired ones."""
+        rows = self.backend.fetch_since(self._high_water)
+        for user_id, revoked_at, expires_at in rows:
+            self._apply(user_id, revoked_at, expires_at)
+            if revoked_at > self._high_water:
+                self._high_water = revoked_at
+        now = int(time.time())
+        with self._lock:
+            for user_id in [u for u, e in self._expires.items() if e < now]:
+                self._revoked.pop(user_id, None)
+                self._expires.pop(user_id, None)
+
+    def start(self) -> None:
+        """Start the background sync thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        # Catch up with everything still within the token lifetime before serving
+        self._high_water = int(time.time()) - self.token_lifetime
+        self._thread = threading.Thread(target=self._run, name='revocation-sync', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                self.logger.exception('Token revocation sync failed')
+            time.sleep(self.sync_interval)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
@@ -0,0 +1,87 @@
+"""Per-session question selection and answer shuffling derived from a seed.
+
+A quiz may draw ``pool_size`` of its questions for each attempt (optionally spread
+across categories or difficulties in proportion to the bank) and shuffle question
+and answer order. Nothing per-session is stored except ``Sessions.seed``: start,
+autosave validation and grading all call these functions on the cached version
+snapshot and get the same selection back.
+"""
+import random
+
+
+def _strata(questions: list, field: str) -> dict:
+    groups = {}
+    for q in questions:
+        groups.setdefault(q.get(field) or '', []).append(q['questionID'])
+    return groups
+
+
+def _allocate(groups: dict, k: int) -> dict:
+    """Split k draws across groups proportionally (largest remainder), capped by group size."""
+    total = sum(len(ids) for ids in groups.values())
+    quotas = {}
+    remainders = []
+    for name, ids in groups.items():
+        exact = k * len(ids) / total
+        quotas[name] = min(len(ids), int(exact))
+        remainders.append((exact - int(exact), name))
+    left = k - sum(quotas.values())
+    for _, name in sorted(remainders, key=lambda r: (-r[0], r[1])):
+        if left <= 0:
+            break
+        if quotas[name] < len(groups[name]):
+            quotas[name] += 1
+            left -= 1
+    return quotas
+
+
+def selected_question_ids(snapshot: dict, seed) -> list:
+    """Question IDs served to the session with ``seed``, in presentation order."""
+    questions = snapshot['questions']
+    ids = [q['questionID'] for q in questions]
+    if seed is None:
+        # Sessions started before seeding existed saw the whole bank in order
+        return ids
+    rng = random.Random(int(seed))
+    pool_size = snapshot.get('pool_size')
+    if pool_size and 0 < int(pool_size) < len(ids):
+        k = int(pool_size)
+        field = snapshot.get('stratify_by')
+        if field in ('category', 'difficulty'):
+            groups = _strata(questions, field)
+            chosen = []
+            for name, quota in sorted(_allocate(groups, k).items()):
+                chosen.extend(rng.sample(groups[name], quota))
+        else:
+            chosen = rng.sample(ids, k)
+        # Keep bank order unless shuffling is on
+        if not snapshot.get('shuffle_questions'):
+            position = {qid: i for i, qid in enumerate(ids)}
+            chosen.sort(key=position.__getitem__)
+        else:
+            rng.shuffle(chosen)
+        return chosen
+    if snapshot.get('shuffle_questions'):
+        ids = list(ids)
+        rng.shuffle(ids)
+    return ids
+
+
+def session_payload(payload: dict, seed) -> dict:
+    """Candidate payload restricted to the session's questions, answers shuffled if enabled."""
+    if seed is None or not (payload.get('pool_size') or payload.get('shuffle_questions') or payload.get('shuffle_answers')):
+        return payload
+    by_id = {q['questionID']: q for q in payload['questions']}
+    questions = []
+    for qid in selected_question_ids(payload, seed):
+        q = by_id[qid]
+        if payload.get('shuffle_answers'):
+            answers = list(q['answers'])
+            random.Random(f"{int(seed)}:{qid}").shuffle(answers)
+            q = dict(q, answers=answers)
+        questions.append(q)
+    return dict(payload, questions=questions)
+
+
+def new_seed() -> int:
+    return random.SystemRandom().randrange(1, 2 ** 31)
@@ -0,0 +1,104 @@
+"""Startup benchmark: how long importing and building the app takes in a fresh interpreter.
+
+Each run starts a new ``python -X importtime`` process that imports ``app`` and calls
+``app.create_app()``, so nothing is shared between runs except the bytecode cache. The
+median of the cumulative import time of ``app`` plus the ``create_app`` time is compared
+to the budget. The slowest imports are listed so a regression points at its cause. The
+check also fails if a module that is meant to load lazily (the database driver, SMTP)
+was executed during startup.
+
+Usage:
+
+    python startup_check.py [--runs N] [--budget-ms MS] [--top N]
+
+The budget defaults to STARTUP_BUDGET_MS (400 ms). Exit status is 1 when over budget.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+
+DEFAULT_BUDGET_MS = 400
+# Modules that must not be executed by ``import app`` and ``create_app()``
+LAZY_MODULES = ('oracledb', 'smtplib')
+_PROBE = (
+    "import sys, time, app\n"
+    "started = time.perf_counter()\n"
+    "app.create_app()\n"
+    "print('CREATE_APP_MS', (time.perf_counter() - started) * 1000)\n"
+    "for name in %r:\n"
+    "    module = sys.modules.get(name)\n"
+    "    if module is not None and type(module).__name__ != '_LazyModule':\n"
+    "        print('EAGER', name)\n"
+) % (LAZY_MODULES,)
+
+
+def parse_importtime(stderr: str) -> list:
+    """``-X importtime`` output -> [(cumulative microseconds, self microseconds, module)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative), int(own), module.strip()))
+    return rows
+
+
+def measure(runs: int = 5) -> tuple:
+    """Return (list of startup times in ms, rows of the last run, eagerly loaded modules)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    rows = []
+    eager = set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE], cwd=here,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError('import app failed:\n' + proc.stderr[-2000:])
+        rows = parse_importtime(proc.stderr)
+        create_ms = sum(float(line.split()[1]) for line in proc.stdout.splitlines() if line.startswith('CREATE_APP_MS '))
+        times.extend(cumulative / 1000.0 + create_ms for cumulative, _, module in rows if module == 'app')
+        eager.update(line.split()[1] for line in proc.stdout.splitlines() if line.startswith('EAGER '))
+    return times, rows, sorted(eager)
+
+
+def main(argv: list) -> int:
+    runs = 5
+    budget = float(os.environ.get('STARTUP_BUDGET_MS', DEFAULT_BUDGET_MS))
+    top = 10
+    args = list(argv)
+    try:
+        while args:
+            flag = args.pop(0)
+            if flag == '--runs':
+                runs = max(1, int(args.pop(0)))
+            elif flag == '--budget-ms':
+                budget = float(args.pop(0))
+            elif flag == '--top':
+                top = int(args.pop(0))
+            else:
+                raise ValueError(flag)
+    except (IndexError, ValueError):
+        print(__doc__)
+        return 2
+
+    times, rows, eager = measure(runs)
+    median = statistics.median(times)
+    print('import app + create_app(): median %.1f ms, min %.1f ms, max %.1f ms over %d run(s); budget %.0f ms'
+          % (median, min(times), max(times), len(times), budget))
+    print('Slowest imports (self time, last run):')
+    for cumulative, own, module in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print('  %8.1f ms self %8.1f ms cumulative  %s' % (own / 1000.0, cumulative / 1000.0, module))
+    failed = False
+    if eager:
+        print('Loaded eagerly but should be lazy: %s' % ', '.join(eager))
+        failed = True
+    if median > budget:
+        print('Over budget by %.1f ms' % (median - budget))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_config():
+    """Settings for an app that starts no database threads and hashes quickly."""
+    from config import Config
+    cfg = Config.from_env({})
+    cfg.REVOCATION_BACKEND = 'memory'
+    cfg.CACHE_BUS_TRANSPORT = 'local'
+    cfg.PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    cfg.HASH_WORKERS = 0
+    cfg.DRAIN_ON_SIGTERM = False
+    cfg.LOG_LEVEL = 'WARNING'
+    return cfg
+
+
+@pytest.fixture
+def flask_app(app_config):
+    import app as app_module
+    application = app_module.create_app(app_config)
+    yield application
+    application.extensions[app_module.EXTENSION]['lifecycle'].shutdown()
+
+
+@pytest.fixture
+def services(flask_app):
+    import app as app_module
+    return flask_app.extensions[app_module.EXTENSION]
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def database(monkeypatch, flask_app):
+    """Routes see a database: ``oracledb.connect`` returns connections scripted on the returned FakeDatabase."""
+    import app as app_module
+    from fakes import FakeDatabase
+    db = FakeDatabase()
+    monkeypatch.setattr(app_module, 'ORACLE_AVAILABLE', True)
+    monkeypatch.setattr(app_module, 'oracledb', db)
+    return db
+
+
+@pytest.fixture
+def bearer(services):
+    """Authorization header for a user: ``bearer(user_id, role='member')``."""
+    def headers(user_id, role='member', **extra):
+        return dict({'Authorization': 'Bearer ' + services['token_signer'].issue(user_id, role)}, **extra)
+    return headers
@@ -0,0 +1,124 @@
+"""Stand-ins for the database driver objects the backend modules use."""
+import itertools
+from types import SimpleNamespace
+
+
+class FakeVar:
+    """Output bind variable; ``getvalue(i)`` is the value for row ``i``."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def getvalue(self, pos=0):
+        return self.values[pos]
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.arraysize = 100
+
+    def execute(self, sql, binds=None):
+        self.conn.raise_error()
+        self.conn.executed.append((sql.split()[0].upper(), binds))
+        self.conn.statements.append(sql)
+        self.rowcount = self.conn.rowcount
+
+    def executemany(self, sql, rows, batcherrors=False, arraydmlrowcounts=False):
+        self.conn.raise_error()
+        self.conn.executed.append((sql.split()[0].upper(), list(rows)))
+        self.conn.statements.append(sql)
+
+    def getbatcherrors(self):
+        return [SimpleNamespace(offset=offset, message=message) for offset, message in self.conn.batch_errors]
+
+    def getarraydmlrowcounts(self):
+        return list(self.conn.dml_rowcounts)
+
+    def fetchone(self):
+        return self.conn.rows.pop(0) if self.conn.rows else None
+
+    def fetchall(self):
+        return self.conn.rows.pop(0) if self.conn.rows else []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def var(self, kind, arraysize=1):
+        """RETURNING ... INTO target: the connection's next IDs, one per row."""
+        return FakeVar([[next(self.conn.ids)] for _ in range(arraysize)])
+
+    def setinputsizes(self, *sizes):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Answers fetches from ``rows`` in order and records every statement.
+
+    ``fetchone`` takes the next entry as a row, ``fetchall`` takes it as a list of rows.
+    ``batch_errors`` ((offset, message) pairs) and ``dml_rowcounts`` answer array DML.
+    Set ``error`` to make the next statement raise it.
+    """
+
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.executed = []
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+        self.batch_errors = []
+        self.dml_rowcounts = []
+        self.error = None
+        self.ids = itertools.count(1)
+
+    def raise_error(self):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase:
+    """Stands in for the ``oracledb`` module: ``connect`` hands out the scripted connections in order.
+
+    Connections beyond the script are empty ones; every connection handed out is kept in ``opened``.
+    """
+
+    NUMBER = 'NUMBER'
+
+    class IntegrityError(Exception):
+        pass
+
+    class DatabaseError(Exception):
+        pass
+
+    def __init__(self):
+        self.scripted = []
+        self.opened = []
+
+    def script(self, *rows, rowcount=0) -> FakeConnection:
+        conn = FakeConnection(rows, rowcount)
+        self.scripted.append(conn)
+        return conn
+
+    def connect(self, **kwargs) -> FakeConnection:
+        conn = self.scripted.pop(0) if self.scripted else FakeConnection()
+        self.opened.append(conn)
+        return conn
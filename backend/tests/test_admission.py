@@ -0,0 +1,77 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import admission
+from admission import AdmissionController, Overloaded, RequestClass, arrival_datetime, check_arrival, sign_arrival
+
+
+SECRET = 'test-secret'
+
+
+def test_arrival_stamp_round_trip():
+    arrived = admission.now_ms()
+    stamp = sign_arrival(SECRET, 'session-1', arrived)
+    assert check_arrival(SECRET, 'session-1', stamp, 60) == arrived
+
+
+@pytest.mark.parametrize('stamp', [
+    None, '', 'garbage', '123', '123.abc',
+])
+def test_malformed_stamps_are_rejected(stamp):
+    assert check_arrival(SECRET, 'session-1', stamp, 60) is None
+
+
+def test_stamp_is_bound_to_session_secret_and_time():
+    arrived = admission.now_ms()
+    stamp = sign_arrival(SECRET, 'session-1', arrived)
+    assert check_arrival(SECRET, 'session-2', stamp, 60) is None
+    assert check_arrival('other-secret', 'session-1', stamp, 60) is None
+    forged = f'{arrived - 5000}.{stamp.split(".", 1)[1]}'
+    assert check_arrival(SECRET, 'session-1', forged, 60) is None
+
+
+def test_old_stamps_expire(monkeypatch):
+    arrived = admission.now_ms()
+    stamp = sign_arrival(SECRET, 'session-1', arrived)
+    monkeypatch.setattr(admission, 'now_ms', lambda: arrived + 61000)
+    assert check_arrival(SECRET, 'session-1', stamp, 60) is None
+    assert check_arrival(SECRET, 'session-1', stamp, 120) == arrived
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason='needs time.tzset')
+@pytest.mark.parametrize('zone', ['UTC', 'Africa/Tunis', 'America/New_York', 'Asia/Kolkata'])
+def test_arrival_time_does_not_depend_on_local_zone(monkeypatch, zone):
+    monkeypatch.setenv('TZ', zone)
+    time.tzset()
+    try:
+        # 2026-03-01 12:00:00 UTC
+        assert arrival_datetime(1772366400000) == datetime(2026, 3, 1, 12, 0, 0)
+        # a fresh stamp is accepted whatever the local zone
+        arrived = admission.now_ms()
+        assert check_arrival(SECRET, 's', sign_arrival(SECRET, 's', arrived), 5) == arrived
+        assert abs((arrival_datetime(arrived) - datetime.utcnow()).total_seconds()) < 5
+    finally:
+        monkeypatch.delenv('TZ', raising=False)
+        time.tzset()
+
+
+def test_controller_sheds_when_queue_is_full():
+    controller = AdmissionController(1, [RequestClass('submit', 0, 1, 0, 0.1)])
+    assert controller.acquire('submit') == 0.0
+    with pytest.raises(Overloaded) as info:
+        controller.acquire('submit')
+    assert info.value.retry_after >= 1
+    controller.release('submit', 0.01)
+    assert controller.acquire('submit') == 0.0
+    controller.release('submit')
+    assert controller.snapshot()['stats']['submit'] == {'admitted': 2, 'queued': 0, 'shed': 1}
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController(1, [RequestClass('default', 0, 1, 5, 0.05)])
+    controller.acquire('default')
+    with pytest.raises(Overloaded):
+        controller.acquire('default')
+    assert controller.snapshot()['queued'] == {'default': 0}
@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from audit import KEYSET, AuditLog, encode_cursor
+from fakes import FakeConnection
+
+
+class BlockingConnect:
+    """Hands out FakeConnections; writer threads block until ``released`` so entries pile up."""
+
+    def __init__(self):
+        self.connections = []
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self):
+        if threading.current_thread() is not threading.main_thread():
+            self.entered.set()
+            assert self.released.wait(5)
+        conn = FakeConnection()
+        conn.connected_at = time.monotonic()
+        self.connections.append(conn)
+        return conn
+
+    def inserted(self):
+        """Rows of every INSERT, one list per batch."""
+        return [binds for conn in self.connections for verb, binds in conn.executed if verb == 'INSERT']
+
+
+@pytest.fixture
+def blocked():
+    connect = BlockingConnect()
+    log = AuditLog(connect, batch_size=3, flush_interval=0.05)
+    log.record('first')
+    assert connect.entered.wait(5)
+    yield connect, log
+    connect.released.set()
+    log.stop(2)
+
+
+def test_queued_entries_are_written_in_batches(blocked):
+    connect, log = blocked
+    for i in range(6):
+        log.record('entry %d' % i, actor='root', actor_id=1)
+    connect.released.set()
+    assert log.flush(5)
+    batches = connect.inserted()
+    assert [len(batch) for batch in batches] == [1, 3, 3]
+    assert [row[0] for batch in batches for row in batch] == ['first'] + ['entry %d' % i for i in range(6)]
+    assert log.stats['batches'] == 3 and log.stats['written'] == 7
+
+
+def test_queued_entries_keep_their_place_before_a_later_critical_write(blocked):
+    connect, log = blocked
+    log.record('queued')
+    time.sleep(0.05)
+    critical = FakeConnection()
+    written_at = time.monotonic()
+    AuditLog.write(critical.cursor(), 'ban alice', 'cheating', 'root', 1)
+    connect.released.set()
+    assert log.flush(5)
+    # each INSERT stamps CURRENT_TIMESTAMP minus the bound age
+    critical_age = critical.executed[0][1][4]
+    queued_conn = connect.connections[-1]
+    queued_age = [row for verb, rows in queued_conn.executed for row in rows if row[0] == 'queued'][0][4]
+    assert critical_age < 0.01
+    assert queued_conn.connected_at - queued_age < written_at - critical_age
+
+
+def test_full_queue_falls_back_to_a_synchronous_insert(blocked):
+    connect, _ = blocked
+    log = AuditLog(connect, queue_size=1, batch_size=3, flush_interval=0.05)
+    log.record('picked up by the writer')
+    deadline = time.monotonic() + 5
+    while log.depth() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    log.record('queued')
+    log.record('overflow')
+    # written on the caller's thread while the writer is still stuck
+    assert log.stats['sync_fallbacks'] == 1
+    assert [[row[0] for row in batch] for batch in connect.inserted()] == [['overflow']]
+    connect.released.set()
+    assert log.flush(5)
+    log.stop(2)
+    assert log.stats['written'] == 2
+
+
+def audit_rows(count, start=100):
+    return [(start - i, 'ban user%d' % i, 'because', 'root', 1, datetime(2026, 3, 1, 12, 0)) for i in range(count)]
+
+
+def test_audit_endpoint_pages_with_a_keyset_cursor(client, database, bearer, services, app_config):
+    services['user_profile_cache'].set(1, {'name': 'root', 'email': 'root@x.org'})
+    admin = bearer(1, 'admin')
+    conn = database.script(audit_rows(3))
+    first = client.get('/api/admin/audit?limit=2', headers=admin)
+    assert first.status_code == 200
+    assert [e['logID'] for e in first.json['entries']] == [100, 99]
+    assert first.json['next_cursor'] == encode_cursor(datetime(2026, 3, 1, 12, 0), 99)
+    assert conn.executed[0][1] == {'limit': 3}
+
+    conn = database.script(audit_rows(1, start=98))
+    second = client.get('/api/admin/audit', query_string={'limit': 2, 'cursor': first.json['next_cursor']}, headers=admin)
+    assert second.json['next_cursor'] is None and [e['logID'] for e in second.json['entries']] == [98]
+    assert KEYSET in conn.statements[0]
+    assert conn.executed[0][1] == {'before_ts': datetime(2026, 3, 1, 12, 0), 'before_id': 99, 'limit': 3}
+
+
+def test_audit_page_size_is_capped(client, database, bearer, services, app_config):
+    services['user_profile_cache'].set(1, {'name': 'root', 'email': 'root@x.org'})
+    app_config.AUDIT_PAGE_MAX = 20
+    conn = database.script([])
+    assert client.get('/api/admin/audit?limit=5000', headers=bearer(1, 'admin')).status_code == 200
+    assert conn.executed[0][1]['limit'] == 21
+    bad = client.get('/api/admin/audit?cursor=nonsense', headers=bearer(1, 'admin'))
+    assert bad.status_code == 400
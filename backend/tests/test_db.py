@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from db import DatabaseRouter, parse_consistency, pool_stats, pooled
+from fakes import FakeConnection
+
+
+class Endpoint:
+    """A connect callable that hands out labelled stand-in connections."""
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(self.name + ' down')
+        conn = FakeConnection()
+        conn.role = self.name
+        return conn
+
+
+@pytest.fixture
+def router():
+    return DatabaseRouter(Endpoint('primary'), Endpoint('replica'),
+                          routes={'listing': 'eventual', 'results': 'session', 'exam': 'primary'}, ryw_seconds=5)
+
+
+def test_parse_consistency():
+    assert parse_consistency(' listing=eventual, results = SESSION ,') == {'listing': 'eventual', 'results': 'session'}
+    with pytest.raises(ValueError):
+        parse_consistency('listing=sometimes')
+
+
+def test_routes_follow_their_consistency_level(router):
+    assert router.read_connection('listing').role == 'replica'
+    assert router.read_connection('results', user_id=1).role == 'replica'
+    assert router.read_connection('exam').role == 'primary'
+    # unlisted routes use the default level
+    assert router.read_connection('other').role == 'primary'
+    assert router.connect().role == 'primary'
+
+
+def test_read_your_writes(router):
+    router.note_write(1)
+    assert router.read_connection('results', user_id=1).role == 'primary'
+    assert router.read_connection('results', user_id=2).role == 'replica'
+    # eventual routes never wait for the replica to catch up
+    assert router.read_connection('listing', user_id=1).role == 'replica'
+    assert router.stats['ryw_fallbacks'] == 1
+
+
+def test_write_marker_from_another_worker(router):
+    recent = int(time.time() * 1000) - 1000
+    old = int(time.time() * 1000) - 60000
+    assert router.read_connection('results', user_id=2, wrote_at_ms=recent).role == 'primary'
+    assert router.read_connection('results', user_id=2, wrote_at_ms=old).role == 'replica'
+    assert router.read_connection('results', user_id=2, wrote_at_ms='junk').role == 'replica'
+
+
+def test_unreachable_replica_falls_back_for_a_while():
+    replica = Endpoint('replica', fail=True)
+    router = DatabaseRouter(Endpoint('primary'), replica, routes={'listing': 'eventual'}, replica_retry_seconds=60)
+    assert router.read_connection('listing').role == 'primary'
+    assert router.read_connection('listing').role == 'primary'
+    # the second read does not try the replica again
+    assert replica.calls == 1
+    assert router.stats['replica_errors'] == 1
+
+
+def test_without_replica_everything_reads_from_the_primary():
+    router = DatabaseRouter(Endpoint('primary'), routes={'listing': 'eventual'})
+    router.note_write(1)
+    assert router.read_connection('listing').role == 'primary'
+    assert router.snapshot()['replica_pool'] is None
+
+
+def test_pooled_creates_the_pool_once():
+    class Pool:
+        opened, busy, max = 1, 0, 4
+
+        def acquire(self):
+            self.busy += 1
+            return FakeConnection()
+
+    created = []
+    connect = pooled(lambda: created.append(Pool()) or created[-1])
+    assert pool_stats(connect) is None
+    connect()
+    connect()
+    assert len(created) == 1
+    assert pool_stats(connect) == {'opened': 1, 'busy': 2, 'max': 4}
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from events import decide_access, exam_access, find_reservation
+from fakes import FakeConnection
+
+NOW = datetime(2026, 3, 1, 12, 0)
+HOUR = timedelta(hours=1)
+
+
+def test_quiz_without_events_is_open_to_everyone():
+    assert decide_access([], NOW) is None
+
+
+def test_window_and_eligibility():
+    rows = [(7, NOW - HOUR, NOW + HOUR, 1)]
+    assert decide_access(rows, NOW) == ('open', (7, NOW - HOUR, NOW + HOUR))
+    assert decide_access(rows, NOW - 2 * HOUR)[0] == 'not_started'
+    assert decide_access(rows, NOW + HOUR)[0] == 'ended'
+    assert decide_access([(7, NOW - HOUR, NOW + HOUR, 0)], NOW) == ('not_eligible', None)
+
+
+def test_picks_the_users_own_event():
+    rows = [(1, NOW - HOUR, NOW + HOUR, 0), (2, NOW + HOUR, NOW + 2 * HOUR, 1), (3, NOW - 3 * HOUR, NOW - 2 * HOUR, 1)]
+    assert decide_access(rows, NOW) == ('not_started', (2, NOW + HOUR, NOW + 2 * HOUR))
+    assert decide_access(rows, NOW + 3 * HOUR) == ('ended', (2, NOW + HOUR, NOW + 2 * HOUR))
+
+
+def test_reads_events_and_reservations_from_the_tables():
+    conn = FakeConnection(rows=[[(7, NOW - HOUR, NOW + HOUR, 1)], ('s-1', 3, 99, 7, NOW - HOUR, NOW + HOUR)])
+    cur = conn.cursor()
+    assert exam_access(cur, '5', 11, now=NOW)[0] == 'open'
+    assert conn.executed[0] == ('SELECT', [5, 11])
+    reservation = find_reservation(cur, 5, 11)
+    assert reservation['session_id'] == 's-1' and reservation['versionID'] == 3 and reservation['eventID'] == 7
+    assert find_reservation(cur, 5, 11) is None
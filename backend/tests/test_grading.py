@@ -0,0 +1,83 @@
+import pytest
+
+from grading import CompiledKey, answer_list
+
+
+def _question(qid, points, correct, options=3, multi=False, partial=False, penalty=0):
+    return {'questionID': qid, 'points': points, 'penalty': penalty, 'multi_select': multi,
+            'partial_credit': partial,
+            'answers': [{'answerID': qid * 10 + j, 'is_correct': j in correct} for j in range(options)]}
+
+
+@pytest.fixture
+def key():
+    return CompiledKey({'pass_threshold': 0.5, 'questions': [
+        _question(1, 2, {0}),
+        _question(2, 4, {0, 2}, options=4, multi=True, partial=True),
+        _question(3, 3, {1}, multi=True),
+        _question(4, 1, {2}, penalty=1),
+    ]})
+
+
+def test_answer_list_normalizes_input():
+    assert answer_list(None) == []
+    assert answer_list('') == []
+    assert answer_list('7') == [7]
+    assert answer_list([3, None, '4']) == [3, 4]
+
+
+def test_single_choice(key):
+    grade = key.grade([1], {1: 10})
+    assert (grade.earned, grade.total, grade.passed) == (2.0, 2.0, True)
+    assert key.grade([1], {1: 11}).earned == 0.0
+    # two options picked on a single-choice question is never correct
+    assert key.grade([1], {1: [10, 11]}).earned == 0.0
+
+
+def test_multi_select_exact_and_partial(key):
+    assert key.grade([2], {2: [20, 22]}).earned == 4.0
+    # one of two correct picks: half credit
+    assert key.grade([2], {2: [20]}).earned == 2.0
+    # a wrong pick cancels a right one
+    assert key.grade([2], {2: [20, 21]}).earned == 0.0
+    # without partial credit only the exact set scores
+    assert key.grade([3], {3: [31, 30]}).earned == 0.0
+    assert key.grade([3], {3: [31]}).earned == 3.0
+
+
+def test_penalty_applies_to_wrong_answers_only(key):
+    assert key.grade([1, 4], {1: 10, 4: 40}).earned == 1.0
+    # blank answers are not penalised
+    assert key.grade([1, 4], {1: 10}).earned == 2.0
+    # the total never goes below zero
+    assert key.grade([4], {4: 40}).earned == 0.0
+
+
+def test_pass_threshold_and_details(key):
+    grade = key.grade([1, 2, 3, 4], {1: 10, 2: [20], 3: [30]})
+    assert grade.total == 10.0
+    assert grade.earned == 4.0
+    assert not grade.passed
+    assert [d['correct'] for d in grade.details] == [True, False, False, False]
+    assert grade.details[1]['selected'] == [20]
+    assert grade.details[0]['selected'] == 10
+
+
+def test_unknown_questions_are_skipped(key):
+    grade = key.grade([1, 99], {1: 10, 99: 5})
+    assert grade.total == 2.0
+    assert [d['questionID'] for d in grade.details] == [1]
+
+
+def test_accepts(key):
+    assert key.accepts(1, 10)
+    assert not key.accepts(1, [10, 11])
+    assert key.accepts(2, [20, 23])
+    assert not key.accepts(2, [20, 99])
+    assert not key.accepts(99, 1)
+
+
+def test_no_points_passes_only_when_all_correct():
+    key = CompiledKey({'questions': [_question(1, 0, {0})]})
+    assert key.grade([1], {1: 10}).passed
+    assert not key.grade([1], {1: 11}).passed
@@ -0,0 +1,18 @@
+import threading
+
+from hashing import PasswordHasher
+
+
+def test_pool_processes_are_not_forked_and_hash_round_trips():
+    # a thread is already running, as in the app, when the pool starts
+    stop = threading.Event()
+    threading.Thread(target=stop.wait, daemon=True).start()
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    try:
+        pw_hash = hasher.hash('secret')
+        assert hasher.verify(pw_hash, 'secret') and not hasher.verify(pw_hash, 'wrong')
+        assert hasher._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+        assert hasher.current_params == 'pbkdf2:sha256:1000'
+    finally:
+        stop.set()
+        hasher.shutdown()
@@ -0,0 +1,96 @@
+import time
+
+from fakes import FakeConnection
+from invalidation import InvalidationBus, LocalTransport, OraclePollingTransport, _message
+
+
+def recording_bus(**kwargs):
+    bus = InvalidationBus(LocalTransport(), **kwargs)
+    seen = []
+    bus.subscribe('login', seen.append)
+    return bus, seen
+
+
+def test_buses_on_one_transport_invalidate_each_other():
+    transport = LocalTransport()
+    first, second = InvalidationBus(transport), InvalidationBus(transport)
+    dropped = []
+    second.subscribe('profile', dropped.append)
+    first.start()
+    second.start()
+    first.publish('profile', 5)
+    assert dropped == ['5'] and second.stats['received'] == 1
+    assert first.version('profile', 5) == 1 and second.version('profile', 5) == 1
+
+
+def test_redelivered_message_is_applied_once():
+    bus, seen = recording_bus()
+    message = _message('login', 'a@x.org', 'other-worker', 7)
+    bus._deliver([message])
+    bus._deliver([dict(message)])
+    assert seen == ['a@x.org']
+    assert bus.stats['applied'] == 1 and bus.stats['duplicates'] == 1
+
+
+def test_rows_are_deduplicated_by_seq_not_by_publisher_version():
+    bus, seen = recording_bus()
+    # two publishers that happen to use the same version number are different messages
+    bus._deliver([_message('login', 'a@x.org', 'w1', 1), _message('login', 'a@x.org', 'w2', 1)])
+    polled = dict(_message('login', 'b@x.org', 'w1', 2), seq=40)
+    bus._deliver([polled, dict(polled)])
+    assert seen == ['a@x.org', 'a@x.org', 'b@x.org']
+
+
+def test_out_of_order_messages_all_evict_and_bump_the_key_version():
+    bus, seen = recording_bus()
+    before = bus.version('login', 'a@x.org')
+    bus._deliver([_message('login', 'a@x.org', 'w1', 9)])
+    after_first = bus.version('login', 'a@x.org')
+    # an earlier message from the same publisher arriving late is not treated as stale
+    bus._deliver([_message('login', 'a@x.org', 'w1', 3)])
+    assert seen == ['a@x.org', 'a@x.org']
+    assert before == 0 < after_first < bus.version('login', 'a@x.org')
+
+
+def test_key_versions_expire_after_keep_seconds_and_past_max_keys():
+    bus, _ = recording_bus(keep_seconds=0.05)
+    bus.publish('login', 'old')
+    time.sleep(0.06)
+    bus.publish('login', 'new')
+    assert bus.version('login', 'old') == 0 and bus.version('login', 'new') > 0
+
+    bus, _ = recording_bus(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        bus.publish('login', key)
+    assert bus.version('login', 'a') == 0
+    assert bus.version('login', 'b') and bus.version('login', 'c')
+    assert bus.stats['expired_keys'] == 1
+
+
+def row(seq, key):
+    return (seq, 'login', key, seq, int(time.time() * 1000), 'w1')
+
+
+def test_polling_rereads_the_overlap_and_skips_delivered_seqs():
+    script = [FakeConnection([(10,)]),
+              FakeConnection([[row(11, 'a'), row(12, 'b')]]),
+              # seq 9 committed late, below the high-water mark; 11 and 12 come back in the overlap
+              FakeConnection([[row(9, 'late'), row(11, 'a'), row(12, 'b'), row(13, 'c')]])]
+    transport = OraclePollingTransport(lambda: script.pop(0))
+    conns = list(script)
+    assert transport.poll() == []
+    assert [m['key'] for m in transport.poll()] == ['a', 'b']
+    messages = transport.poll()
+    assert [(m['seq'], m['key']) for m in messages] == [(9, 'late'), (13, 'c')]
+    assert conns[1].executed[0][1] == [10 - OraclePollingTransport.OVERLAP]
+    assert conns[2].executed[0][1] == [12 - OraclePollingTransport.OVERLAP]
+
+
+def test_polling_forgets_seqs_below_the_overlap():
+    transport = OraclePollingTransport(lambda: conn, keep_seconds=60)
+    transport.OVERLAP = 2
+    conn = FakeConnection([(0,)])
+    transport.poll()
+    conn = FakeConnection([[row(1, 'a'), row(5, 'b')]])
+    transport.poll()
+    assert transport._seen == {5}
@@ -0,0 +1,34 @@
+import pytest
+
+
+def login(client, email, forwarded_for):
+    return client.post('/api/login', json={'email': email, 'password': 'pw'},
+                       headers={'X-Forwarded-For': forwarded_for}, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+
+@pytest.fixture
+def one_login_per_ip(app_config):
+    app_config.LOGIN_IP_BURST = 1
+    app_config.LOGIN_IP_PER_MINUTE = 1
+    return app_config
+
+
+@pytest.fixture
+def behind_proxy(one_login_per_ip):
+    one_login_per_ip.TRUSTED_PROXY_HOPS = 1
+    return one_login_per_ip
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(one_login_per_ip, client):
+    assert login(client, 'a@x.org', '203.0.113.5').status_code != 429
+    # a forged header does not give the same client a fresh bucket
+    assert login(client, 'b@x.org', '203.0.113.6').status_code == 429
+
+
+def test_login_limit_is_per_client_behind_a_trusted_proxy(behind_proxy, client):
+    assert login(client, 'a@x.org', '203.0.113.5').status_code != 429
+    # another client behind the same proxy has its own bucket
+    assert login(client, 'b@x.org', '203.0.113.6').status_code != 429
+    assert login(client, 'c@x.org', '203.0.113.5').status_code == 429
+    # only the hop the proxy appended is trusted, not what the client put before it
+    assert login(client, 'd@x.org', '198.51.100.1, 203.0.113.5').status_code == 429
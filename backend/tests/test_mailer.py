@@ -0,0 +1,111 @@
+import smtplib
+
+import pytest
+
+from mailer import MailDispatcher
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records deliveries and fails on request."""
+
+    sessions = []
+    fail_next = 0
+    disconnect_next = 0
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.sent = []
+        self.closed = False
+        FakeSMTP.sessions.append(self)
+
+    def login(self, username, password):
+        self.credentials = (username, password)
+
+    def sendmail(self, sender, to_addr, payload):
+        if FakeSMTP.disconnect_next:
+            FakeSMTP.disconnect_next -= 1
+            raise smtplib.SMTPServerDisconnected('closed')
+        if FakeSMTP.fail_next:
+            FakeSMTP.fail_next -= 1
+            raise smtplib.SMTPDataError(451, 'try again')
+        self.sent.append((sender, to_addr, payload))
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    FakeSMTP.sessions = []
+    FakeSMTP.fail_next = 0
+    FakeSMTP.disconnect_next = 0
+    return FakeSMTP
+
+
+def _dispatcher(**kwargs):
+    options = dict(host='localhost', port=2525, sender='quiz@example.com', username='quiz@example.com',
+                   password='secret', use_ssl=False, backoff_base=0.01, backoff_max=0.05)
+    options.update(kwargs)
+    return MailDispatcher(**options)
+
+
+def _sent(smtp):
+    return [to for session in smtp.sessions for _, to, _ in session.sent]
+
+
+def test_messages_share_one_session(smtp):
+    mail = _dispatcher()
+    for i in range(3):
+        assert mail.enqueue(f'user{i}@example.com', 'Code', 'Your code is 123456')
+    assert mail.flush(timeout=5)
+    mail.stop()
+    assert _sent(smtp) == ['user0@example.com', 'user1@example.com', 'user2@example.com']
+    assert mail.stats['connections'] == 1
+    assert smtp.sessions[0].credentials == ('quiz@example.com', 'secret')
+    assert 'Subject: Code\r\n\r\nYour code is 123456' in smtp.sessions[0].sent[0][2]
+    assert smtp.sessions[0].closed
+
+
+def test_dropped_session_is_reopened_once(smtp):
+    smtp.disconnect_next = 1
+    mail = _dispatcher()
+    mail.enqueue('user@example.com', 'Code', 'body')
+    assert mail.flush(timeout=5)
+    mail.stop()
+    assert _sent(smtp) == ['user@example.com']
+    assert mail.stats['retried'] == 0
+    assert len(smtp.sessions) == 2
+
+
+def test_failures_are_retried(smtp):
+    smtp.fail_next = 2
+    mail = _dispatcher()
+    mail.enqueue('user@example.com', 'Code', 'body')
+    assert mail.flush(timeout=5)
+    mail.stop()
+    assert _sent(smtp) == ['user@example.com']
+    assert mail.stats['retried'] == 2
+
+
+def test_persistent_failures_end_in_dead_letters(smtp):
+    smtp.fail_next = 100
+    mail = _dispatcher(max_retries=2)
+    mail.enqueue('user@example.com', 'Code', 'body')
+    assert mail.flush(timeout=5)
+    mail.stop()
+    assert _sent(smtp) == []
+    assert [m.as_dict()['attempts'] for m in mail.dead_letters] == [3]
+    assert mail.stats['dead'] == 1
+
+
+def test_full_queue_rejects(smtp):
+    mail = _dispatcher(queue_size=1)
+    mail.start = lambda: None
+    assert mail.enqueue('a@example.com', 'Code', 'body')
+    assert not mail.enqueue('b@example.com', 'Code', 'body')
+    assert mail.stats['rejected'] == 1
@@ -0,0 +1,125 @@
+import pytest
+
+import migrate
+from fakes import FakeConnection
+
+
+def test_migrations_are_numbered_without_gaps():
+    versions = [version for version, _, _ in migrate.discover()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_duplicate_versions_are_refused(tmp_path):
+    (tmp_path / '0001_a.sql').write_text('SELECT 1 FROM dual;')
+    (tmp_path / '0001_b.sql').write_text('SELECT 2 FROM dual;')
+    with pytest.raises(SystemExit):
+        migrate.discover(str(tmp_path))
+
+
+def test_every_migration_splits_into_statements():
+    for version, name, path in migrate.discover():
+        with open(path, encoding='utf-8') as f:
+            statements = migrate.split_statements(f.read())
+        assert statements, name
+        # Oracle DDL commits by itself and upgrade() commits each file
+        assert 'COMMIT' not in [s.strip().upper() for s in statements], name
+
+
+def test_split_statements():
+    script = """
+-- leading comment
+CREATE TABLE T (a NUMBER); -- trailing comment
+INSERT INTO T VALUES ('a -- not a comment;');
+
+BEGIN
+    UPDATE T SET a = 1;
+    COMMIT;
+END;
+/
+ALTER TABLE T ADD (b NUMBER)
+"""
+    assert migrate.split_statements(script) == [
+        'CREATE TABLE T (a NUMBER)',
+        "INSERT INTO T VALUES ('a -- not a comment;')",
+        'BEGIN\n    UPDATE T SET a = 1;\n    COMMIT;\nEND;',
+        'ALTER TABLE T ADD (b NUMBER)',
+    ]
+
+
+@pytest.fixture
+def migrations(tmp_path, monkeypatch):
+    (tmp_path / '0001_base.sql').write_text('CREATE TABLE A (x NUMBER);\n')
+    (tmp_path / '0002_more.sql').write_text('ALTER TABLE A ADD (y NUMBER);\nCREATE INDEX idx_a_y ON A(y);\n')
+    (tmp_path / '0003_last.sql').write_text('CREATE TABLE B (z NUMBER);\n')
+    (tmp_path / 'notes.txt').write_text('ignored')
+    found = migrate.discover(str(tmp_path))
+    monkeypatch.setattr(migrate, 'discover', lambda: found)
+    return found
+
+
+def test_upgrade_applies_only_pending_migrations(migrations):
+    applied = [(1, 'base', migrate.checksum(migrations[0][2]))]
+    conn = FakeConnection([(1,), applied])
+    assert migrate.upgrade(conn, out=lambda *_: None) == 2
+    statements = [s for s in conn.statements if not s.startswith('SELECT')]
+    assert statements[:2] == ['ALTER TABLE A ADD (y NUMBER)', 'CREATE INDEX idx_a_y ON A(y)']
+    recorded = [binds[:2] for verb, binds in conn.executed if verb == 'INSERT']
+    assert recorded == [[2, 'more'], [3, 'last']]
+    assert conn.commits == 2
+
+
+def test_upgrade_creates_the_version_table(migrations):
+    conn = FakeConnection([(0,), []])
+    migrate.upgrade(conn, out=lambda *_: None)
+    assert conn.statements[1].startswith('CREATE TABLE SchemaVersion')
+
+
+def test_failed_statement_stops_the_upgrade(migrations):
+    class Failing(FakeConnection):
+        def cursor(self):
+            cur = super().cursor()
+            execute = cur.execute
+
+            def failing(sql, binds=None):
+                if sql.startswith('CREATE INDEX'):
+                    raise RuntimeError('ORA-00955')
+                execute(sql, binds)
+            cur.execute = failing
+            return cur
+
+    conn = Failing([(1,), []])
+    with pytest.raises(RuntimeError):
+        migrate.upgrade(conn, out=lambda *_: None)
+    recorded = [binds[0] for verb, binds in conn.executed if verb == 'INSERT']
+    assert recorded == [1]
+
+
+def test_baseline_and_status(migrations):
+    conn = FakeConnection([(1,), []])
+    assert migrate.baseline(conn, 2) == 2
+    assert [binds[0] for verb, binds in conn.executed if verb == 'INSERT'] == [1, 2]
+    applied = [(1, 'base', migrate.checksum(migrations[0][2])), (2, 'more', 'edited-since')]
+    assert migrate.status(FakeConnection([(1,), applied])) == [
+        (1, 'base', 'applied'), (2, 'more', 'applied (file changed since)'), (3, 'last', 'pending')]
+
+
+def test_plan_check_reports_full_scans():
+    queries = {'by_id': {'sql': 'SELECT * FROM T WHERE id = :1'},
+               'lookup': {'sql': 'SELECT * FROM Quiz', 'full_scan_ok': {'QUIZ'}}}
+    conn = FakeConnection([[('T',), (None,)], [('QUIZ',)]])
+    assert migrate.check_plans(conn, queries, out=lambda *_: None) == [('by_id', ['T'])]
+
+
+def test_hot_queries_are_explainable_statements():
+    for name, query in migrate.HOT_QUERIES.items():
+        assert query['sql'].lstrip().upper().startswith(('SELECT', 'UPDATE', 'WITH', 'DELETE', 'INSERT', 'MERGE')), name
+        assert '{' not in query['sql'], name
+
+
+def test_hot_queries_are_the_statements_the_code_runs():
+    import queries
+    import versions
+    assert migrate.HOT_QUERIES['quiz_questions']['sql'] == queries.QUIZ_QUESTIONS
+    assert 'penalty' in queries.QUIZ_QUESTIONS
+    assert migrate.HOT_QUERIES['version_snapshot']['sql'] == versions.SNAPSHOT_SQL
+    assert 'user_submissions' not in migrate.HOT_QUERIES
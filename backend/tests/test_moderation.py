@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+ADMIN = 1
+USERS = [(5, 'alice', 'member', 'Alice@x.org'), (6, 'bob', 'member', 'bob@x.org'), (7, 'carol', 'banned', 'c@x.org'),
+         (8, 'root2', 'admin', 'r@x.org'), (9, 'dave', 'member', 'd@x.org')]
+
+
+@pytest.fixture
+def admin(services, bearer):
+    services['user_profile_cache'].set(ADMIN, {'name': 'root', 'email': 'root@x.org'})
+    return bearer(ADMIN, 'admin')
+
+
+def moderate(client, admin, **body):
+    return client.post('/api/admin/users/bulk', json=dict({'action': 'ban', 'reason': 'cheating'}, **body), headers=admin)
+
+
+def outcomes(response):
+    return {r['userID']: (r['outcome'], r.get('message')) for r in response.json['results']}
+
+
+def test_per_user_results_from_batch_errors(client, database, admin, services):
+    conn = database.script(USERS)
+    conn.dml_rowcounts = [1, 0, 0]
+    conn.batch_errors = [(2, 'ORA-00060: deadlock detected')]
+    response = moderate(client, admin, user_ids=[5, 6, 7, 8, 9, 404])
+    assert response.status_code == 200
+    assert response.json['matched'] == 6 and response.json['changed'] == 1
+    assert outcomes(response) == {
+        5: ('banned', None),
+        6: ('skipped', 'User changed concurrently'),
+        7: ('skipped', 'User already banned'),
+        8: ('skipped', 'Cannot ban admin user'),
+        9: ('failed', 'ORA-00060: deadlock detected'),
+        404: ('skipped', 'User not found'),
+    }
+    verbs = [verb for verb, _ in conn.executed]
+    assert verbs == ['SELECT', 'UPDATE', 'DELETE', 'INSERT']
+    assert conn.executed[1][1] == [[5], [6], [9]]
+    # refresh tokens and audit entries only for the user actually banned
+    assert conn.executed[2][1] == [[5]]
+    assert len(conn.executed[3][1]) == 1 and conn.executed[3][1][0][0] == 'ban alice'
+    assert conn.commits == 1 and conn.closed
+
+
+def test_dry_run_changes_nothing(client, database, admin):
+    conn = database.script([(6,), (9,)], USERS)
+    response = moderate(client, admin, action='delete', client_ip='10.0.0.9', user_ids=[5], dry_run=True)
+    assert response.status_code == 200 and response.json['dry_run'] is True
+    assert conn.executed[0] == ('SELECT', ['10.0.0.9'])
+    assert outcomes(response) == {5: ('would_be_deleted', None), 6: ('would_be_deleted', None), 9: ('would_be_deleted', None)}
+    assert [verb for verb, _ in conn.executed] == ['SELECT', 'SELECT'] and conn.commits == 0
+
+
+def test_bulk_limit_counts_users_matched_by_ip(client, database, admin, app_config):
+    app_config.MODERATION_BULK_LIMIT = 2
+    conn = database.script([(6,), (9,)])
+    response = moderate(client, admin, client_ip='10.0.0.9', user_ids=[5])
+    assert response.status_code == 400 and '(3 matched)' in response.json['message']
+    assert len(conn.executed) == 1 and conn.commits == 0
+
+
+def test_banned_users_are_revoked_and_their_caches_invalidated(client, database, admin, services):
+    conn = database.script(USERS[:2])
+    conn.dml_rowcounts = [1, 1]
+    services['user_auth_cache'].set('alice@x.org', ('cached login row',))
+    revoked_events = []
+    services['cache_bus'].subscribe('channel', revoked_events.append)
+    issued_at = int(time.time()) - 1
+    response = moderate(client, admin, user_ids=[5, 6])
+    assert response.json['changed'] == 2
+    assert services['user_auth_cache'].get('alice@x.org') is None
+    assert services['revocation_index'].is_revoked(5, issued_at) and services['revocation_index'].is_revoked(6, issued_at)
+    assert not services['revocation_index'].is_revoked(9, issued_at)
+    assert len(revoked_events) == 2
+
+
+def test_deleted_users_lose_their_cached_profile(client, database, admin, services):
+    conn = database.script(USERS[:1])
+    conn.dml_rowcounts = [1]
+    services['user_profile_cache'].set(5, {'name': 'alice', 'email': 'Alice@x.org'})
+    response = moderate(client, admin, action='delete', user_ids=[5])
+    assert outcomes(response) == {5: ('deleted', None)}
+    assert [verb for verb, _ in conn.executed] == ['SELECT', 'DELETE', 'INSERT']
+    assert services['user_profile_cache'].get(5) is None
@@ -0,0 +1,94 @@
+import io
+import json
+
+import pytest
+
+import questionbank
+from fakes import FakeConnection, FakeDatabase
+from questionbank import BankImporter, export_csv, export_jsonl, iter_questions, read_csv, read_jsonl, validate_question
+
+QUESTIONS = [
+    {'title': 'Port of HTTPS?', 'category': 'net', 'difficulty': 'easy', 'points': 2.0, 'description': None,
+     'multi_select': False, 'partial_credit': False, 'penalty': 0.0,
+     'answers': [{'text': '443', 'is_correct': True}, {'text': '80', 'is_correct': False}]},
+    {'title': 'Hash functions', 'category': None, 'difficulty': None, 'points': None, 'description': 'pick all',
+     'multi_select': True, 'partial_credit': True, 'penalty': 0.5,
+     'answers': [{'text': 'SHA-256', 'is_correct': True}, {'text': 'AES', 'is_correct': False},
+                 {'text': 'BLAKE2', 'is_correct': True}]},
+]
+
+
+@pytest.fixture(autouse=True)
+def driver(monkeypatch):
+    monkeypatch.setattr(questionbank, 'oracledb', FakeDatabase())
+
+
+def stream(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def import_bank(records, batch_size=500):
+    conn = FakeConnection()
+    result = BankImporter(conn, 7, batch_size=batch_size).run(records)
+    return conn, result
+
+
+def stored_rows(conn):
+    """What the export query would return for the rows the import inserted."""
+    inserts = [rows for verb, rows in conn.executed if verb == 'INSERT']
+    questions = [row for i, rows in enumerate(inserts) if i % 2 == 0 for row in rows]
+    answers = [row for i, rows in enumerate(inserts) if i % 2 == 1 for row in rows]
+    out = []
+    for question_id, q in enumerate(questions, start=1):
+        for answer in [a for a in answers if a[0] == question_id]:
+            out.append([question_id] + q[1:] + answer[1:])
+    return out
+
+
+def test_jsonl_import_export_import_round_trip():
+    original, result = import_bank(read_jsonl(stream(''.join(json.dumps(q) + '\n' for q in QUESTIONS))))
+    assert result == {'imported': 2, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    exported = ''.join(export_jsonl(iter_questions(FakeConnection([stored_rows(original)]), 7)))
+    again, result = import_bank(read_jsonl(stream(exported)))
+    assert result['imported'] == 2
+    assert stored_rows(again) == stored_rows(original)
+    assert [validate_question(json.loads(line)) for line in exported.splitlines()] == [validate_question(q) for q in QUESTIONS]
+
+
+def test_csv_export_keeps_zero_penalty_and_round_trips():
+    original, _ = import_bank([(i, q) for i, q in enumerate(QUESTIONS, start=1)])
+    exported = ''.join(export_csv(iter_questions(FakeConnection([stored_rows(original)]), 7)))
+    first_row = exported.splitlines()[1].split(',')
+    assert first_row[3] == '2.0' and first_row[7] == '0.0'
+    again, result = import_bank(read_csv(stream(exported)))
+    assert result['imported'] == 2
+    assert stored_rows(again) == stored_rows(original)
+
+
+def test_csv_correct_column():
+    text = ('title,answer_1,answer_2,answer_3,correct\n'
+            'a,x,y,z,1;3\n'
+            'b,x,y,z," 2 , 3 "\n'
+            'c,x,y,z,first\n')
+    records = list(read_csv(stream(text)))
+    assert [a['is_correct'] for a in records[0][1]['answers']] == [True, False, True]
+    assert [a['is_correct'] for a in records[1][1]['answers']] == [False, True, True]
+    assert records[2][0] == 4 and isinstance(records[2][1], ValueError)
+
+
+def test_csv_without_title_column_is_rejected():
+    with pytest.raises(questionbank.BankFormatError):
+        list(read_csv(stream('name,answer_1\nx,y\n')))
+
+
+def test_failed_batch_reports_each_of_its_lines():
+    lines = [json.dumps(QUESTIONS[0])] * 3 + ['{broken', json.dumps(dict(QUESTIONS[0], answers=[]))]
+    conn = FakeConnection()
+    conn.error = RuntimeError('ORA-02291: integrity constraint violated')
+    result = BankImporter(conn, 7, batch_size=2).run(read_jsonl(stream('\n'.join(lines) + '\n')))
+    assert result['imported'] == 1 and result['failed'] == 4
+    assert [e['line'] for e in result['errors']] == [1, 2, 4, 5]
+    assert result['errors'][0]['message'].startswith('database rejected the batch: ORA-02291')
+    assert result['errors'][2]['message'].startswith('invalid JSON')
+    assert result['errors'][3]['message'] == 'at least two answers are required'
+    assert conn.rollbacks == 1 and conn.commits == 1
@@ -0,0 +1,17 @@
+def test_primary_reported_from_ping(client, database):
+    database.script((1,))
+    body = client.get('/readyz').get_json()
+    primary = body['pools']['primary']
+    assert primary['pooled'] is False
+    assert primary['ok'] is True
+    assert primary['connect_ms'] == body['database']['ms']
+    assert database.opened[0].statements == ['SELECT 1 FROM dual']
+
+
+def test_unreachable_primary_is_not_ready(client, database):
+    database.script().error = database.DatabaseError('ORA-12541')
+    resp = client.get('/readyz')
+    assert resp.status_code == 503
+    body = resp.get_json()
+    assert body['status'] == 'unavailable'
+    assert body['pools']['primary']['ok'] is False
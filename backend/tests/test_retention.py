@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from fakes import FakeConnection
+from retention import RetentionJob
+
+
+def test_refresh_tokens_are_purged_in_batches_until_a_short_one():
+    now = datetime.utcnow()
+    conn = FakeConnection(rowcount=2)
+    job = RetentionJob(lambda: conn, batch_size=2, max_batches=3, pause=0)
+    assert job.purge_refresh_tokens(conn, now, ignore_window=True) == 6
+    assert conn.executed == [('DELETE', [now, 2])] * 3 and conn.commits == 3
+
+    conn = FakeConnection(rowcount=1)
+    assert job.purge_refresh_tokens(conn, now, ignore_window=True) == 1
+    assert len(conn.executed) == 1
+
+
+def test_refresh_token_purge_respects_the_window():
+    conn = FakeConnection(rowcount=5)
+    job = RetentionJob(lambda: conn, window='00:00-00:00', pause=0)
+    assert job.purge_refresh_tokens(conn, datetime.utcnow()) == 0
+    assert conn.executed == []
+
+
+def test_run_purges_refresh_tokens_after_archiving():
+    conn = FakeConnection(rowcount=0)
+    job = RetentionJob(lambda: conn, pause=0)
+    job.archive_batch = lambda conn, cutoff: (0, 0, 0, 0)
+    totals = job.run(ignore_window=True)
+    assert totals['refresh_tokens'] == 0 and totals['sessions'] == 0
+    assert conn.executed[0][0] == 'DELETE' and conn.closed
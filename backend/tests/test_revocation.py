@@ -0,0 +1,62 @@
+import time
+
+from revocation import MemoryRevocationBackend, RevocationIndex
+from tokens import TokenSigner
+
+
+def test_tokens_issued_before_revocation_are_rejected():
+    index = RevocationIndex(MemoryRevocationBackend(), token_lifetime=900)
+    index.revoke_user(4, at=1000)
+    assert index.is_revoked(4, 999)
+    assert index.is_revoked(4, 1000)
+    assert not index.is_revoked(4, 1001)
+    assert not index.is_revoked(5, 999)
+    # tokens without iat predate revocation tracking and count as oldest
+    assert index.is_revoked(4, None)
+    assert not index.is_revoked(None, 1)
+    assert not index.is_revoked('not-a-number', 1)
+
+
+def test_workers_share_revocations_through_the_backend():
+    backend = MemoryRevocationBackend()
+    publisher = RevocationIndex(backend, token_lifetime=900)
+    other = RevocationIndex(backend, token_lifetime=900)
+    publisher.revoke_user(4)
+    assert not other.is_revoked(4, int(time.time()) - 1)
+    other.sync()
+    assert other.is_revoked(4, int(time.time()) - 1)
+
+
+def test_older_revocation_does_not_override_newer():
+    index = RevocationIndex(MemoryRevocationBackend(), token_lifetime=900)
+    index.revoke_user(4, at=2000)
+    index._apply(4, 1000, 1900)
+    assert index.is_revoked(4, 1500)
+
+
+def test_revocation_outlives_legacy_tokens():
+    signer = TokenSigner({'k1': 'one'}, lifetime=900, legacy_secret='legacy', legacy_lifetime=14000)
+    index = RevocationIndex(MemoryRevocationBackend(), token_lifetime=signer.max_lifetime)
+    now = int(time.time())
+    # revoked two hours ago: past the access token lifetime, within the legacy one
+    index.revoke_user(4, at=now - 7200)
+    index.sync()
+    assert index.is_revoked(4, now - 7300)
+
+
+def test_expired_revocations_are_forgotten():
+    index = RevocationIndex(MemoryRevocationBackend(), token_lifetime=900)
+    index.revoke_user(4, at=int(time.time()) - 1000)
+    index.sync()
+    assert not index.is_revoked(4, 0)
+
+
+class FailingBackend(MemoryRevocationBackend):
+    def publish(self, user_id, revoked_at, expires_at):
+        raise OSError('database down')
+
+
+def test_publish_failure_still_revokes_locally():
+    index = RevocationIndex(FailingBackend(), token_lifetime=900)
+    index.revoke_user(4, at=1000)
+    assert index.is_revoked(4, 1000)
@@ -0,0 +1,56 @@
+from selection import _allocate, new_seed, selected_question_ids, session_payload
+
+
+def bank(count=12, shuffle_questions=False, shuffle_answers=False, pool_size=None, stratify_by=None):
+    questions = [{'questionID': i, 'category': 'web' if i <= 8 else 'crypto', 'difficulty': 'easy',
+                  'answers': [{'answerID': i * 10 + j, 'text': str(j)} for j in range(4)]}
+                 for i in range(1, count + 1)]
+    return {'questions': questions, 'pool_size': pool_size, 'stratify_by': stratify_by,
+            'shuffle_questions': shuffle_questions, 'shuffle_answers': shuffle_answers}
+
+
+def test_same_seed_gives_the_same_selection_on_every_call():
+    snapshot = bank(pool_size=5, shuffle_questions=True)
+    first = selected_question_ids(snapshot, 1234)
+    assert len(first) == 5 and len(set(first)) == 5
+    assert all(selected_question_ids(snapshot, 1234) == first for _ in range(10))
+    # a copy, as another worker would load it from the snapshot JSON
+    assert selected_question_ids(bank(pool_size=5, shuffle_questions=True), '1234') == first
+
+
+def test_different_seeds_give_different_draws():
+    snapshot = bank(pool_size=5, shuffle_questions=True)
+    assert len({tuple(selected_question_ids(snapshot, seed)) for seed in range(1, 30)}) > 1
+
+
+def test_without_shuffling_the_draw_keeps_bank_order():
+    chosen = selected_question_ids(bank(pool_size=5), 99)
+    assert chosen == sorted(chosen)
+    assert selected_question_ids(bank(), 99) == list(range(1, 13))
+
+
+def test_sessions_without_a_seed_see_the_whole_bank_in_order():
+    assert selected_question_ids(bank(pool_size=3, shuffle_questions=True), None) == list(range(1, 13))
+
+
+def test_stratified_draw_is_proportional_to_the_bank():
+    chosen = selected_question_ids(bank(pool_size=6, stratify_by='category'), 7)
+    assert sum(1 for qid in chosen if qid <= 8) == 4 and sum(1 for qid in chosen if qid > 8) == 2
+    assert _allocate({'a': [1], 'b': list(range(9))}, 5) == {'a': 1, 'b': 4}
+
+
+def test_answer_shuffle_is_stable_per_seed_and_question():
+    payload = bank(shuffle_answers=True)
+    first = session_payload(payload, 555)
+    assert first == session_payload(bank(shuffle_answers=True), 555)
+    orders = [[a['answerID'] for a in q['answers']] for q in first['questions']]
+    assert any(order != sorted(order) for order in orders)
+    assert all(sorted(order) == [q * 10 + j for j in range(4)] for q, order in zip(range(1, 13), orders))
+    # the shared cached payload is never modified
+    assert [a['answerID'] for a in payload['questions'][0]['answers']] == [10, 11, 12, 13]
+
+
+def test_payload_without_selection_settings_is_returned_as_is():
+    payload = bank()
+    assert session_payload(payload, 555) is payload
+    assert 1 <= new_seed() < 2 ** 31
@@ -0,0 +1,92 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+SNAPSHOT = json.dumps({
+    'quizID': 11, 'title': 'Quiz', 'timelimit': 30, 'pool_size': None, 'pass_threshold': 0.5,
+    'questions': [
+        {'questionID': 1, 'points': 2.0, 'answers': [{'answerID': 10, 'text': 'a', 'is_correct': True},
+                                                     {'answerID': 11, 'text': 'b', 'is_correct': False}]},
+        {'questionID': 2, 'points': 1.0, 'answers': [{'answerID': 20, 'text': 'c', 'is_correct': True}]},
+    ],
+})
+ANSWERS = [{'questionID': 1, 'answerID': 10}, {'questionID': 2, 'answerID': 21}]
+
+
+def active_session():
+    # userID, quizID, status, expires_at, versionID, seed, score
+    return (5, 11, 'active', datetime.utcnow() + timedelta(minutes=10), 3, None, None)
+
+
+def script_first_submit(database):
+    # session, no UserQuiz row yet, the version snapshot, no autosaved answers
+    return database.script(active_session(), None, (SNAPSHOT,), [])
+
+
+def submit(client, bearer, key=None, session_id='s-1'):
+    headers = bearer(5, **({'Idempotency-Key': key} if key else {}))
+    return client.post('/api/quizzes/11/submit', json={'session_id': session_id, 'answers': ANSWERS}, headers=headers)
+
+
+def test_replay_with_the_same_key_returns_the_stored_result_without_regrading(client, database, bearer):
+    conn = script_first_submit(database)
+    first = submit(client, bearer, key='k1')
+    assert first.status_code == 200 and first.json['score'] == 2.0 and first.json['total'] == 3.0
+    assert [verb for verb, _ in conn.executed].count('INSERT') == 2
+
+    replay = submit(client, bearer, key='k1')
+    assert replay.status_code == 200 and replay.json == first.json
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert len(database.opened) == 1
+
+
+def test_a_different_key_on_a_submitted_quiz_is_rejected(client, services, database, bearer):
+    script_first_submit(database)
+    assert submit(client, bearer, key='k1').status_code == 200
+    other = submit(client, bearer, key='k2')
+    assert other.status_code == 403 and other.json['message'] == 'Quiz already taken'
+    assert len(database.opened) == 1
+
+    # once the stored result is gone, the submitted session still refuses a new key
+    database.opened.clear()
+    database.script((5, 11, 'submitted', None, 3, None, 2.0))
+    services['submit_results'].clear()
+    late = submit(client, bearer, key='k2')
+    assert late.status_code == 403 and late.json['message'] == 'Session is not active'
+
+
+def test_replay_after_the_result_expired_is_rebuilt_from_the_session(client, database, bearer):
+    conn = database.script((5, 11, 'submitted', None, 3, None, 2.0), (SNAPSHOT,))
+    replay = submit(client, bearer)
+    assert replay.status_code == 200
+    assert replay.json['score'] == 2.0 and replay.json['total'] == 3.0
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert 'INSERT' not in [verb for verb, _ in conn.executed] and conn.commits == 0
+
+
+def test_concurrent_duplicate_waits_for_the_first_and_gets_its_result(client, services, database, bearer):
+    flight = services['submits_in_flight']
+    assert flight.enter((5, 11))
+    results = []
+    duplicate = threading.Thread(target=lambda: results.append(submit(client.application.test_client(), bearer, key='k1')))
+    duplicate.start()
+    # the duplicate blocks behind the first submit instead of grading
+    duplicate.join(0.2)
+    assert duplicate.is_alive()
+    body = {'ok': True, 'score': 1.0, 'total': 3.0, 'details': []}
+    services['submit_results'].set((5, 11), ('k1', body))
+    flight.leave((5, 11))
+    duplicate.join(5)
+    assert results[0].status_code == 200 and results[0].json == body
+    assert results[0].headers['Idempotent-Replayed'] == 'true'
+    assert database.opened == []
+
+
+def test_duplicate_that_outwaits_the_first_gets_409(client, services, app_config, database, bearer):
+    app_config.SUBMIT_WAIT_SECONDS = 0.05
+    assert services['submits_in_flight'].enter((5, 11))
+    try:
+        response = submit(client, bearer, key='k1')
+    finally:
+        services['submits_in_flight'].leave((5, 11))
+    assert response.status_code == 409 and database.opened == []
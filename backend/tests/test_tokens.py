@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from fakes import FakeConnection
+from tokens import TOKEN_VERSION, RefreshTokenError, RefreshTokenStore, TokenSigner, hash_refresh_token, parse_signing_keys
+
+
+def test_parse_signing_keys():
+    assert parse_signing_keys('k1:one, k2:two:with:colons,bad', 'legacy') == {'k1': 'one', 'k2': 'two:with:colons'}
+    assert parse_signing_keys('', 'legacy') == {'k0': 'legacy'}
+    assert parse_signing_keys('', None) == {}
+
+
+def test_issue_and_decode_with_key_id():
+    signer = TokenSigner({'k1': 'one'}, lifetime=60)
+    token = signer.issue(7, 'member')
+    assert jwt.get_unverified_header(token)['kid'] == 'k1'
+    claims = signer.decode(token)
+    assert (claims['sub'], claims['role'], claims['ver']) == (7, 'member', TOKEN_VERSION)
+    assert claims['exp'] - claims['iat'] == 60
+
+
+def test_rotation_keeps_tokens_of_the_previous_key_valid():
+    old = TokenSigner({'k1': 'one'})
+    token = old.issue(1, 'admin')
+    rotated = TokenSigner({'k1': 'one', 'k2': 'two'}, active_kid='k2')
+    assert jwt.get_unverified_header(rotated.issue(1, 'admin'))['kid'] == 'k2'
+    assert rotated.decode(token)['sub'] == 1
+    # once k1 is retired its tokens are rejected
+    with pytest.raises(jwt.InvalidTokenError):
+        TokenSigner({'k2': 'two'}).decode(token)
+
+
+def test_unknown_active_kid_falls_back_to_first_key():
+    assert TokenSigner({'k1': 'one'}, active_kid='nope').active_kid == 'k1'
+    with pytest.raises(ValueError):
+        TokenSigner({})
+
+
+def _legacy_token(secret, seconds):
+    now = datetime.utcnow()
+    return jwt.encode({'sub': 3, 'role': 'member', 'iat': now, 'exp': now + timedelta(seconds=seconds)}, secret,
+                      algorithm='HS256')
+
+
+def test_legacy_tokens_without_kid():
+    token = _legacy_token('legacy', 14000)
+    signer = TokenSigner({'k1': 'one'}, legacy_secret='legacy', legacy_lifetime=14000)
+    assert signer.decode(token)['sub'] == 3
+    assert signer.max_lifetime == 14000
+    # without a legacy lifetime the legacy secret is not accepted
+    strict = TokenSigner({'k1': 'one'}, legacy_secret='legacy')
+    assert strict.max_lifetime == strict.lifetime
+    with pytest.raises(jwt.InvalidTokenError):
+        strict.decode(token)
+
+
+def test_refresh_rotation_issues_a_new_token_in_the_same_family():
+    future = datetime.utcnow() + timedelta(days=1)
+    conn = FakeConnection([(5, 'family-1', future, None, 'member')])
+    user_id, role, new_token = RefreshTokenStore(lambda: conn).rotate('old-token')
+    assert (user_id, role) == (5, 'member')
+    verbs = [verb for verb, _ in conn.executed]
+    assert verbs == ['SELECT', 'UPDATE', 'INSERT']
+    assert conn.executed[0][1] == [hash_refresh_token('old-token')]
+    inserted = conn.executed[2][1]
+    assert inserted[0] == hash_refresh_token(new_token) and inserted[2] == 'family-1'
+    assert conn.commits == 1
+
+
+def test_replayed_refresh_token_revokes_the_family():
+    used = datetime.utcnow() - timedelta(minutes=5)
+    conn = FakeConnection([(5, 'family-1', datetime.utcnow() + timedelta(days=1), used, 'member')])
+    with pytest.raises(RefreshTokenError):
+        RefreshTokenStore(lambda: conn).rotate('old-token')
+    assert conn.executed[-1] == ('DELETE', ['family-1'])
+    assert conn.commits == 1
+
+
+def test_concurrent_refresh_within_grace_is_not_treated_as_theft():
+    used = datetime.utcnow() - timedelta(seconds=2)
+    conn = FakeConnection([(5, 'family-1', datetime.utcnow() + timedelta(days=1), used, 'member')])
+    with pytest.raises(RefreshTokenError):
+        RefreshTokenStore(lambda: conn, reuse_grace=10).rotate('old-token')
+    assert [verb for verb, _ in conn.executed] == ['SELECT']
+    assert conn.rollbacks == 1
+
+
+def test_unknown_and_expired_refresh_tokens():
+    with pytest.raises(RefreshTokenError):
+        RefreshTokenStore(lambda: FakeConnection()).rotate('nope')
+    conn = FakeConnection([(5, 'family-1', datetime.utcnow() - timedelta(seconds=1), None, 'member')])
+    with pytest.raises(RefreshTokenError):
+        RefreshTokenStore(lambda: conn).rotate('old-token')
+    assert conn.executed[-1][0] == 'DELETE'
+
+
+def test_purge_expired_deletes_a_bounded_batch():
+    conn = FakeConnection(rowcount=3)
+    cutoff = datetime.utcnow()
+    assert RefreshTokenStore.purge_expired(conn.cursor(), cutoff, limit=50) == 3
+    assert conn.executed == [('DELETE', [cutoff, 50])]
@@ -0,0 +1,101 @@
+import itertools
+import json
+
+from fakes import FakeConnection
+from versions import QuizVersionStore
+
+QUIZ = (7, 'Quiz', 'desc', 30, None, None, 'N', 'N', 0.5)
+QUESTIONS = [(1, 'Port of HTTPS?', 'net', 'easy', 2, None, 'N', 'N', None)]
+ANSWERS = [(1, 10, '443', 'Y'), (1, 11, '80', 'N')]
+
+
+def publish(current=None, questions=QUESTIONS, answers=ANSWERS):
+    """Publish the draft against a connection whose current version is ``current`` (versionID, hash)."""
+    conn = FakeConnection([QUIZ, questions, answers, current, (4,)])
+    conn.ids = itertools.count(42)
+    version_id = QuizVersionStore().publish(conn.cursor(), 7)
+    return conn, version_id
+
+
+def inserted_hash(conn):
+    return [binds for verb, binds in conn.executed if verb == 'INSERT'][0][2]
+
+
+def test_publish_writes_a_new_version_and_points_the_quiz_at_it():
+    conn, version_id = publish()
+    assert version_id == 42
+    insert = [binds for verb, binds in conn.executed if verb == 'INSERT'][0]
+    assert insert[:2] == [7, 4]
+    snapshot = json.loads(insert[3])
+    assert snapshot['questions'][0]['answers'][0] == {'answerID': 10, 'text': '443', 'is_correct': True}
+    assert ('UPDATE', [42, 7]) in conn.executed
+    # versions nobody pins any more are collected right away, for this quiz only
+    assert conn.executed[-1] == ('DELETE', [7])
+
+
+def test_unchanged_draft_is_not_published_again():
+    first, _ = publish()
+    conn, version_id = publish(current=(42, inserted_hash(first)))
+    assert version_id == 42
+    assert [verb for verb, _ in conn.executed] == ['SELECT'] * 4
+
+
+def test_edited_draft_gets_a_new_version():
+    first, _ = publish()
+    edited = [(1, 'Port of HTTPS?', 'net', 'easy', 3, None, 'N', 'N', None)]
+    conn, version_id = publish(current=(42, inserted_hash(first)), questions=edited)
+    assert 'INSERT' in [verb for verb, _ in conn.executed]
+    assert inserted_hash(conn) != inserted_hash(first)
+
+
+def test_current_version_publishes_quizzes_created_before_versioning():
+    store = QuizVersionStore()
+    assert store.current_version(FakeConnection([(5,)]).cursor(), 7) == 5
+    assert store.current_version(FakeConnection([None]).cursor(), 7) is None
+    conn = FakeConnection([(None,), QUIZ, QUESTIONS, ANSWERS, None, (1,)])
+    conn.ids = itertools.count(8)
+    assert store.current_version(conn.cursor(), 7) == 8
+
+
+def test_snapshots_are_loaded_once_and_served_without_the_key():
+    first, _ = publish()
+    body = [binds for verb, binds in first.executed if verb == 'INSERT'][0][3]
+    store = QuizVersionStore()
+    conn = FakeConnection([(body,)])
+    payload = store.candidate_payload(conn, 42)
+    assert payload['questions'][0]['answers'] == [{'answerID': 10, 'text': '443'}, {'answerID': 11, 'text': '80'}]
+    assert store.snapshot(conn, 42)['questions'][0]['answers'][0]['is_correct'] is True
+    assert store.grading_key(conn, 42) is store.grading_key(conn, 42)
+    assert len(conn.executed) == 1
+    assert store.snapshot(FakeConnection([None]), 43) is None
+
+
+def test_garbage_collection_keeps_current_and_pinned_versions():
+    conn = FakeConnection(rowcount=2)
+    assert QuizVersionStore.collect_garbage(conn.cursor()) == 2
+    sql = conn.statements[0]
+    for pin in ('FROM Quiz q WHERE q.current_version = v.versionID',
+                'FROM Sessions s WHERE s.versionID = v.versionID',
+                'FROM ExamEvents e WHERE e.versionID = v.versionID'):
+        assert 'NOT EXISTS (SELECT 1 ' + pin + ')' in sql
+    assert conn.executed == [('DELETE', None)]
+
+
+def test_editing_a_quiz_retires_removed_rows_instead_of_deleting_them(client, database, bearer, services):
+    services['user_profile_cache'].set(1, {'name': 'root', 'email': 'root@x.org'})
+    # quiz exists; live questions 1, 2 and their answers; then the draft read back for publishing
+    conn = database.script((7,), [(1,), (2,)], [(10, 1), (11, 1), (20, 2), (21, 2)],
+                           QUIZ, QUESTIONS, ANSWERS, None, (2,))
+    conn.ids = itertools.count(100)
+    body = {'title': 'Quiz', 'questions': [
+        {'questionID': 1, 'title': 'Port of HTTPS?', 'points': 2,
+         'answers': [{'answerID': 10, 'text': '443', 'is_correct': True}, {'text': '8443'}]},
+        {'title': 'New question', 'answers': [{'text': 'yes', 'is_correct': True}, {'text': 'no'}]},
+    ]}
+    response = client.put('/api/admin/quizzes/7', json=body, headers=bearer(1, 'admin'))
+    assert response.status_code == 200 and response.json['versionID'] == 101
+    retired = {sql.split()[1]: sorted(binds) for sql, (verb, binds) in zip(conn.statements, conn.executed)
+               if "SET retired = 'Y'" in sql}
+    assert retired == {'Questions': [[2]], 'Answers': [[11], [20], [21]]}
+    assert not any(sql.startswith(('DELETE FROM Questions', 'DELETE FROM Answers')) for sql in conn.statements)
+    assert conn.commits == 1
@@ -0,0 +1,191 @@
+"""Access token signing and server-side refresh tokens.
+
+Access tokens are short-lived JWTs carrying only ``sub``, ``role`` and ``ver`` (the
+claims layout version). Every token is signed with a named key and the key ID goes in
+the JWT header, so a new signing key can be introduced while tokens signed with the
+previous one stay valid until they expire.
+
+Refresh tokens are opaque random strings. Only their SHA-256 is stored (RefreshTokens
+table); each use rotates the token and presenting an already-rotated token revokes
+the whole family, which limits the damage of a leaked refresh token.
+"""
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+
+
+# Bump when the access token claims layout changes
+TOKEN_VERSION = 2
+
+
+def parse_signing_keys(spec: str, fallback_secret: str) -> dict:
+    """Parse ``"kid1:secret1,kid2:secret2"``; without a spec the legacy secret (if given) becomes key ``k0``."""
+    keys = {}
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part or ':' not in part:
+            continue
+        kid, secret = part.split(':', 1)
+        keys[kid.strip()] = secret.strip()
+    if not keys and fallback_secret is not None:
+        keys['k0'] = fallback_secret
+    return keys
+
+
+class TokenSigner:
+    """Issue and verify access tokens with key rotation by ``kid``."""
+
+    def __init__(self, keys: dict, active_kid: str = None, algorithm: str = 'HS256', lifetime: int = 900,
+                 legacy_secret: str = None, legacy_lifetime: int = 0):
+        if not keys:
+            raise ValueError('at least one signing key is required')
+        self.keys = dict(keys)
+        self.active_kid = active_kid if active_kid in self.keys else next(iter(self.keys))
+        self.algorithm = algorithm
+        self.lifetime = lifetime
+        # Tokens issued before key IDs existed have no kid header and lived legacy_lifetime seconds
+        self.legacy_secret = legacy_secret if legacy_lifetime > 0 else None
+        self.legacy_lifetime = legacy_lifetime if self.legacy_secret else 0
+
+    @property
+    def max_lifetime(self) -> int:
+        """Longest lifetime of any token this signer still accepts (revocations must outlive it)."""
+        return max(self.lifetime, self.legacy_lifetime)
+
+    def issue(self, user_id, role: str) -> str:
+        now = datetime.utcnow()
+        payload = {
+            'sub': user_id,
+            'role': role,
+            'ver': TOKEN_VERSION,
+            'iat': now,
+            'exp': now + timedelta(seconds=self.lifetime),
+        }
+        return jwt.encode(payload, self.keys[self.active_kid], algorithm=self.algorithm,
+                          headers={'kid': self.active_kid})
+
+    def decode(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None and self.legacy_secret:
+            secret = self.legacy_secret
+        else:
+            secret = self.keys.get(kid)
+        if secret is None:
+            raise jwt.InvalidTokenError('Unknown signing key')
+        return jwt.decode(token, secret, algorithms=[self.algorithm])
+
+
+# Locks the row so that two refreshes with one token cannot both rotate it
+REFRESH_TOKEN_SQL = (
+    "SELECT rt.userID, rt.family_id, rt.expires_at, rt.used_at, u.role "
+    "FROM RefreshTokens rt JOIN Users u ON u.userID = rt.userID "
+    "WHERE rt.token_hash = :1 FOR UPDATE OF rt.used_at"
+)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class RefreshTokenError(Exception):
+    """The presented refresh token is unknown, expired, or was already used."""
+
+
+class RefreshTokenStore:
+    """Rotating refresh tokens kept in the RefreshTokens table."""
+
+    def __init__(self, connect, lifetime: int = 7 * 24 * 3600, reuse_grace: int = 10):
+        self._connect = connect
+        self.lifetime = lifetime
+        # A rotated token presented again within this window (two tabs refreshing at once)
+        # is rejected without treating it as theft
+        self.reuse_grace = reuse_grace
+
+    def issue(self, cur, user_id, family_id: str = None) -> str:
+        """Insert a new refresh token using the caller's cursor (caller commits)."""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        cur.execute(
+            "INSERT INTO RefreshTokens (token_hash, userID, family_id, expires_at, created_at) VALUES (:1, :2, :3, :4, :5)",
+            [hash_refresh_token(token), user_id, family_id or str(uuid.uuid4()), now + timedelta(seconds=self.lifetime), now]
+        )
+        return token
+
+    def create(self, user_id) -> str:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            token = self.issue(cur, user_id)
+            conn.commit()
+            cur.close()
+            return token
+        finally:
+            conn.close()
+
+    def rotate(self, token: str):
+        """Consume ``token`` and return (userID, role, new_refresh_token).
+
+        The user's role is re-read so that a ban or role change shows up in the next
+        access token.
+        """
+        token_hash = hash_refresh_token(token)
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(REFRESH_TOKEN_SQL, [token_hash])
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                raise RefreshTokenError('Invalid refresh token')
+            user_id, family_id, expires_at, used_at, role = row
+            now = datetime.utcnow()
+            if used_at is not None:
+                if (now - used_at).total_seconds() > self.reuse_grace:
+                    # Replay of a rotated token: assume it leaked and kill the family
+                    cur.execute("DELETE FROM RefreshTokens WHERE family_id = :1", [family_id])
+                    conn.commit()
+                else:
+                    conn.rollback()
+                raise RefreshTokenError('Refresh token already used')
+            if expires_at is not None and expires_at <= now:
+                cur.execute("DELETE FROM RefreshTokens WHERE token_hash = :1", [token_hash])
+                conn.commit()
+                raise RefreshTokenError('Refresh token expired')
+            cur.execute("UPDATE RefreshTokens SET used_at = :1 WHERE token_hash = :2", [now, token_hash])
+            new_token = self.issue(cur, user_id, family_id)
+            conn.commit()
+            cur.close()
+            return int(user_id), role, new_token
+        finally:
+            conn.close()
+
+    def revoke(self, token: str) -> None:
+        """Drop the family of ``token`` (logout)."""
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "DELETE FROM RefreshTokens WHERE family_id = (SELECT family_id FROM RefreshTokens WHERE token_hash = :1)",
+                [hash_refresh_token(token)]
+            )
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def revoke_user(cur, user_id) -> None:
+        """Drop every refresh token of a user using the caller's cursor (caller commits)."""
+        cur.execute("DELETE FROM RefreshTokens WHERE userID = :1", [user_id])
+
+    @staticmethod
+    def purge_expired(cur, before: datetime, limit: int = 1000) -> int:
+        """Delete up to ``limit`` tokens that expired before ``before`` using the caller's cursor (caller commits).
+
+        Rotated tokens stay until they expire so that a replay is still recognised.
+        """
+        cur.execute("DELETE FROM RefreshTokens WHERE expires_at < :1 AND ROWNUM <= :2", [before, limit])
+        return cur.rowcount
@@ -0,0 +1,192 @@
+"""Immutable quiz content versions.
+
+Admins edit the draft in Questions/Answers. Publishing serializes the draft into a
+QuizVersions row (a JSON snapshot that never changes) and points Quiz.current_version
+at it. Sessions record the version they started on, so the start payload and grading
+for an attempt always come from the same snapshot. A snapshot never changes, so it
+can be cached forever by versionID and never needs invalidation.
+
+Publishing is copy-on-write: if the draft hashes to the same content as the current
+version, no new row is written. Questions and answers removed from the draft are
+retired rather than deleted, so IDs referenced by older snapshots stay valid.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from cache import TTLCache
+from grading import CompiledKey
+
+
+# The live (non-retired) draft of a quiz, serialized by build_snapshot
+DRAFT_QUIZ_SQL = (
+    "SELECT quizID, title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, "
+    "pass_threshold FROM Quiz WHERE quizID = :1"
+)
+DRAFT_QUESTIONS_SQL = (
+    "SELECT questionID, title, category, difficulty, points, description, multi_select, partial_credit, penalty "
+    "FROM Questions WHERE quizID = :1 AND retired = 'N' ORDER BY questionID"
+)
+DRAFT_ANSWERS_SQL = (
+    "SELECT a.questionID, a.answerID, a.answer_text, a.is_correct FROM Answers a "
+    "JOIN Questions q ON q.questionID = a.questionID "
+    "WHERE q.quizID = :1 AND q.retired = 'N' AND a.retired = 'N' ORDER BY a.questionID, a.answerID"
+)
+CURRENT_VERSION_SQL = "SELECT current_version FROM Quiz WHERE quizID = :1"
+SNAPSHOT_SQL = "SELECT snapshot FROM QuizVersions WHERE versionID = :1"
+
+
+def _read_lob(value):
+    return value.read() if hasattr(value, 'read') else value
+
+
+class QuizVersionStore:
+    """Publish, load and garbage-collect QuizVersions snapshots."""
+
+    def __init__(self, cache_size: int = 256):
+        # Snapshots are immutable: entries only leave the cache through LRU eviction
+        self._snapshots = TTLCache(maxsize=cache_size, ttl=float('inf'))
+        self._payloads = TTLCache(maxsize=cache_size, ttl=float('inf'))
+        self._keys = TTLCache(maxsize=cache_size, ttl=float('inf'))
+
+    def stats(self) -> dict:
+        """Cached entries per kind; all zero in a worker that has not served a quiz yet."""
+        return {'snapshots': len(self._snapshots), 'payloads': len(self._payloads), 'keys': len(self._keys)}
+
+    # -- publishing -------------------------------------------------------
+
+    @staticmethod
+    def build_snapshot(cur, quiz_id) -> dict:
+        """Serialize the live (non-retired) draft of a quiz, including the answer key."""
+        cur.execute(DRAFT_QUIZ_SQL, [quiz_id])
+        row = cur.fetchone()
+        if not row:
+            return None
+        quizID, title, description, timelimit, pool_size, stratify_by, shuffle_questions, shuffle_answers, pass_threshold = row
+        cur.execute(DRAFT_QUESTIONS_SQL, [quiz_id])
+        questions = []
+        by_id = {}
+        for questionID, qtitle, qcategory, qdifficulty, qpoints, qdesc, multi, partial, penalty in cur.fetchall():
+            q = {'questionID': int(questionID), 'title': qtitle, 'category': qcategory, 'difficulty': qdifficulty,
+                 'points': float(qpoints) if qpoints is not None else None, 'description': qdesc,
+                 'multi_select': multi == 'Y', 'partial_credit': partial == 'Y',
+                 'penalty': float(penalty) if penalty else 0.0, 'answers': []}
+            questions.append(q)
+            by_id[q['questionID']] = q
+        cur.execute(DRAFT_ANSWERS_SQL, [quiz_id])
+        for qid, aid, atext, is_correct in cur.fetchall():
+            q = by_id.get(int(qid))
+            if q is not None:
+                q['answers'].append({'answerID': int(aid), 'text': atext, 'is_correct': is_correct == 'Y'})
+        return {'quizID': int(quizID), 'title': title, 'description': description,
+                'timelimit': int(timelimit) if timelimit is not None else None,
+                'pool_size': int(pool_size) if pool_size else None, 'stratify_by': stratify_by,
+                'shuffle_questions': shuffle_questions == 'Y', 'shuffle_answers': shuffle_answers == 'Y',
+                'pass_threshold': float(pass_threshold) if pass_threshold is not None else 0.5,
+                'questions': questions}
+
+    def publish(self, cur, quiz_id):
+        """Snapshot the draft as a new version unless it is unchanged. Returns the current versionID.
+
+        Runs on the caller's cursor so it commits together with the edit that triggered it.
+        """
+        snapshot = self.build_snapshot(cur, quiz_id)
+        if snapshot is None:
+            return None
+        body = json.dumps(snapshot, sort_keys=True, separators=(',', ':'))
+        content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        cur.execute(
+            "SELECT v.versionID, v.content_hash FROM Quiz q JOIN QuizVersions v ON v.versionID = q.current_version WHERE q.quizID = :1",
+            [quiz_id]
+        )
+        row = cur.fetchone()
+        if row and row[1] == content_hash:
+            return int(row[0])
+        cur.execute("SELECT NVL(MAX(version_no), 0) + 1 FROM QuizVersions WHERE quizID = :1", [quiz_id])
+        version_no = int(cur.fetchone()[0])
+        vid_var = cur.var(int)
+        cur.execute(
+            "INSERT INTO QuizVersions (quizID, version_no, content_hash, snapshot, created_at) VALUES (:1, :2, :3, :4, :5) "
+            "RETURNING versionID INTO :6",
+            [quiz_id, version_no, content_hash, body, datetime.utcnow(), vid_var]
+        )
+        version_id = int(vid_var.getvalue()[0])
+        cur.execute("UPDATE Quiz SET current_version = :1 WHERE quizID = :2", [version_id, quiz_id])
+        self.collect_garbage(cur, quiz_id)
+        return version_id
+
+    def current_version(self, cur, quiz_id):
+        """Current versionID of a quiz, publishing one first for quizzes created before versioning.
+
+        Returns None when the quiz does not exist.
+        """
+        cur.execute(CURRENT_VERSION_SQL, [quiz_id])
+        row = cur.fetchone()
+        if not row:
+            return None
+        if row[0] is not None:
+            return int(row[0])
+        return self.publish(cur, quiz_id)
+
+    @staticmethod
+    def collect_garbage(cur, quiz_id=None) -> int:
+        """Delete versions that are neither current nor pinned by any session or exam event."""
+        sql = (
+            "DELETE FROM QuizVersions v WHERE NOT EXISTS (SELECT 1 FROM Quiz q WHERE q.current_version = v.versionID) "
+            "AND NOT EXISTS (SELECT 1 FROM Sessions s WHERE s.versionID = v.versionID) "
+            "AND NOT EXISTS (SELECT 1 FROM ExamEvents e WHERE e.versionID = v.versionID)"
+        )
+        if quiz_id is not None:
+            cur.execute(sql + " AND v.quizID = :1", [quiz_id])
+        else:
+            cur.execute(sql)
+        return cur.rowcount
+
+    # -- reading ----------------------------------------------------------
+
+    def snapshot(self, conn, version_id) -> dict:
+        """Full snapshot (with answer key) of a version. Shared; do not mutate."""
+        version_id = int(version_id)
+        snap = self._snapshots.get(version_id)
+        if snap is not None:
+            return snap
+        cur = conn.cursor()
+        cur.execute(SNAPSHOT_SQL, [version_id])
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            return None
+        snap = json.loads(_read_lob(row[0]))
+        snap['versionID'] = version_id
+        self._snapshots.set(version_id, snap)
+        return snap
+
+    def candidate_payload(self, conn, version_id) -> dict:
+        """Snapshot as served to candidates: answers without is_correct. Shared; do not mutate."""
+        version_id = int(version_id)
+        payload = self._payloads.get(version_id)
+        if payload is not None:
+            return payload
+        snap = self.snapshot(conn, version_id)
+        if snap is None:
+            return None
+        payload = dict(snap)
+        payload['questions'] = [
+            dict(q, answers=[{'answerID': a['answerID'], 'text': a['text']} for a in q['answers']])
+            for q in snap['questions']
+        ]
+        self._payloads.set(version_id, payload)
+        return payload
+
+    def grading_key(self, conn, version_id) -> CompiledKey:
+        """Compiled answer key of a version (also validates autosaved answers)."""
+        version_id = int(version_id)
+        key = self._keys.get(version_id)
+        if key is not None:
+            return key
+        snap = self.snapshot(conn, version_id)
+        if snap is None:
+            return None
+        key = CompiledKey(snap)
+        self._keys.set(version_id, key)
+        return key
@@ -2,11 +2,11 @@ import { Component, signal } from '@angular/core';
 import { RouterOutlet, RouterLink, Router, NavigationEnd } from '@angular/router';
 import { CommonModule } from '@angular/common';
 import { filter } from 'rxjs/operators';
-import { HttpClient, HttpClientModule, HttpHeaders } from '@angular/common/http';
+import { HttpClient, HttpHeaders } from '@angular/common/http';
 
 @Component({
   selector: 'app-root',
-  imports: [RouterOutlet, RouterLink, CommonModule, HttpClientModule],
+  imports: [RouterOutlet, RouterLink, CommonModule],
   templateUrl: './app.html',
   styleUrl: './app.css'
 })
@@ -49,6 +49,7 @@ export class App {
       error: () => {
         try {
           localStorage.removeItem('token');
+          localStorage.removeItem('refreshToken');
           localStorage.removeItem('userName');
           localStorage.removeItem('userEmail');
         } catch (e) {}
@@ -59,10 +60,16 @@ export class App {
   }
 
   logout(): void {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      // best-effort server-side revocation of the refresh token family
+      this.http.post<any>('/api/logout', { refresh_token: refreshToken }).subscribe({ error: () => {} });
+    }
     try {
       localStorage.removeItem('userName');
       localStorage.removeItem('userEmail');
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
     } catch (e) {
       console.warn('Failed to clear localStorage during logout', e);
     }
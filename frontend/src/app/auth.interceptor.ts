@@ -0,0 +1,50 @@
+import { inject } from '@angular/core';
+import { HttpBackend, HttpClient, HttpErrorResponse, HttpInterceptorFn } from '@angular/common/http';
+import { Observable, throwError } from 'rxjs';
+import { catchError, finalize, map, shareReplay, switchMap } from 'rxjs/operators';
+
+// Access tokens are short-lived. When an authenticated request fails with 401 we exchange the
+// stored refresh token for a new pair once, then replay the request with the new access token.
+// Concurrent 401s share a single refresh call because the server rotates refresh tokens.
+let refreshInFlight: Observable<string> | null = null;
+
+function refreshAccessToken(http: HttpClient): Observable<string> {
+  if (!refreshInFlight) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshInFlight = http.post<any>('/api/token/refresh', { refresh_token: refreshToken }).pipe(
+      map((res) => {
+        if (!res || !res.ok || !res.token) throw new Error('refresh failed');
+        try {
+          localStorage.setItem('token', res.token);
+          if (res.refresh_token) localStorage.setItem('refreshToken', res.refresh_token);
+        } catch (e) {
+          console.warn('Failed to write to localStorage', e);
+        }
+        return res.token as string;
+      }),
+      finalize(() => { refreshInFlight = null; }),
+      shareReplay(1)
+    );
+  }
+  return refreshInFlight;
+}
+
+export const authRefreshInterceptor: HttpInterceptorFn = (req, next) => {
+  // Bypass interceptors for the refresh call itself
+  const http = new HttpClient(inject(HttpBackend));
+  return next(req).pipe(
+    catchError((err: HttpErrorResponse) => {
+      const skip = req.url.includes('/api/token/refresh') || req.url.includes('/api/login');
+      if (err.status !== 401 || skip || !req.headers.has('Authorization') || !localStorage.getItem('refreshToken')) {
+        return throwError(() => err);
+      }
+      return refreshAccessToken(http).pipe(
+        catchError(() => {
+          try { localStorage.removeItem('refreshToken'); } catch (e) {}
+          return throwError(() => err);
+        }),
+        switchMap((token) => next(req.clone({ setHeaders: { Authorization: `Bearer ${token}` } })))
+      );
+    })
+  );
+};
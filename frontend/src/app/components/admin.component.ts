@@ -77,6 +77,18 @@ import { HttpClient, HttpHeaders } from '@angular/common/http';
             <textarea rows="3" [(ngModel)]="newQuiz.description"></textarea>
             <label>Time limit (minutes)</label>
             <input type="number" min="0" [(ngModel)]="newQuiz.timelimit" />
+            <label>Questions per attempt (0 = all)</label>
+            <input type="number" min="0" [(ngModel)]="newQuiz.pool_size" />
+            <label>Spread draw across</label>
+            <select [(ngModel)]="newQuiz.stratify_by">
+              <option [ngValue]="null">Whole pool</option>
+              <option value="category">Categories</option>
+              <option value="difficulty">Difficulties</option>
+            </select>
+            <label><input type="checkbox" [(ngModel)]="newQuiz.shuffle_questions" /> Shuffle questions</label>
+            <label><input type="checkbox" [(ngModel)]="newQuiz.shuffle_answers" /> Shuffle answers</label>
+            <label>Pass mark (% of total points)</label>
+            <input type="number" min="0" max="100" [(ngModel)]="newQuiz.pass_percent" />
             <div class="modal-actions">
               <button class="btn edit-btn" (click)="confirmQuizSettings()" [disabled]="!newQuiz.title">Confirm</button>
               <button class="btn delete-btn" (click)="closeQuizModal()">Cancel</button>
@@ -111,6 +123,10 @@ import { HttpClient, HttpHeaders } from '@angular/common/http';
               <input type="text" [(ngModel)]="currentQuestion.difficulty" />
               <label>Points</label>
               <input type="number" min="0" [(ngModel)]="currentQuestion.points" />
+              <label><input type="checkbox" [(ngModel)]="currentQuestion.multi_select" /> Several correct answers (multi-select)</label>
+              <label *ngIf="currentQuestion.multi_select"><input type="checkbox" [(ngModel)]="currentQuestion.partial_credit" /> Partial credit</label>
+              <label>Penalty for a wrong answer (points)</label>
+              <input type="number" min="0" [(ngModel)]="currentQuestion.penalty" />
               <label>Description</label>
               <textarea rows="2" [(ngModel)]="currentQuestion.description"></textarea>
 
@@ -422,7 +438,7 @@ export class AdminComponent implements OnInit {
   showQuizModal: boolean = false;
   showQuestionForm: boolean = false; // after confirming settings
   showQuestionInputs: boolean = false; // when clicking Add Question
-  newQuiz: any = { title: '', description: '', timelimit: 0, questions: [] };
+  newQuiz: any = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
   currentQuestion: any = { title: '', category: '', difficulty: '', points: 0, description: '', answers: [] };
   currentAnswer: any = { text: '', is_correct: false };
   currentQuestionIndex: number = 0;
@@ -435,7 +451,7 @@ export class AdminComponent implements OnInit {
     this.showQuizModal = true;
     this.showQuestionForm = false;
     this.showQuestionInputs = false;
-    this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+    this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
     this.currentQuestion = { title: '', category: '', difficulty: '', points: 0, description: '', answers: [] };
     this.currentAnswer = { text: '', is_correct: false };
   }
@@ -445,7 +461,7 @@ export class AdminComponent implements OnInit {
       this.showQuizModal = false;
       this.showQuestionForm = false;
       this.showQuestionInputs = false;
-      this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+      this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
     } else {
       this.showQuizModal = false;
     }
@@ -549,6 +565,12 @@ export class AdminComponent implements OnInit {
   }
 
   markCorrect(ai: number): void {
+    if (this.currentQuestion.multi_select) {
+      // multi-select: toggle, several answers can be correct
+      const a = this.currentQuestion.answers[ai];
+      a.is_correct = !a.is_correct;
+      return;
+    }
     // ensure only one correct answer
     this.currentQuestion.answers.forEach((a: any, idx: number) => a.is_correct = (idx === ai));
   }
@@ -572,6 +594,11 @@ export class AdminComponent implements OnInit {
       title: this.newQuiz.title,
       description: this.newQuiz.description,
       timelimit: this.newQuiz.timelimit,
+      pool_size: this.newQuiz.pool_size || null,
+      stratify_by: this.newQuiz.stratify_by || null,
+      shuffle_questions: !!this.newQuiz.shuffle_questions,
+      shuffle_answers: !!this.newQuiz.shuffle_answers,
+      pass_threshold: Math.min(100, Math.max(0, Number(this.newQuiz.pass_percent ?? 50))) / 100,
       questions: this.newQuiz.questions
     };
     // send to backend endpoint to persist (endpoint may not exist yet)
@@ -585,7 +612,7 @@ export class AdminComponent implements OnInit {
           this.showQuizModal = false;
           this.showQuestionForm = false;
           this.showQuestionInputs = false;
-          this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+          this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
         },
         error: (err) => {
           console.warn('Failed to persist quiz update to backend, updating locally', err);
@@ -596,7 +623,7 @@ export class AdminComponent implements OnInit {
           this.showQuizModal = false;
           this.showQuestionForm = false;
           this.showQuestionInputs = false;
-          this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+          this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
         }
       });
       return;
@@ -609,7 +636,7 @@ export class AdminComponent implements OnInit {
         this.showQuizModal = false;
         this.showQuestionForm = false;
         this.showQuestionInputs = false;
-        this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+        this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
       },
       error: (err) => {
         // if endpoint not available, still push locally as fallback
@@ -618,7 +645,7 @@ export class AdminComponent implements OnInit {
         this.showQuizModal = false;
         this.showQuestionForm = false;
         this.showQuestionInputs = false;
-        this.newQuiz = { title: '', description: '', timelimit: 0, questions: [] };
+        this.newQuiz = { title: '', description: '', timelimit: 0, pass_percent: 50, questions: [] };
       }
     });
   }
@@ -637,10 +664,13 @@ export class AdminComponent implements OnInit {
             difficulty: qq.difficulty,
             points: qq.points,
             description: qq.description,
+            multi_select: !!qq.multi_select,
+            partial_credit: !!qq.partial_credit,
+            penalty: qq.penalty || 0,
             questionID: qq.questionID,
             answers: (qq.answers || []).map((a: any) => ({ text: a.text, is_correct: !!a.is_correct, answerID: a.answerID }))
           }));
-          this.newQuiz = { quizID: q.quizID, title: q.title, description: q.description, timelimit: q.timelimit, questions: q.questions };
+          this.newQuiz = { quizID: q.quizID, title: q.title, description: q.description, timelimit: q.timelimit, pool_size: q.pool_size || 0, stratify_by: q.stratify_by || null, shuffle_questions: !!q.shuffle_questions, shuffle_answers: !!q.shuffle_answers, pass_percent: Math.round((q.pass_threshold ?? 0.5) * 100), questions: q.questions };
           this.showQuizModal = true;
           this.showQuestionForm = true;
           // initialize navigator
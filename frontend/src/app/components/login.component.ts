@@ -1,13 +1,13 @@
 import { Component } from '@angular/core';
 import { RouterLink, Router } from '@angular/router';
-import { HttpClient, HttpClientModule } from '@angular/common/http';
+import { HttpClient } from '@angular/common/http';
 import { FormsModule } from '@angular/forms';
 import { CommonModule } from '@angular/common';
 
 @Component({
   selector: 'app-login',
   standalone: true,
-  imports: [RouterLink, HttpClientModule, FormsModule, CommonModule],
+  imports: [RouterLink, FormsModule, CommonModule],
   template: `
     <div class="auth-page">
       <div class="visual">
@@ -80,6 +80,9 @@ export class LoginComponent {
             if (res.token) {
               localStorage.setItem('token', res.token);
             }
+            if (res.refresh_token) {
+              localStorage.setItem('refreshToken', res.refresh_token);
+            }
           } catch (e) {
             console.warn('Failed to write to localStorage', e);
           }
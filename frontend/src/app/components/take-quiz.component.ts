@@ -4,13 +4,17 @@ import { FormsModule } from '@angular/forms';
 import { HttpClient, HttpHeaders } from '@angular/common/http';
 import { ActivatedRoute, Router } from '@angular/router';
 
+// A single answerID, or a list of them for multi-select questions
+type Answer = number | number[] | null;
+
 interface QuizSession {
   quizID: number;
   startAt: number; // epoch ms
   expiresAt?: number; // epoch ms
   sessionId?: string;
-  answersMap: { [questionID: number]: number | null };
+  answersMap: { [questionID: number]: Answer };
   currentIndex: number;
+  answerSeq?: number; // last server-side save sequence seen
 }
 
 @Component({
@@ -28,6 +32,7 @@ interface QuizSession {
           <h3 class="modal-title">{{ quiz.title }}</h3>
           <div class="timer" *ngIf="hasTimer">{{ timeLeftDisplay }}</div>
           <div class="expired-banner" *ngIf="sessionExpired" title="Session expired">Session expired</div>
+          <div class="notice-banner" *ngIf="notice" (click)="notice = ''">{{ notice }}</div>
           <button class="close" (click)="closeModal()">✕</button>
         </div>
 
@@ -48,7 +53,8 @@ interface QuizSession {
             <div class="q-desc" *ngIf="currentQuestion?.description">{{ currentQuestion.description }}</div>
             <div class="answers">
               <label *ngFor="let a of currentQuestion?.answers" class="answer-row">
-                <input type="radio" name="q-{{currentQuestion.questionID}}" [value]="a.answerID" [(ngModel)]="session.answersMap[currentQuestion.questionID]" (change)="saveSession()" />
+                <input *ngIf="!currentQuestion.multi_select" type="radio" name="q-{{currentQuestion.questionID}}" [value]="a.answerID" [(ngModel)]="session.answersMap[currentQuestion.questionID]" (change)="onAnswerChange()" />
+                <input *ngIf="currentQuestion.multi_select" type="checkbox" [checked]="isPicked(currentQuestion.questionID, a.answerID)" (change)="toggleAnswer(a.answerID, $any($event.target).checked)" />
                 <span class="answer-text">{{ a.text }}</span>
               </label>
             </div>
@@ -88,6 +94,7 @@ interface QuizSession {
     .close { position:absolute; right:12px; top:8px; background:transparent; border:none; font-size:1.1rem; cursor:pointer }
     .timer { position:absolute; right:702px; top:10px; font-weight:600; color:#fa541c }
   .timer { z-index: 20; font-size: 0.95rem }
+    .notice-banner { position:absolute; left:12px; top:44px; color:#ad6800; background:#fffbe6; padding:4px 8px; border-radius:6px; border:1px solid #ffe58f; cursor:pointer; z-index:21 }
     .expired-banner { position:absolute; right:12px; top:12px; color:#a8071a; font-weight:700; background: rgba(255,240,240,0.9); padding:4px 8px; border-radius:6px; border:1px solid rgba(168,7,26,0.12) }
 
     .modal-body { padding:16px }
@@ -127,6 +134,8 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
   sessionExpired = false;
   readonly GRACE_MS = 5000; // 5 seconds grace window to tolerate clock skew/race
   submitted = false;
+  submitting = false;
+  submitArrival: string | null = null;
   result: any = null;
   // track per-question saved state
   savedAnswers: { [questionID: number]: boolean } = {};
@@ -134,6 +143,13 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
   // Question wheel pagination
   readonly WHEEL_VISIBLE = 7;
   wheelPage = 0;
+  // Persistent exam channel (WebSocket). When it is not open we use the REST endpoints.
+  channel: WebSocket | null = null;
+  channelReady = false;
+  private frameId = 0;
+  private pendingFrames: { [id: number]: (ok: boolean, seq?: number) => void } = {};
+  readonly CHANNEL_ACK_TIMEOUT_MS = 5000;
+  notice = '';
 
   constructor(private http: HttpClient, private route: ActivatedRoute, private router: Router) {}
 
@@ -142,6 +158,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
     if (!id) return;
     this.loadOrStartSession(id);
     window.addEventListener('beforeunload', this.beforeUnload);
+    window.addEventListener('online', this.onOnline);
   }
 
   // Normalize session.expiresAt to a numeric epoch-ms value when possible
@@ -191,7 +208,168 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
 
   ngOnDestroy(): void {
     window.removeEventListener('beforeunload', this.beforeUnload);
+    window.removeEventListener('online', this.onOnline);
     this.clearTimer();
+    this.closeChannel();
+  }
+
+  openChannel(): void {
+    if (!this.quiz || !this.session || !this.session.sessionId || typeof WebSocket === 'undefined') return;
+    const proto = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const url = `${proto}://${window.location.host}/api/quizzes/${this.quiz.quizID}/channel?session_id=${encodeURIComponent(this.session.sessionId)}`;
+    try {
+      this.channel = new WebSocket(url);
+    } catch (e) {
+      console.warn('Session channel unavailable, using REST', e);
+      this.channel = null;
+      return;
+    }
+    this.channel.onopen = () => {
+      this.channel?.send(JSON.stringify({ t: 'auth', token: localStorage.getItem('token') }));
+    };
+    this.channel.onmessage = (ev) => {
+      let frame: any;
+      try { frame = JSON.parse(ev.data); } catch (e) { return; }
+      this.onChannelFrame(frame);
+    };
+    this.channel.onclose = () => {
+      this.channelReady = false;
+      this.channel = null;
+      // resolve outstanding frames as failed so callers fall back to REST
+      Object.keys(this.pendingFrames).forEach((k) => this.resolveFrame(Number(k), false));
+    };
+    this.channel.onerror = () => { this.channelReady = false; };
+  }
+
+  closeChannel(): void {
+    if (this.channel) {
+      try { this.channel.close(); } catch (e) {}
+    }
+    this.channel = null;
+    this.channelReady = false;
+  }
+
+  onChannelFrame(frame: any): void {
+    switch (frame.t) {
+      case 'time':
+        // Authoritative remaining time from the server replaces our local skew estimate
+        this.channelReady = true;
+        if (this.session && typeof frame.remaining_ms === 'number') {
+          this.session.expiresAt = Date.now() + frame.remaining_ms;
+          this.saveSession();
+        }
+        break;
+      case 'ack':
+        if (typeof frame.seq === 'number' && this.session) this.session.answerSeq = frame.seq;
+        this.resolveFrame(frame.id, true, frame.seq);
+        break;
+      case 'err':
+        this.resolveFrame(frame.id, false);
+        break;
+      case 'notice':
+        this.notice = frame.message || '';
+        break;
+      case 'expired':
+        this.closeChannel();
+        if (!this.submitted) {
+          this.clearTimer();
+          this.sessionExpired = true;
+          this.autoSubmit();
+        }
+        break;
+      case 'revoked':
+      case 'error':
+        this.closeChannel();
+        break;
+    }
+  }
+
+  resolveFrame(id: number, ok: boolean, seq?: number): void {
+    const cb = this.pendingFrames[id];
+    if (!cb) return;
+    delete this.pendingFrames[id];
+    cb(ok, seq);
+  }
+
+  // Send an autosave frame; the callback gets false on error, timeout or a closed channel
+  sendSaveFrame(qid: number, answerID: Answer, done?: (ok: boolean) => void): boolean {
+    if (!this.channel || !this.channelReady || this.channel.readyState !== WebSocket.OPEN) return false;
+    const id = ++this.frameId;
+    const timer = setTimeout(() => this.resolveFrame(id, false), this.CHANNEL_ACK_TIMEOUT_MS);
+    this.pendingFrames[id] = (ok: boolean) => {
+      clearTimeout(timer);
+      if (ok) this.savedAnswers[qid] = true;
+      if (done) done(ok);
+    };
+    this.channel.send(JSON.stringify({ t: 'save', id, q: qid, a: answerID }));
+    return true;
+  }
+
+  // Selecting an answer streams a small frame over the channel (no HTTP request per click)
+  onAnswerChange(): void {
+    this.saveSession();
+    const q = this.currentQuestion;
+    if (!q) return;
+    this.sendSaveFrame(q.questionID, this.answerOf(q.questionID));
+  }
+
+  isPicked(qid: number, answerID: number): boolean {
+    const value = this.session.answersMap[qid];
+    return Array.isArray(value) && value.includes(answerID);
+  }
+
+  // Checkbox change on a multi-select question
+  toggleAnswer(answerID: number, checked: boolean): void {
+    const q = this.currentQuestion;
+    if (!q) return;
+    const current = this.session.answersMap[q.questionID];
+    const picked = (Array.isArray(current) ? current : []).filter((a) => a !== answerID);
+    if (checked) picked.push(answerID);
+    this.session.answersMap[q.questionID] = picked;
+    this.onAnswerChange();
+  }
+
+  // The answer as sent to the server; an empty multi-select counts as no answer
+  answerOf(qid: number): Answer {
+    const value = this.session.answersMap[qid];
+    if (Array.isArray(value)) return value.length ? value : null;
+    return value ?? null;
+  }
+
+  onOnline = () => {
+    this.resyncAnswers();
+  };
+
+  // Restore selections the server already holds for this session (resume after reload)
+  applySavedAnswers(serverSession: any | null): void {
+    if (!serverSession || !this.session) return;
+    const saved = serverSession.saved_answers || {};
+    Object.keys(saved).forEach((k) => {
+      const qid = Number(k);
+      this.session.answersMap[qid] = saved[k];
+      this.savedAnswers[qid] = true;
+    });
+    if (typeof serverSession.answer_seq === 'number') this.session.answerSeq = serverSession.answer_seq;
+  }
+
+  // Fetch only the saves made after the last sequence we know about (e.g. after a dropped connection)
+  resyncAnswers(): void {
+    if (!this.quiz || !this.session || !this.session.sessionId) return;
+    const token = localStorage.getItem('token');
+    const headers = token ? new HttpHeaders({ Authorization: `Bearer ${token}` }) : undefined;
+    const since = this.session.answerSeq || 0;
+    this.http.get<any>(`/api/quizzes/${this.quiz.quizID}/sessions/${this.session.sessionId}/answers?since=${since}`, { headers }).subscribe({
+      next: (res) => {
+        if (!res || !res.ok) return;
+        (res.answers || []).forEach((a: any) => {
+          this.session.answersMap[a.questionID] = a.answerID;
+          this.savedAnswers[a.questionID] = true;
+        });
+        this.session.answerSeq = res.seq;
+        this.saveSession();
+      },
+      error: (err) => console.warn('Failed to resync answers', err)
+    });
   }
 
   beforeUnload = (e: BeforeUnloadEvent) => {
@@ -244,6 +422,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
               try { this.session.expiresAt = start + (Number(this.quiz.timelimit) * 60 * 1000); } catch (e) { /* ignore */ }
             }
             (this.quiz.questions || []).forEach((q: any) => this.session.answersMap[q.questionID] = null);
+            this.applySavedAnswers(serverSession);
             this.saveSession();
           } else {
             // ensure answers map has all keys; also update sessionId/expiry from server if provided
@@ -260,6 +439,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
             (this.quiz.questions || []).forEach((q: any) => {
               if (!(q.questionID in this.session.answersMap)) this.session.answersMap[q.questionID] = null;
             });
+            this.applySavedAnswers(serverSession);
             this.saveSession();
           }
 
@@ -283,6 +463,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
             this.updateTimeLeft();
             this.startTimer();
           }
+          if (!this.sessionExpired) this.openChannel();
         }
         this.loading = false;
       },
@@ -341,8 +522,8 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
     // warn if current unanswered when moving forward
     const curQ = this.currentQuestion;
     if (curQ) {
-      const selected = this.session.answersMap[curQ.questionID];
-      if ((selected === null || selected === undefined) && i > this.session.currentIndex) {
+      const selected = this.answerOf(curQ.questionID);
+      if (selected === null && i > this.session.currentIndex) {
         const ok = confirm('You did not answer the current question. Continue to next question?');
         if (!ok) return;
       }
@@ -359,7 +540,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
 
   onSubmitClick(): void {
     // check for unanswered
-    const unanswered = (this.quiz.questions || []).filter((q: any) => !this.session.answersMap[q.questionID]);
+    const unanswered = (this.quiz.questions || []).filter((q: any) => this.answerOf(q.questionID) === null);
     if (unanswered.length > 0) {
       const ok = confirm(`There are ${unanswered.length} unanswered questions. Submit anyway?`);
       if (!ok) return;
@@ -386,12 +567,25 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
     if (!this.quiz || !this.currentQuestion || !this.session) return;
     const q = this.currentQuestion;
     const qid = q.questionID;
-    const answerID = this.session.answersMap[qid] ?? null;
+    const answerID = this.answerOf(qid);
     // If no answer selected, ask user to confirm saving empty answer
     if (answerID === null) {
       const ok = confirm('You have not selected an answer for this question. Save empty answer?');
       if (!ok) return;
     }
+    this.isSaving = true;
+    const finish = () => {
+      this.savedAnswers[qid] = true;
+      this.isSaving = false;
+      this.saveSession();
+      if (onSaved) onSaved();
+    };
+    // Prefer the session channel; fall back to the REST endpoint if it is down or does not ack
+    const sent = this.sendSaveFrame(qid, answerID, (ok) => ok ? finish() : this.saveViaRest(qid, answerID, onSaved));
+    if (!sent) this.saveViaRest(qid, answerID, onSaved);
+  }
+
+  saveViaRest(qid: number, answerID: Answer, onSaved?: () => void): void {
     this.isSaving = true;
     const payload: any = { questionID: qid, answerID };
     if (this.session && this.session.sessionId) payload.session_id = this.session.sessionId;
@@ -401,6 +595,7 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
     this.http.post<any>(`/api/quizzes/${this.quiz.quizID}/answer`, payload, { headers }).subscribe({
       next: (res) => {
         this.savedAnswers[qid] = true;
+        if (res && typeof res.seq === 'number') this.session.answerSeq = res.seq;
         this.isSaving = false;
         this.saveSession();
         if (onSaved) onSaved();
@@ -422,24 +617,41 @@ export class TakeQuizComponent implements OnInit, OnDestroy {
     this.submit();
   }
 
-  submit(): void {
-    if (!this.quiz) return;
-    const answersPayload = (this.quiz.questions || []).map((q: any) => ({ questionID: q.questionID, answerID: this.session.answersMap[q.questionID] }));
+  submit(attempt = 0): void {
+    if (!this.quiz || this.submitted) return;
+    if (this.submitting && attempt === 0) return;
+    this.submitting = true;
+    const answersPayload = (this.quiz.questions || []).map((q: any) => ({ questionID: q.questionID, answerID: this.answerOf(q.questionID) }));
     const payload: any = { answers: answersPayload };
     if (this.session && this.session.sessionId) payload.session_id = this.session.sessionId;
     const token = localStorage.getItem('token');
-    const headers = token ? new HttpHeaders({ Authorization: `Bearer ${token}` }) : undefined;
+    let headers = token ? new HttpHeaders({ Authorization: `Bearer ${token}` }) : new HttpHeaders();
+    // Retries of the same submit reuse the key so the server returns the first result instead of regrading
+    if (this.session && this.session.sessionId) headers = headers.set('Idempotency-Key', this.session.sessionId);
+    // A shed submit is judged by when it first arrived, if we hand back the server's stamp
+    if (this.submitArrival) headers = headers.set('X-Submit-Arrival', this.submitArrival);
     this.http.post<any>(`/api/quizzes/${this.quiz.quizID}/submit`, payload, { headers }).subscribe({
       next: (res) => {
+        this.submitting = false;
         if (res && res.ok) {
           this.submitted = true;
           // Only expose numeric score and total to members — do not show pass/fail
           this.result = { score: res.score, total: res.total };
           this.clearSession();
           this.clearTimer();
+          this.closeChannel();
         }
       },
       error: (err) => {
+        // Connection dropped or server overloaded: retry with the same key after a short backoff
+        if ((err?.status === 0 || err?.status === 503 || err?.status === 409) && attempt < 5) {
+          const stamp = err?.headers?.get('X-Submit-Arrival');
+          if (stamp && !this.submitArrival) this.submitArrival = stamp;
+          const retryAfter = Number(err?.headers?.get('Retry-After')) || Math.pow(2, attempt);
+          setTimeout(() => this.submit(attempt + 1), 1000 * retryAfter);
+          return;
+        }
+        this.submitting = false;
         console.warn('Failed to submit quiz', err);
         alert(err?.error?.message || 'Failed to submit quiz');
       }